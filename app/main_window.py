@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import (
@@ -8,13 +9,11 @@ from PyQt5.QtWidgets import (
 
 from app import __version__
 from service.file_opener import FileOpener
-from service.indexed_file_searcher import SmartFileSearcher, SearchMode
 from service.pdf_handler import cleanup_temp_files
 from utils.config_manager import ConfigManager
 from utils.helpers import create_confirmation_dialog
 from widgets.auto_close_message_widget import AutoCloseMessage
 from widgets.directory_widget import DirectoryWidget
-from widgets.index_management_widget import IndexManagementDialog
 from widgets.results_widget import ResultsWidget
 from widgets.search_widget import SearchWidget
 
@@ -34,6 +33,10 @@ class MainWindow(QMainWindow):
         self._setup_index_management_ui()
         self._setup_close_button()
         self._connect_signals()
+
+    def initialize_deferred(self) -> None:
+        """ウィンドウ表示後に行う初期化（生成物ストアの整理やインデックス設定の反映）"""
+        self._get_file_opener()
         self._load_index_search_setting()
 
     def _setup_window_geometry(self) -> None:
@@ -64,7 +67,7 @@ class MainWindow(QMainWindow):
         self.results_widget = ResultsWidget(self.config_manager)
         self.main_layout.addWidget(self.results_widget)
 
-        self.file_opener = FileOpener(self.config_manager)
+        self.file_opener: Optional[FileOpener] = None
         self.auto_close_message = AutoCloseMessage(self)
         self.index_dialog = None
         self.use_index_search = False
@@ -101,12 +104,20 @@ class MainWindow(QMainWindow):
     def _load_index_search_setting(self) -> None:
         try:
             use_index = self.config_manager.get_use_index_search()
-            self.use_index_search = use_index
-            self.index_search_checkbox.setChecked(use_index)
         except Exception as e:
             print(f"インデックス設定の読み込みに失敗: {e}")
-            self.use_index_search = False
-            self.index_search_checkbox.setChecked(False)
+            use_index = False
+
+        # 読み込んだ値を設定ファイルへ書き戻さないよう、シグナルを止めて反映する
+        self.use_index_search = use_index
+        self.index_search_checkbox.blockSignals(True)
+        self.index_search_checkbox.setChecked(use_index)
+        self.index_search_checkbox.blockSignals(False)
+
+    def _get_file_opener(self) -> FileOpener:
+        if self.file_opener is None:
+            self.file_opener = FileOpener(self.config_manager)
+        return self.file_opener
 
     def start_search(self) -> None:
         search_terms = self.search_widget.get_search_terms()
@@ -134,6 +145,7 @@ class MainWindow(QMainWindow):
 
     def open_index_management(self) -> None:
         if self.index_dialog is None:
+            from widgets.index_management_widget import IndexManagementDialog
             self.index_dialog = IndexManagementDialog(self.config_manager, self)
 
         self.index_dialog.show()
@@ -160,7 +172,8 @@ class MainWindow(QMainWindow):
             if not file_path:
                 return
             search_terms = self.search_widget.get_search_terms()
-            self.file_opener.open_file(file_path, position, search_terms)
+            hit_locations = self.results_widget.get_hit_locations(file_path)
+            self._get_file_opener().open_file(file_path, position, search_terms, hit_locations)
         except FileNotFoundError:
             self._show_error_message("ファイルが見つかりません")
         except Exception as e:
@@ -175,7 +188,7 @@ class MainWindow(QMainWindow):
             if not file_path:
                 return
             folder_path = os.path.dirname(file_path)
-            self.file_opener.open_folder(folder_path)
+            self._get_file_opener().open_folder(folder_path)
         except FileNotFoundError:
             self.auto_close_message.show_message("フォルダが見つかりません", 2000)
         except Exception as e:
@@ -192,8 +205,10 @@ class MainWindow(QMainWindow):
         reply = msg_box.exec_()
         if reply == QMessageBox.Yes:
             try:
-                self.file_opener.cleanup_resources()
+                if self.file_opener is not None:
+                    self.file_opener.cleanup_resources()
                 cleanup_temp_files()
+                self.config_manager.flush()
             except Exception as e:
                 print(f"終了時のクリーンアップでエラー: {e}")
 
@@ -205,8 +220,10 @@ class MainWindow(QMainWindow):
             # self.config_manager.set_window_size_and_position(
             #     geometry.x(), geometry.y(), geometry.width(), geometry.height()
             # ) # 自動保存機能をコメントアウト
-            self.file_opener.cleanup_resources()
+            if self.file_opener is not None:
+                self.file_opener.cleanup_resources()
             cleanup_temp_files()
+            self.config_manager.flush()
 
         except Exception as e:
             print(f"ウィンドウ終了処理中にエラーが発生しました: {str(e)}")
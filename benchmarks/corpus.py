@@ -0,0 +1,101 @@
+import json
+import os
+import random
+from dataclasses import asdict, dataclass
+from typing import List
+
+import fitz
+
+# 検索語として使う語。出現頻度を決めて埋め込むため、ヒット数が毎回同じになる
+KEYWORDS = ['検索対象', 'manual']
+
+JAPANESE_WORDS = [
+    '設定', '手順', '確認', '操作', '画面', '入力', '保存', '表示', '印刷', '登録',
+    '患者', '検査', '結果', '申請', '承認', '変更', '削除', '追加', '管理', '一覧',
+]
+ENGLISH_WORDS = [
+    'system', 'report', 'update', 'select', 'button', 'window', 'record', 'option',
+    'server', 'folder', 'backup', 'export', 'import', 'status', 'config', 'review',
+]
+TEXT_ENCODINGS = ['utf-8', 'shift_jis', 'cp932']
+CORPUS_MANIFEST = 'corpus.json'
+
+
+@dataclass
+class CorpusSpec:
+    seed: int = 20240801
+    pdf_count: int = 6
+    pdf_pages: int = 30
+    lines_per_page: int = 40
+    text_count: int = 12
+    lines_per_text: int = 3000
+    keyword_every: int = 25
+
+
+def generate_corpus(output_dir: str, spec: CorpusSpec = CorpusSpec()) -> List[str]:
+    """乱数の種から決まるテスト用コーパスを作成し、ファイルパスの一覧を返す
+
+    同じ仕様で作成済みのコーパスがあれば再利用する。
+    """
+    manifest_path = os.path.join(output_dir, CORPUS_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('spec') == asdict(spec) and all(
+                os.path.exists(os.path.join(output_dir, name)) for name in manifest['files']):
+            return [os.path.join(output_dir, name) for name in manifest['files']]
+
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(spec.seed)
+    files = []
+
+    for i in range(spec.pdf_count):
+        name = f'manual_{i:03d}.pdf'
+        _write_pdf(os.path.join(output_dir, name), rng, spec)
+        files.append(name)
+
+    for i in range(spec.text_count):
+        encoding = TEXT_ENCODINGS[i % len(TEXT_ENCODINGS)]
+        extension = '.md' if i % 2 else '.txt'
+        name = os.path.join('text', f'note_{i:03d}_{encoding.replace("-", "")}{extension}')
+        _write_text(os.path.join(output_dir, name), rng, spec, encoding, extension == '.md')
+        files.append(name)
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'spec': asdict(spec), 'files': files}, f, ensure_ascii=False, indent=2)
+    return [os.path.join(output_dir, name) for name in files]
+
+
+def _make_line(rng: random.Random, line_index: int, spec: CorpusSpec) -> str:
+    words = [rng.choice(JAPANESE_WORDS if rng.random() < 0.6 else ENGLISH_WORDS) for _ in range(rng.randint(6, 12))]
+    if line_index % spec.keyword_every == 0:
+        words.insert(rng.randrange(len(words)), KEYWORDS[(line_index // spec.keyword_every) % len(KEYWORDS)])
+    return ' '.join(words)
+
+
+def _write_pdf(path: str, rng: random.Random, spec: CorpusSpec) -> None:
+    doc = fitz.open()
+    try:
+        line_index = 0
+        for _ in range(spec.pdf_pages):
+            page = doc.new_page()
+            lines = []
+            for _ in range(spec.lines_per_page):
+                lines.append(_make_line(rng, line_index, spec))
+                line_index += 1
+            page.insert_textbox(page.rect + (36, 36, -36, -36), '\n'.join(lines), fontname='japan', fontsize=8)
+        doc.save(path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+
+def _write_text(path: str, rng: random.Random, spec: CorpusSpec, encoding: str, is_markdown: bool) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = []
+    for line_index in range(spec.lines_per_text):
+        line = _make_line(rng, line_index, spec)
+        if is_markdown and line_index % 50 == 0:
+            line = f'## {line}'
+        lines.append(line)
+    with open(path, 'w', encoding=encoding, newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,213 @@
+"""主要な処理の実行時間を計測し、基準値と比較する
+
+使い方（リポジトリのルートで実行）:
+    python -m benchmarks.run_benchmarks                    # 計測して基準値と比較
+    python -m benchmarks.run_benchmarks --update-baseline  # 計測結果を基準値として保存
+
+基準値より tolerance（既定20%）以上遅くなった項目があれば終了コード1で終わる。
+基準値はマシンに依存するため、比較は同じマシンで作成した基準値に対して行う。
+基準値は既定では一時フォルダ（コーパスの作成先と同じ場所）に保存する。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.corpus import KEYWORDS, CorpusSpec, generate_corpus  # noqa: E402
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'ManualSearch_benchmark_corpus')
+DEFAULT_BASELINE = os.path.join(tempfile.gettempdir(), 'ManualSearch_benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.2
+FILE_EXTENSIONS = ['.pdf', '.txt', '.md']
+
+
+class BenchmarkRunner:
+    def __init__(self, corpus_dir: str, repeat: int):
+        self.corpus_dir = corpus_dir
+        self.repeat = repeat
+        self.work_dir = tempfile.mkdtemp(prefix='ManualSearch_benchmark_')
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def run_all(self, spec: CorpusSpec) -> Dict[str, Dict[str, float]]:
+        files = generate_corpus(self.corpus_dir, spec)
+        pdf_files = [f for f in files if f.endswith('.pdf')]
+        text_files = [f for f in files if not f.endswith('.pdf')]
+
+        # 生成物は作業フォルダに出力し、実行環境のキャッシュを汚さない
+        from service.artifact_store import ArtifactStore, close_artifact_store, set_artifact_store
+        set_artifact_store(ArtifactStore(root_dir=os.path.join(self.work_dir, 'artifacts'), max_entries=1000))
+
+        try:
+            self.bench_read_file_with_auto_encoding(text_files)
+            self.bench_file_scan_search()
+            self.bench_create_index()
+            self.bench_search_in_index()
+            self.bench_highlight_pdf(pdf_files[0])
+            self.bench_highlight_text_file(text_files)
+        finally:
+            close_artifact_store()
+            set_artifact_store(None)
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        return self.results
+
+    def measure(self, name: str, func: Callable[[], object], setup: Optional[Callable[[], None]] = None) -> None:
+        timings = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            # 計測対象の進捗表示は結果に含めない
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+
+        self.results[name] = {
+            'median': statistics.median(timings),
+            'min': min(timings),
+            'max': max(timings),
+            'repeat': len(timings),
+        }
+        print(f"{name:<40} median {self.results[name]['median'] * 1000:9.1f} ms")
+
+    def bench_read_file_with_auto_encoding(self, text_files: List[str]) -> None:
+        from utils.helpers import read_file_with_auto_encoding
+
+        self.measure('read_file_with_auto_encoding',
+                     lambda: [read_file_with_auto_encoding(path) for path in text_files])
+
+    def bench_file_scan_search(self) -> None:
+        from service.search_engine import FileScanSearch
+
+        def search() -> None:
+            engine = FileScanSearch(self.corpus_dir, list(KEYWORDS), True, 'OR', FILE_EXTENSIONS)
+            for _ in engine.search():
+                pass
+
+        self.measure('FileScanSearch', search)
+
+    def bench_create_index(self) -> None:
+        from service.search_indexer import SearchIndexer
+
+        # セグメントファイルも残さないよう、インデックス専用のフォルダごと作り直す
+        index_dir = os.path.join(self.work_dir, 'create_index')
+        index_path = os.path.join(index_dir, 'index.json')
+
+        def remove_index() -> None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+            os.makedirs(index_dir)
+
+        self.measure('SearchIndexer.create_index',
+                     lambda: SearchIndexer(index_path).create_index([self.corpus_dir]),
+                     setup=remove_index)
+
+    def bench_search_in_index(self) -> None:
+        from service.search_indexer import SearchIndexer
+
+        index_path = os.path.join(self.work_dir, 'index.json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            indexer = SearchIndexer(index_path)
+            indexer.create_index([self.corpus_dir])
+
+        self.measure('SearchIndexer.search_in_index',
+                     lambda: indexer.search_in_index(list(KEYWORDS), 'OR'))
+
+    def bench_highlight_pdf(self, pdf_file: str) -> None:
+        from service.pdf_handler import highlight_pdf
+        from service.pdf_highlight_cache import get_highlight_cache
+
+        self.measure('highlight_pdf',
+                     lambda: highlight_pdf(pdf_file, list(KEYWORDS)),
+                     setup=get_highlight_cache().clear)
+
+    def bench_highlight_text_file(self, text_files: List[str]) -> None:
+        from service.text_handler import clear_render_caches, highlight_text_file
+
+        self.measure('highlight_text_file',
+                     lambda: [highlight_text_file(path, list(KEYWORDS), 16) for path in text_files],
+                     setup=clear_render_caches)
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                          tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<40} 基準値なし")
+            continue
+
+        ratio = result['median'] / reference['median'] if reference['median'] else float('inf')
+        status = '遅延' if ratio > 1 + tolerance else 'OK'
+        print(f"{name:<40} {ratio:6.2f}倍 ({status})")
+        if status != 'OK':
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='マニュアル検索のベンチマーク')
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='テスト用コーパスの作成先')
+    parser.add_argument('--repeat', type=int, default=5, help='各項目の繰り返し回数')
+    parser.add_argument('--pdf-pages', type=int, default=CorpusSpec.pdf_pages, help='PDF1件あたりのページ数')
+    parser.add_argument('--seed', type=int, default=CorpusSpec.seed, help='コーパス作成用の乱数の種')
+    parser.add_argument('--output', help='計測結果を保存するJSONファイル')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='比較に使う基準値のJSONファイル')
+    parser.add_argument('--update-baseline', action='store_true', help='計測結果を基準値として保存する')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='許容する遅延の割合')
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(seed=args.seed, pdf_pages=args.pdf_pages)
+    results = BenchmarkRunner(args.corpus_dir, args.repeat).run_all(spec)
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'corpus': asdict(spec),
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基準値を保存しました: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"基準値がありません（--update-baseline で作成してください）: {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('corpus') != report['corpus']:
+        print("基準値とコーパスの条件が異なるため比較できません")
+        return 1
+
+    regressions = compare_with_baseline(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"基準値より遅くなった項目: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""GUIを起動せずにインデックスの作成と検索を行うコマンドラインツール
+
+使い方（リポジトリのルートで実行）:
+    python -m cli index build [--dir DIR ...]          # インデックスを作成・更新
+    python -m cli index stats                          # インデックスの情報を表示
+    python -m cli index cleanup                        # 存在しないファイルを削除
+    python -m cli query 語1 語2 [--type OR]             # 検索してJSON Linesで出力
+    python -m cli query --queries queries.txt          # ファイルに書いた検索を一括実行
+    python -m cli scan DIR 語1 語2                      # インデックスを使わずフォルダ内を直接検索
+    python -m cli serve [--stop]                       # 検索サービスを起動（--stopで終了）
+
+検索結果は1ファイル1行のJSON（type: "hit"）で、検索ごとに集計行（type: "summary"）を出力する。
+クエリファイルは1行1検索で、語を「,」「、」で区切るか、
+{"terms": [...], "type": "AND"} 形式のJSONで書く。空行と#で始まる行は無視する。
+進捗などのメッセージは標準エラー出力に出す。
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from constants import SEARCH_TERM_SEPARATOR_PATTERN, SEARCH_TYPE_AND, SEARCH_TYPE_OR
+from service.search_engine import is_under_directory
+
+FileMatches = Tuple[str, List[Tuple[int, int, int]]]
+
+
+class QuerySpec:
+    __slots__ = ('terms', 'search_type')
+
+    def __init__(self, terms: List[str], search_type: str):
+        self.terms = terms
+        self.search_type = search_type
+
+
+def split_search_terms(text: str) -> List[str]:
+    return [term.strip() for term in re.split(SEARCH_TERM_SEPARATOR_PATTERN, text) if term.strip()]
+
+
+def iter_query_file(stream: TextIO, default_type: str) -> Iterator[QuerySpec]:
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('{'):
+            try:
+                query = json.loads(line)
+            except ValueError as e:
+                print(f"クエリの読み込みに失敗しました（{line_number}行目）: {e}", file=sys.stderr)
+                continue
+            terms = [str(term) for term in query.get('terms', []) if str(term).strip()]
+            search_type = str(query.get('type', default_type)).upper()
+            if search_type not in (SEARCH_TYPE_AND, SEARCH_TYPE_OR):
+                search_type = default_type
+        else:
+            terms = split_search_terms(line)
+            search_type = default_type
+
+        if terms:
+            yield QuerySpec(terms, search_type)
+
+
+class CommandLineSearch:
+    """検索結果をJSON Linesでoutputへ書き出す
+
+    サービス層の進捗表示やエラーはprintで出力されるため、main() では標準出力を
+    標準エラー出力へ付け替えたうえで、結果だけを元の標準出力へ書き出す。
+    """
+
+    def __init__(self, index_file_path: str, file_extensions: List[str], output: TextIO = sys.stdout):
+        self.index_file_path = index_file_path
+        self.file_extensions = file_extensions
+        self.output = output
+        self._indexer = None
+
+    @property
+    def indexer(self):
+        if self._indexer is None:
+            from service.search_indexer import SearchIndexer
+            self._indexer = SearchIndexer(self.index_file_path)
+        return self._indexer
+
+    def build_index(self, directories: List[str], include_subdirs: bool, rebuild: bool) -> Dict:
+        if rebuild:
+            # 指定したフォルダのシャードだけを作り直す
+            self.indexer.reset_shards(directories)
+        started = time.perf_counter()
+        self.indexer.create_index(directories, include_subdirs)
+        elapsed = time.perf_counter() - started
+        # 統合中の出力が結果に混ざらないよう、終わるまで待ってから返す
+        self.indexer.wait_for_merge()
+        stats = self.index_stats()
+        stats['elapsed_ms'] = round(elapsed * 1000, 1)
+        return stats
+
+    def cleanup_index(self) -> Dict:
+        removed = self.indexer.remove_missing_files()
+        self.indexer.wait_for_merge()
+        return {'removed_files': removed}
+
+    def index_stats(self) -> Dict:
+        stats = self.indexer.get_index_stats()
+        stats['index_file_path'] = os.path.abspath(self.index_file_path)
+        return stats
+
+    def run_queries(self, queries: Iterator[QuerySpec], directory: Optional[str] = None,
+                    include_subdirs: bool = True, context_length: int = 0, scan: bool = False) -> int:
+        """scan=Trueの場合はインデックスを使わず、directory内のファイルを直接検索する"""
+        snippet_provider = None
+        if context_length > 0:
+            from service.snippet_provider import SnippetProvider
+            snippet_provider = SnippetProvider(context_length, None if scan else self.indexer)
+
+        total_hits = 0
+        for query_id, query in enumerate(queries):
+            if scan:
+                file_matches = self._scan_directory(query, directory, include_subdirs)
+            else:
+                file_matches = self._search_index(query, directory, include_subdirs)
+            total_hits += self.run_query(query_id, query, file_matches, snippet_provider)
+        return total_hits
+
+    def _search_index(self, query: QuerySpec, directory: Optional[str],
+                      include_subdirs: bool) -> Iterator[FileMatches]:
+        for file_path, matches in self.indexer.iter_search_in_index(
+                query.terms, query.search_type, file_extensions=self.file_extensions):
+            if directory is None or is_under_directory(file_path, directory, include_subdirs):
+                yield file_path, matches
+
+    def _scan_directory(self, query: QuerySpec, directory: str, include_subdirs: bool) -> Iterator[FileMatches]:
+        from service.search_engine import FileScanSearch
+
+        engine = FileScanSearch(directory, query.terms, include_subdirs, query.search_type, self.file_extensions)
+        for batch in engine.search():
+            for file_path, hits in batch.iter_files():
+                yield file_path, [(hit.position, hit.offset, hit.term_id) for hit in hits]
+
+    def run_query(self, query_id: int, query: QuerySpec, file_matches: Iterator[FileMatches],
+                  snippet_provider=None) -> int:
+        started = time.perf_counter()
+        file_count = 0
+        hit_count = 0
+
+        for file_path, matches in file_matches:
+            file_count += 1
+            hit_count += len(matches)
+            self.write({
+                'type': 'hit',
+                'query': query_id,
+                'file': file_path,
+                'matches': [
+                    self._format_match(file_path, position, offset, query.terms[term_id], snippet_provider)
+                    for position, offset, term_id in matches
+                ],
+            })
+
+        self.write({
+            'type': 'summary',
+            'query': query_id,
+            'terms': query.terms,
+            'search_type': query.search_type,
+            'files': file_count,
+            'hits': hit_count,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        })
+        return hit_count
+
+    @staticmethod
+    def _format_match(file_path: str, position: int, offset: int, term: str, snippet_provider) -> Dict:
+        match = {'position': position, 'offset': offset, 'term': term}
+        if snippet_provider is not None:
+            match['snippet'] = snippet_provider.get_snippet(file_path, position, offset, len(term))
+        return match
+
+    def write(self, record: Dict) -> None:
+        self.output.write(json.dumps(record, ensure_ascii=False))
+        self.output.write('\n')
+        self.output.flush()
+
+
+def _add_query_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('terms', nargs='*', help='検索語')
+    parser.add_argument('--type', dest='search_type', type=str.upper, default=SEARCH_TYPE_AND,
+                        choices=[SEARCH_TYPE_AND, SEARCH_TYPE_OR], help='AND検索かOR検索か')
+    parser.add_argument('--queries', help='一括実行するクエリファイル（-で標準入力）')
+    parser.add_argument('--no-subdirs', action='store_true', help='サブフォルダを含めない')
+    parser.add_argument('--context', type=int, default=0, help='前後の文字数を指定して抜粋を出力する')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli', description='マニュアル検索（コマンドライン版）')
+    parser.add_argument('--index', help='インデックスファイルのパス（既定は設定ファイルの値）')
+    parser.add_argument('--extensions', help='対象の拡張子（例: .pdf,.txt）。既定は設定ファイルの値')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help='インデックスの操作')
+    index_subparsers = index_parser.add_subparsers(dest='index_command', required=True)
+    build_parser_ = index_subparsers.add_parser('build', help='インデックスを作成・更新する')
+    build_parser_.add_argument('--dir', dest='directories', action='append',
+                               help='対象フォルダ（複数指定可）。既定は設定ファイルの検索対象フォルダ')
+    build_parser_.add_argument('--no-subdirs', action='store_true', help='サブフォルダを含めない')
+    build_parser_.add_argument('--rebuild', action='store_true', help='既存のインデックスを使わず作り直す')
+    index_subparsers.add_parser('stats', help='インデックスの情報を表示する')
+    index_subparsers.add_parser('cleanup', help='存在しないファイルをインデックスから削除する')
+
+    query_parser = subparsers.add_parser('query', help='インデックスを検索する')
+    _add_query_arguments(query_parser)
+    query_parser.add_argument('--dir', dest='directory', help='このフォルダ内のファイルだけを出力する')
+
+    scan_parser = subparsers.add_parser('scan', help='インデックスを使わずフォルダ内を直接検索する')
+    scan_parser.add_argument('directory', help='検索するフォルダ')
+    _add_query_arguments(scan_parser)
+
+    serve_parser = subparsers.add_parser('serve', help='インデックスを読み込んだまま常駐する検索サービスを起動する')
+    serve_parser.add_argument('--address', help='待ち受けるアドレス（既定は名前付きパイプ/一時フォルダのソケット）')
+    serve_parser.add_argument('--stop', action='store_true', help='起動中の検索サービスを終了する')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from utils.config_manager import ConfigManager
+    config = ConfigManager()
+    index_file_path = args.index or config.get_index_file_path()
+    if args.extensions:
+        file_extensions = [ext.strip().lower() for ext in args.extensions.split(',') if ext.strip()]
+    else:
+        file_extensions = config.get_file_extensions()
+
+    cli = CommandLineSearch(index_file_path, file_extensions, sys.stdout)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return run_command(cli, args, config)
+    except BrokenPipeError:
+        # headなどで出力側が先に閉じられた場合は、残りを捨てて終了する
+        sys.stdout = open(os.devnull, 'w')
+        return 1
+
+
+def run_command(cli: CommandLineSearch, args: argparse.Namespace, config) -> int:
+    if args.command == 'index':
+        if args.index_command == 'build':
+            directories = args.directories or config.get_directories()
+            if not directories:
+                print("対象フォルダがありません（--dir で指定してください）", file=sys.stderr)
+                return 2
+            cli.write(cli.build_index(directories, not args.no_subdirs, args.rebuild))
+        elif args.index_command == 'stats':
+            cli.write(cli.index_stats())
+        elif args.index_command == 'cleanup':
+            cli.write(cli.cleanup_index())
+        return 0
+
+    if args.command == 'serve':
+        return run_search_daemon(cli, args)
+
+    queries: List[QuerySpec] = []
+    if args.terms:
+        queries.append(QuerySpec(args.terms, args.search_type))
+    if args.queries:
+        if args.queries == '-':
+            queries.extend(iter_query_file(sys.stdin, args.search_type))
+        else:
+            with open(args.queries, encoding='utf-8') as f:
+                queries.extend(iter_query_file(f, args.search_type))
+    if not queries:
+        print("検索語がありません（検索語か --queries を指定してください）", file=sys.stderr)
+        return 2
+
+    scan = args.command == 'scan'
+    if scan and not os.path.isdir(args.directory):
+        print(f"フォルダが見つかりません: {args.directory}", file=sys.stderr)
+        return 1
+    if not scan and not os.path.exists(cli.index_file_path):
+        print(f"インデックスファイルが見つかりません: {cli.index_file_path}", file=sys.stderr)
+        return 1
+
+    cli.run_queries(iter(queries), args.directory, not args.no_subdirs, args.context, scan=scan)
+    return 0
+
+
+def run_search_daemon(cli: CommandLineSearch, args: argparse.Namespace) -> int:
+    from service.search_daemon import SearchDaemon, SearchDaemonClient
+
+    if args.stop:
+        client = SearchDaemonClient.connect(args.address)
+        if client is None:
+            print("検索サービスは起動していません", file=sys.stderr)
+            return 1
+        client.shutdown()
+        return 0
+
+    daemon = SearchDaemon(cli.index_file_path, args.address)
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,6 +25,23 @@ SEARCH_METHODS_MAPPING = {
 }
 
 MAX_SEARCH_RESULTS_PER_FILE = 100
+MAX_INDEX_MATCHES_PER_FILE = 200
+
+# 検索結果のバッチ送信
+RESULT_BATCH_INTERVAL = 0.05  # 秒
+RESULT_BATCH_MAX_ITEMS = 500
+PROGRESS_UPDATE_INTERVAL = 0.1  # 秒
+
+# フォルダの並列走査
+DIRECTORY_SCAN_MAX_WORKERS = 32
+DIRECTORY_SCAN_PER_SHARE_LIMIT = 16
+DIRECTORY_SCAN_RETRIES = 3
+DIRECTORY_SCAN_BACKOFF = 0.2  # 秒（再試行ごとに倍にする）
+DIRECTORY_SCAN_MAX_BACKOFF = 5.0  # 秒
+
+# 検索結果の抜粋テキスト用キャッシュ
+SNIPPET_CACHE_MAX_ENTRIES = 64
+SNIPPET_CACHE_MAX_CHARS = 50_000_000
 
 # 検索タイプ
 SEARCH_TYPE_AND = 'AND'
@@ -78,13 +95,46 @@ PDF_HIGHLIGHT_COLORS = [
 
 # PDF処理関連の定数
 ACROBAT_WAIT_TIMEOUT = 30
-ACROBAT_WAIT_INTERVAL = 0.5
-PAGE_NAVIGATION_RETRY_COUNT = 3
-PAGE_NAVIGATION_DELAY = 0.5
+# 起動直後の異常終了を呼び出し元で検出するために待つ秒数（残りの確認はバックグラウンドで行う）
+ACROBAT_LAUNCH_CHECK_SECONDS = 0.5
+
+# 生成物（ハイライト済みPDF・ビューア用HTML）の保存先
+ARTIFACT_STORE_DIRNAME = 'ManualSearch_artifacts'
+ARTIFACT_MANIFEST_FILENAME = 'manifest.json'
+ARTIFACT_MANIFEST_LOCK_FILENAME = 'manifest.lock'  # 同じフォルダを使う複数のアプリでマニフェストの読み書きを直列化する
+ARTIFACT_STORE_MAX_BYTES = 500 * 1024 * 1024
+ARTIFACT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+ARTIFACT_ORPHAN_GRACE_SECONDS = 60 * 60
+
+# ハイライト済みPDFキャッシュ
+FILE_HASH_CHUNK_SIZE = 1024 * 1024
+PDF_HIGHLIGHT_NEIGHBOR_PAGES = 2
+PDF_TWO_PHASE_MIN_PAGES = 20
+# 検索時にヒット箇所の矩形も記録するか。ページごと・検索語ごとに search_for を呼ぶため既定では
+# ページ番号だけを記録し、矩形はプレビューやハイライトでそのページを開いたときに求める
+COLLECT_PDF_HIT_RECTS = False
+
+# テキストビューア用のキャッシュ
+TEXT_MARKDOWN_CACHE_MAX_ENTRIES = 16
 
-# プロセス終了関連
-PROCESS_TERMINATE_TIMEOUT = 3
-PROCESS_CLEANUP_DELAY = 1.0
+# 大きなテキストファイルの分割表示
+TEXT_CHUNKED_VIEW_MIN_BYTES = 5 * 1024 * 1024
+TEXT_VIEW_CHUNK_LINES = 2000
+TEXT_VIEW_MAX_INDEXED_HITS = 100000
+ENCODING_DETECTION_SAMPLE_BYTES = 256 * 1024
+
+# PDFページプレビュー
+PREVIEW_RENDER_ZOOM = 1.5
+PREVIEW_CACHE_MAX_PAGES = 32
+PREVIEW_MAX_OPEN_DOCUMENTS = 4
+PREVIEW_PREFETCH_DISTANCE = 2
+PREVIEW_HIGHLIGHT_ALPHA = 110
+
+# 起動時間の計測
+STARTUP_TIMING_ARGUMENT = '--startup-timing'
+STARTUP_TIMING_ENV = 'MANUALSEARCH_STARTUP_TIMING'
+STARTUP_TIMING_REPORT_FILENAME = 'ManualSearch_startup_timing.txt'
+STARTUP_TIMING_TOP_MODULES = 30
 
 # UI関連の定数
 AUTO_CLOSE_MESSAGE_DURATION = 2000
@@ -93,6 +143,8 @@ CURSOR_MOVE_DELAY = 100
 
 # 設定ファイル関連
 CONFIG_FILENAME = 'config.ini'
+# 設定変更をまとめて書き込むまでの待ち時間（秒）
+CONFIG_SAVE_DELAY = 0.5
 
 # デフォルトパス
 DEFAULT_ACROBAT_PATH = r'C:\Program Files\Adobe\Acrobat DC\Acrobat\Acrobat.exe'
@@ -168,6 +220,7 @@ UI_LABELS = {
 # テンプレート関連
 TEMPLATE_DIRECTORY = 'templates'
 TEXT_VIEWER_TEMPLATE = 'text_viewer.html'
+TEXT_CHUNKED_VIEWER_TEMPLATE = 'text_viewer_chunked.html'
 
 # ファイルタイプ表示名
 FILE_TYPE_DISPLAY_NAMES = {
@@ -187,18 +240,27 @@ SEARCH_TERM_SEPARATOR_PATTERN = r'[,、]'
 # CSS関連
 HIGHLIGHT_STYLE_TEMPLATE = 'background-color: {color}; padding: 2px; border-radius: 2px;'
 
-# プロセス名検索パターン
-ACROBAT_PROCESS_NAMES = [
-    'acrobat',      # Adobe Acrobat (フルバージョン)
-    'acrord32',     # Adobe Acrobat Reader DC (32ビット版)
-    'acrord64',     # Adobe Acrobat Reader DC (64ビット版)
-    'acrobat.exe',  # 拡張子付きのパターン
-    'acrord32.exe', # 拡張子付きのパターン (32ビット版)
-    'acrord64.exe', # 拡張子付きのパターン (64ビット版)
-    'reader_sl',    # Reader起動用の一部プロセス
-]
-
 # インデックス関連
 DEFAULT_INDEX_FILE = "search_index.json"
 INDEX_UPDATE_THRESHOLD_DAYS = 7
+INDEX_SHARD_DIR_SUFFIX = '_shards'  # シャードはインデックスファイル名+この名前のフォルダに保存する
+INDEX_SEARCH_MAX_WORKERS = 4
+INDEX_SEGMENT_FILE_EXTENSION = '.idx'
+INDEX_COMPRESSION = 'zlib'  # 'zlib' または 'lzma'（小さくなるが圧縮・展開が遅い）
+INDEX_BLOCK_CHARS = 32768  # 本文はこの文字数ごとに圧縮し、必要なブロックだけ展開する
+INDEX_BLOCK_CACHE_SIZE = 64  # 展開済みブロックをセグメントごとに保持する数
+INDEX_MERGE_FACTOR = 4  # 大きさの段が同じセグメントがこの数になったら1つにまとめる
+INDEX_MERGE_MIN_SEGMENT_SIZE = 1024 * 1024  # これ以下のセグメントは全て最も小さい段として扱う
+INDEX_MERGE_DELETED_RATIO = 0.3  # 削除済みの文書がこの割合以上のセグメントは書き直す
+# 置き換えたセグメントは古いマニフェストを読んだプロセスが使うことがあるため、
+# 次以降のマニフェスト保存で、かつこの秒数が過ぎてから削除する
+INDEX_RETIRED_FILE_KEEP_SECONDS = 600
+
+# 検索サービス（インデックスを読み込んだまま常駐し、複数のアプリから検索を受け付ける）
+SEARCH_DAEMON_NAME = 'ManualSearch_search'
+SEARCH_DAEMON_KEY_FILENAME = 'search_daemon.key'  # ユーザーごとに生成し、本人だけが読めるフォルダに保存する
+SEARCH_DAEMON_KEY_BYTES = 32
+SEARCH_DAEMON_MAX_CLIENTS = 32  # 同時に扱える接続の数（接続ごとにワーカースレッドを1つ使う）
+SEARCH_DAEMON_IDLE_TIMEOUT = 300  # 秒。要求の無い接続はこの時間で閉じ、ワーカーを空ける
+SEARCH_DAEMON_POLL_INTERVAL = 0.1  # 秒
 DEFAULT_USE_INDEX_SEARCH = False
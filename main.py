@@ -1,18 +1,40 @@
 import sys
 
-from PyQt5.QtWidgets import QApplication
-
-from app.main_window import MainWindow
-from utils.config_manager import ConfigManager
+from utils.startup_profiler import StartupProfiler, is_startup_timing_enabled
+from constants import STARTUP_TIMING_ARGUMENT
 
 
 def main():
-    app = QApplication(sys.argv)
-    config = ConfigManager()
-    window = MainWindow(config)
-    window.show()
+    profiler = StartupProfiler(enabled=is_startup_timing_enabled(sys.argv))
+    argv = [arg for arg in sys.argv if arg != STARTUP_TIMING_ARGUMENT]
+
+    with profiler.phase('PyQt5の読み込み'):
+        from PyQt5.QtCore import QTimer
+        from PyQt5.QtWidgets import QApplication
+
+    with profiler.phase('QApplicationの作成'):
+        app = QApplication(argv)
+
+    with profiler.phase('設定の読み込み'):
+        from utils.config_manager import ConfigManager
+        config = ConfigManager()
+
+    with profiler.phase('メインウィンドウの作成'):
+        from app.main_window import MainWindow
+        window = MainWindow(config)
+
+    with profiler.phase('メインウィンドウの表示'):
+        window.show()
+
+    def finish_startup():
+        # 表示後に、起動直後の操作に不要な初期化を行う
+        with profiler.phase('遅延初期化'):
+            window.initialize_deferred()
+        profiler.finish()
+
+    QTimer.singleShot(0, finish_startup)
     sys.exit(app.exec_())
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
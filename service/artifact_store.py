@@ -0,0 +1,414 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from constants import (
+    ARTIFACT_STORE_DIRNAME,
+    ARTIFACT_MANIFEST_FILENAME,
+    ARTIFACT_MANIFEST_LOCK_FILENAME,
+    ARTIFACT_STORE_MAX_BYTES,
+    ARTIFACT_MAX_AGE_SECONDS,
+    ARTIFACT_ORPHAN_GRACE_SECONDS,
+    DEFAULT_MAX_TEMP_FILES
+)
+
+
+@contextmanager
+def _locked_file(path: str) -> Iterator[None]:
+    """ロックファイルを排他ロックしている間だけ処理する（別プロセスとの排他）"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            while True:
+                try:
+                    # LK_LOCK は約10秒待っても取れなければ OSError になる
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+    finally:
+        os.close(fd)
+
+
+class ArtifactStore:
+    """ハイライト済みPDFやビューア用HTMLなどの生成物を1つのフォルダで管理する
+
+    生成物は種類ごとの件数上限・全体の容量上限・最終利用からの経過時間でLRU削除する。
+    マニフェストをフォルダ内に保存するため、異常終了したセッションの残骸は次回起動時に
+    回収され、消されずに残った生成物は次のセッションでもキャッシュとして再利用できる。
+    同時に起動した複数のアプリが同じフォルダを使うため、マニフェストはロックファイルで
+    排他したうえで、ディスク上の内容にこのインスタンスでの追加・削除を反映して保存する。
+    """
+
+    def __init__(self, root_dir: Optional[str] = None,
+                 max_bytes: int = ARTIFACT_STORE_MAX_BYTES,
+                 max_entries: int = DEFAULT_MAX_TEMP_FILES,
+                 max_age: float = ARTIFACT_MAX_AGE_SECONDS,
+                 cleanup_on_exit: bool = True):
+        self.root_dir = root_dir or os.path.join(tempfile.gettempdir(), ARTIFACT_STORE_DIRNAME)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.cleanup_on_exit = cleanup_on_exit
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._pending_removal: List[str] = []
+        # 前回のマニフェスト保存以降に、このインスタンスで登録・利用したキーと削除したキー
+        self._changed_keys: Set[str] = set()
+        self._removed_keys: Set[str] = set()
+        # このインスタンスで登録・利用したキーと最後に利用した時刻（終了時の削除対象）
+        self._session_keys: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        with self._lock:
+            try:
+                with self._manifest_lock():
+                    self._load_manifest()
+                    self._reclaim_orphans()
+            except OSError as e:
+                print(f"生成物マニフェストをロックできませんでした: {e}")
+            self._save_manifest()
+
+    def configure(self, max_entries: Optional[int] = None, cleanup_on_exit: Optional[bool] = None) -> None:
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if cleanup_on_exit is not None:
+                self.cleanup_on_exit = cleanup_on_exit
+            self._save_manifest()
+
+    def create_path(self, suffix: str = '', directory: bool = False) -> str:
+        """生成物の書き出し先をストア内に作成して返す（putするまでは管理対象外）"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        if directory:
+            return tempfile.mkdtemp(suffix=suffix, dir=self.root_dir)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.root_dir)
+        os.close(fd)
+        return path
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(パス, メタデータ) を返す。期限切れや消失したものはNone"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            path = self._absolute_path(entry['path'])
+            if not os.path.exists(path) or self._is_expired(entry, time.time()):
+                self._remove_entry(key)
+                self._save_manifest()
+                return None
+
+            first_use = key not in self._session_keys
+            entry['last_used'] = time.time()
+            self._entries.move_to_end(key)
+            self._changed_keys.add(key)
+            self._session_keys[key] = entry['last_used']
+            if first_use:
+                # 別のインスタンスが終了時に削除しないよう、使い始めたことをすぐに記録する
+                self._save_manifest()
+            return path, entry['meta']
+
+    def put(self, key: str, path: str, kind: str, meta: Optional[Dict[str, Any]] = None,
+            size: Optional[int] = None) -> None:
+        """ストア内のパスを登録する。同じキーの古い生成物は削除する"""
+        if size is None:
+            size = self._measure(path)
+
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                previous_path = self._absolute_path(previous['path'])
+                self._forget(key)
+                if previous_path != os.path.abspath(path):
+                    self._remove_path(previous_path)
+
+            now = time.time()
+            self._entries[key] = {
+                'path': os.path.relpath(path, self.root_dir),
+                'kind': kind,
+                'size': size,
+                'created': now,
+                'last_used': now,
+                'meta': meta or {},
+            }
+            self._total_bytes += size
+            self._removed_keys.discard(key)
+            self._changed_keys.add(key)
+            self._session_keys[key] = now
+            self._save_manifest(protected_key=key)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove_entry(key)
+                self._save_manifest()
+
+    def discard(self, path: str) -> None:
+        """登録前に不要になった書き出し先を削除する"""
+        with self._lock:
+            self._remove_path(path)
+
+    def clear(self, kind: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if kind is None or entry['kind'] == kind]:
+                self._remove_entry(key)
+            self._retry_pending_removal()
+            self._save_manifest()
+
+    def close(self) -> None:
+        """終了時の処理。設定に応じてこのセッションで使った生成物を削除し、マニフェストを保存する
+
+        同時に動いている別のアプリが、このセッションより後に使った生成物は削除しない。
+        """
+        with self._lock:
+            if not self.cleanup_on_exit:
+                self._retry_pending_removal()
+                self._save_manifest()
+                return
+
+            try:
+                with self._manifest_lock():
+                    manifest = self._read_manifest()
+                    disk_entries = manifest.get('entries', {}) if manifest else {}
+                    # 別のインスタンスが後から使ったキーは、ディスク上の利用時刻の方が新しい
+                    keys_to_remove = [
+                        key for key, last_used in self._session_keys.items()
+                        if disk_entries.get(key, {}).get('last_used', 0) <= last_used
+                    ]
+                    self._merge_manifest(manifest)
+                    for key in keys_to_remove:
+                        if key in self._entries:
+                            self._remove_entry(key)
+                    self._retry_pending_removal()
+                    self._write_manifest()
+            except OSError as e:
+                print(f"生成物マニフェストの保存に失敗しました: {e}")
+                return
+            self._session_keys.clear()
+            self._changed_keys.clear()
+            self._removed_keys.clear()
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root_dir, ARTIFACT_MANIFEST_FILENAME)
+
+    def _manifest_lock(self):
+        return _locked_file(os.path.join(self.root_dir, ARTIFACT_MANIFEST_LOCK_FILENAME))
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        """ディスク上のマニフェスト。無ければ空、読めなければNone"""
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"生成物マニフェストの読み込みに失敗しました（作り直します）: {e}")
+            return None
+
+    def _load_manifest(self) -> None:
+        manifest = self._read_manifest()
+        if not manifest:
+            return
+
+        entries = sorted(manifest.get('entries', {}).items(), key=lambda item: item[1].get('last_used', 0))
+        with self._lock:
+            for key, entry in entries:
+                if not os.path.exists(self._absolute_path(entry.get('path', ''))):
+                    continue
+                self._entries[key] = entry
+                self._total_bytes += entry.get('size', 0)
+            self._pending_removal = list(manifest.get('pending_removal', []))
+            self._retry_pending_removal()
+
+    def _merge_manifest(self, manifest: Optional[Dict[str, Any]]) -> None:
+        """ディスク上のマニフェスト（他のインスタンスの変更を含む）に、このインスタンスでの変更を重ねる"""
+        if manifest is None:
+            # 読めなかった場合は、このインスタンスの内容で作り直す
+            return
+
+        merged = {key: entry for key, entry in manifest.get('entries', {}).items()
+                  if key not in self._removed_keys}
+        for key in self._changed_keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            on_disk = merged.get(key)
+            # 別のインスタンスが同じ生成物を後から使った場合は、その利用時刻を残す
+            if (on_disk is not None and on_disk.get('path') == entry['path']
+                    and on_disk.get('last_used', 0) > entry['last_used']):
+                continue
+            merged[key] = entry
+
+        self._entries = OrderedDict(sorted(merged.items(), key=lambda item: item[1].get('last_used', 0)))
+        self._total_bytes = sum(entry.get('size', 0) for entry in self._entries.values())
+        for path in manifest.get('pending_removal', []):
+            if path not in self._pending_removal:
+                self._pending_removal.append(path)
+
+    def _save_manifest(self, protected_key: Optional[str] = None) -> None:
+        try:
+            with self._manifest_lock():
+                self._merge_manifest(self._read_manifest())
+                self._evict(protected_key=protected_key)
+                self._write_manifest()
+        except OSError as e:
+            print(f"生成物マニフェストの保存に失敗しました: {e}")
+            return
+        self._changed_keys.clear()
+        self._removed_keys.clear()
+
+    def _write_manifest(self) -> None:
+        manifest = {'entries': dict(self._entries), 'pending_removal': self._pending_removal}
+        manifest_path = self._manifest_path()
+        temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, manifest_path)
+
+    def _reclaim_orphans(self) -> None:
+        """マニフェストにない生成物（異常終了したセッションの残骸）を削除する
+
+        マニフェストのロック中に呼ぶため、他のインスタンスが登録済みの生成物は全てマニフェストにある。
+        """
+        with self._lock:
+            known = {os.path.normcase(entry['path']) for entry in self._entries.values()}
+        known.add(os.path.normcase(ARTIFACT_MANIFEST_FILENAME))
+        known.add(os.path.normcase(ARTIFACT_MANIFEST_LOCK_FILENAME))
+
+        # 同時に動いている別のインスタンスが書き出し中（登録前）のものは残す
+        threshold = time.time() - ARTIFACT_ORPHAN_GRACE_SECONDS
+        try:
+            names = os.listdir(self.root_dir)
+        except OSError:
+            return
+
+        for name in names:
+            path = os.path.join(self.root_dir, name)
+            try:
+                if os.path.normcase(name) in known or os.path.getmtime(path) > threshold:
+                    continue
+            except OSError:
+                continue
+            with self._lock:
+                self._remove_path(path)
+
+    def _evict(self, protected_key: Optional[str] = None) -> None:
+        now = time.time()
+        for key in [k for k, entry in self._entries.items() if self._is_expired(entry, now)]:
+            if key != protected_key:
+                self._remove_entry(key)
+
+        counts: Dict[str, int] = {}
+        for entry in self._entries.values():
+            counts[entry['kind']] = counts.get(entry['kind'], 0) + 1
+
+        # 古い順に、種類ごとの件数上限と全体の容量上限を満たすまで削除する
+        for key in list(self._entries):
+            if key == protected_key:
+                continue
+            entry = self._entries[key]
+            if counts[entry['kind']] <= self.max_entries and self._total_bytes <= self.max_bytes:
+                continue
+            counts[entry['kind']] -= 1
+            self._remove_entry(key)
+
+        self._retry_pending_removal()
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry.get('last_used', 0) > self.max_age
+
+    def _remove_entry(self, key: str) -> None:
+        path = self._absolute_path(self._entries[key]['path'])
+        self._forget(key)
+        self._remove_path(path)
+
+    def _forget(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.get('size', 0)
+        self._changed_keys.discard(key)
+        self._removed_keys.add(key)
+
+    def _remove_path(self, path: str) -> None:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            # ビューアで開いている間は削除できないため後で再試行する
+            if path not in self._pending_removal:
+                self._pending_removal.append(path)
+
+    def _retry_pending_removal(self) -> None:
+        pending = self._pending_removal
+        self._pending_removal = []
+        for path in pending:
+            self._remove_path(path)
+
+    def _absolute_path(self, relative_path: str) -> str:
+        return os.path.abspath(os.path.join(self.root_dir, relative_path))
+
+    @staticmethod
+    def _measure(path: str) -> int:
+        if not os.path.isdir(path):
+            try:
+                return os.path.getsize(path)
+            except OSError:
+                return 0
+
+        total = 0
+        for dir_path, _, file_names in os.walk(path):
+            for file_name in file_names:
+                try:
+                    total += os.path.getsize(os.path.join(dir_path, file_name))
+                except OSError:
+                    continue
+        return total
+
+
+_artifact_store: Optional[ArtifactStore] = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore()
+        return _artifact_store
+
+
+def set_artifact_store(store: Optional[ArtifactStore]) -> None:
+    """既定のストアを差し替える（ベンチマークなどで出力先を分ける場合。Noneで既定に戻す）"""
+    global _artifact_store
+    with _artifact_store_lock:
+        _artifact_store = store
+
+
+def close_artifact_store() -> None:
+    with _artifact_store_lock:
+        if _artifact_store is not None:
+            _artifact_store.close()
+
+
+atexit.register(close_artifact_store)
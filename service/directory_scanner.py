@@ -0,0 +1,179 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from constants import (
+    DIRECTORY_SCAN_MAX_WORKERS,
+    DIRECTORY_SCAN_PER_SHARE_LIMIT,
+    DIRECTORY_SCAN_RETRIES,
+    DIRECTORY_SCAN_BACKOFF,
+    DIRECTORY_SCAN_MAX_BACKOFF
+)
+
+_SCAN_FINISHED = object()
+
+
+class ScanEntry:
+    """走査で見つかったファイルと、一覧取得時に得た stat 情報"""
+
+    __slots__ = ('path', 'size', 'mtime')
+
+    def __init__(self, path: str, size: int, mtime: float):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self) -> str:
+        return f"ScanEntry({self.path!r}, size={self.size}, mtime={self.mtime})"
+
+
+class DirectoryScanner:
+    """多数のフォルダを並行して一覧取得する
+
+    ネットワーク共有ではフォルダ1つの一覧取得ごとに往復の待ち時間がかかるため、
+    os.walk のように1つずつ辿るとフォルダ数に比例して遅くなる。ここでは asyncio で
+    一覧取得を同時に発行し（実際の取得は上限付きのスレッドプールで行う）、
+    共有（ドライブ/UNCの \\\\server\\share）ごとに同時実行数を制限する。
+    一時的なエラーは間隔を倍にしながら再試行する。
+
+    scan() は一覧が返ってきたフォルダから順にファイルを返すジェネレータ。
+    """
+
+    def __init__(self, max_workers: int = DIRECTORY_SCAN_MAX_WORKERS,
+                 per_share_limit: int = DIRECTORY_SCAN_PER_SHARE_LIMIT,
+                 share_limits: Optional[Dict[str, int]] = None,
+                 retries: int = DIRECTORY_SCAN_RETRIES,
+                 backoff: float = DIRECTORY_SCAN_BACKOFF,
+                 max_backoff: float = DIRECTORY_SCAN_MAX_BACKOFF):
+        self.max_workers = max_workers
+        self.per_share_limit = per_share_limit
+        self.share_limits = {self.share_key(share): limit for share, limit in (share_limits or {}).items()}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.directories_found = 0
+        self.directories_scanned = 0
+
+    @staticmethod
+    def share_key(path: str) -> str:
+        drive, _ = os.path.splitdrive(os.path.abspath(path))
+        return os.path.normcase(drive) or os.sep
+
+    def progress(self) -> int:
+        """一覧取得が終わったフォルダの割合（0-100）。走査中は見つかったフォルダ数が増えていく"""
+        if self.directories_found == 0:
+            return 0
+        return int(self.directories_scanned / self.directories_found * 100)
+
+    def scan(self, roots: List[str], include_subdirs: bool = True,
+             file_extensions: Optional[List[str]] = None, token=None) -> Iterator[ScanEntry]:
+        """roots 以下のファイルを返す。file_extensions を指定した場合は該当するものだけ stat する"""
+        extensions = {ext.lower() for ext in file_extensions} if file_extensions is not None else None
+        results: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        self.directories_found = 0
+        self.directories_scanned = 0
+
+        def should_stop() -> bool:
+            return stop.is_set() or (token is not None and token.cancelled)
+
+        thread = threading.Thread(
+            target=self._run, args=(roots, include_subdirs, extensions, results, should_stop), daemon=True
+        )
+        thread.start()
+        try:
+            while True:
+                entries = results.get()
+                if entries is _SCAN_FINISHED:
+                    break
+                yield from entries
+        finally:
+            # 途中で読むのをやめた場合は、未発行の一覧取得を打ち切る
+            stop.set()
+
+    def _run(self, roots: List[str], include_subdirs: bool, extensions: Optional[Set[str]],
+             results: "queue.Queue", should_stop) -> None:
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            asyncio.run(self._scan_all(roots, include_subdirs, extensions, results, should_stop, executor))
+        except Exception as e:
+            print(f"フォルダの走査中にエラーが発生しました: {e}")
+        finally:
+            executor.shutdown(wait=False)
+            results.put(_SCAN_FINISHED)
+
+    async def _scan_all(self, roots: List[str], include_subdirs: bool, extensions: Optional[Set[str]],
+                        results: "queue.Queue", should_stop, executor: ThreadPoolExecutor) -> None:
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+        pending: Set[asyncio.Task] = set()
+
+        def schedule(path: str) -> None:
+            key = self.share_key(path)
+            if key not in semaphores:
+                semaphores[key] = asyncio.Semaphore(self.share_limits.get(key, self.per_share_limit))
+            self.directories_found += 1
+            pending.add(asyncio.ensure_future(
+                self._scan_directory(path, extensions, semaphores[key], results, should_stop, executor)
+            ))
+
+        for root in roots:
+            schedule(root)
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                subdirectories = task.result()
+                if include_subdirs and not should_stop():
+                    for subdirectory in subdirectories:
+                        schedule(subdirectory)
+
+    async def _scan_directory(self, path: str, extensions: Optional[Set[str]], semaphore: asyncio.Semaphore,
+                              results: "queue.Queue", should_stop, executor: ThreadPoolExecutor) -> List[str]:
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                if should_stop():
+                    return []
+                try:
+                    files, subdirectories = await loop.run_in_executor(
+                        executor, self._list_directory, path, extensions
+                    )
+                    break
+                except (FileNotFoundError, NotADirectoryError, PermissionError):
+                    return []
+                except OSError as e:
+                    if attempt == self.retries:
+                        print(f"フォルダの一覧を取得できませんでした: {path} - {e}")
+                        return []
+                    # 共有の枠を確保したまま待ち、混み合っている共有への要求を減らす
+                    await asyncio.sleep(min(self.backoff * (2 ** attempt), self.max_backoff))
+
+        self.directories_scanned += 1
+        if files:
+            results.put(files)
+        return subdirectories
+
+    @staticmethod
+    def _list_directory(path: str, extensions: Optional[Set[str]]) -> Tuple[List[ScanEntry], List[str]]:
+        files = []
+        subdirectories = []
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    # os.walk と同じく、フォルダへのシンボリックリンクは辿らない
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                        continue
+                    if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append(ScanEntry(entry.path, stat.st_size, stat.st_mtime))
+        return files, subdirectories
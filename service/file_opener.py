@@ -1,17 +1,18 @@
 import os
 import subprocess
-import time
-from typing import List
+from typing import List, Optional
 
 from PyQt5.QtWidgets import QMessageBox
 
 from constants import (
     FILE_HANDLER_MAPPING,
-    ERROR_MESSAGES,
-    PROCESS_CLEANUP_DELAY
+    ERROR_MESSAGES
 )
+from service.artifact_store import get_artifact_store
+from service.hit_locations import PdfHitLocations
 from service.pdf_handler import open_pdf, highlight_pdf, cleanup_temp_files
 from service.text_handler import open_text_file
+from service.viewer_launcher import AcrobatLauncher
 from utils.helpers import is_network_file
 
 
@@ -19,11 +20,16 @@ class FileOpener:
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.acrobat_path: str = self.config_manager.get_acrobat_path()
-        self._last_opened_file: str = ""
+        self.viewer_launcher = AcrobatLauncher(self.acrobat_path, self.config_manager.get_pdf_timeout())
+        get_artifact_store().configure(
+            max_entries=self.config_manager.get_max_temp_files(),
+            cleanup_on_exit=self.config_manager.get_cleanup_temp_files()
+        )
 
     SUPPORTED_EXTENSIONS = FILE_HANDLER_MAPPING
 
-    def open_file(self, file_path: str, position: int, search_terms: List[str]) -> None:
+    def open_file(self, file_path: str, position: int, search_terms: List[str],
+                  hit_locations: Optional[PdfHitLocations] = None) -> None:
         if not os.path.exists(file_path):
             self._show_error(ERROR_MESSAGES['FILE_NOT_FOUND'])
             return
@@ -35,26 +41,18 @@ class FileOpener:
             self._show_error(ERROR_MESSAGES['UNSUPPORTED_FORMAT'])
             return
 
-        if file_path == self._last_opened_file and file_extension == '.pdf':
-            print(f"同じPDFファイルを再度開きます: {os.path.basename(file_path)}")
-            cleanup_temp_files()
-            time.sleep(PROCESS_CLEANUP_DELAY)
-
         try:
             method = getattr(self, handler_method)
             if file_extension == '.pdf':
-                method(file_path, position, search_terms)
+                method(file_path, position, search_terms, hit_locations)
             else:
-                method(file_path, search_terms)
-
-            self._last_opened_file = file_path
+                method(file_path, position, search_terms)
 
         except Exception as e:
             self._show_error(f"ファイルを開く際にエラーが発生しました: {e}")
-            if file_extension == '.pdf':
-                cleanup_temp_files()
 
-    def _open_pdf_file(self, file_path: str, position: int, search_terms: List[str]) -> None:
+    def _open_pdf_file(self, file_path: str, position: int, search_terms: List[str],
+                       hit_locations: Optional[PdfHitLocations] = None) -> None:
         try:
             if not self._check_pdf_accessibility(file_path):
                 raise IOError(ERROR_MESSAGES['PDF_ACCESS_FAILED'])
@@ -62,7 +60,8 @@ class FileOpener:
             if not os.path.exists(self.acrobat_path):
                 raise FileNotFoundError(f"{ERROR_MESSAGES['ACROBAT_NOT_FOUND']}: {self.acrobat_path}")
 
-            open_pdf(file_path, self.acrobat_path, position, search_terms)
+            open_pdf(file_path, self.acrobat_path, position, search_terms, hit_locations,
+                     launcher=self.viewer_launcher)
 
         except IOError as e:
             self._show_error(f"PDFの処理に失敗しました: {e}")
@@ -84,10 +83,10 @@ class FileOpener:
         except (IOError, OSError):
             return False
 
-    def _open_text_file(self, file_path: str, search_terms: List[str]) -> None:
+    def _open_text_file(self, file_path: str, position: int, search_terms: List[str]) -> None:
         try:
             font_size = self.config_manager.get_html_font_size()
-            open_text_file(file_path, search_terms, font_size)
+            open_text_file(file_path, search_terms, font_size, position)
         except IOError as e:
             self._show_error(f"テキストファイルの読み込みに失敗しました: {e}")
             raise
@@ -113,7 +112,6 @@ class FileOpener:
     def cleanup_resources(self) -> None:
         try:
             cleanup_temp_files()
-            self._last_opened_file = ""
         except Exception as e:
             print(f"リソースクリーンアップ中にエラー: {e}")
 
@@ -0,0 +1,63 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+Rect = Tuple[float, float, float, float]
+
+
+class PdfHitLocations:
+    """検索で見つかったPDFのヒットページと、検索語ごとの矩形座標
+
+    truncated は1ファイルあたりの件数上限で検索を打ち切ったことを示し、
+    記録したページ以外にもヒットがありうる（ハイライトは全ページを対象にする）。
+    """
+
+    __slots__ = ('pages', 'rects', 'truncated')
+
+    def __init__(self):
+        self.pages: Set[int] = set()
+        self.rects: Dict[int, Dict[str, List[Rect]]] = {}
+        self.truncated = False
+
+    def add_page(self, page_number: int) -> None:
+        self.pages.add(page_number)
+
+    def add_rects(self, page_number: int, term: str, rects: Iterable[Rect]) -> None:
+        self.pages.add(page_number)
+        self.rects.setdefault(page_number, {})[term.casefold()] = list(rects)
+
+    def get_rects(self, page_number: int, term: str) -> Optional[List[Rect]]:
+        """記録済みの矩形を返す。未記録の場合はNone"""
+        return self.rects.get(page_number, {}).get(term.casefold())
+
+    def fingerprint(self) -> str:
+        if self.truncated:
+            # 全ページを対象にしたハイライトと同じ
+            return ''
+        return ','.join(str(page) for page in sorted(self.pages))
+
+
+class HitLocationStore:
+    """検索スレッドが記録したヒット位置を、ファイルを開く側へ渡すための保管庫"""
+
+    def __init__(self):
+        self._locations: Dict[str, PdfHitLocations] = {}
+        self._lock = threading.Lock()
+
+    def record(self, file_path: str, locations: PdfHitLocations) -> None:
+        with self._lock:
+            self._locations[file_path] = locations
+
+    def record_pages(self, file_path: str, page_numbers: Iterable[int], truncated: bool = False) -> None:
+        locations = PdfHitLocations()
+        for page_number in page_numbers:
+            locations.add_page(page_number)
+        locations.truncated = truncated
+        self.record(file_path, locations)
+
+    def get(self, file_path: str) -> Optional[PdfHitLocations]:
+        with self._lock:
+            return self._locations.get(file_path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._locations.clear()
@@ -0,0 +1,332 @@
+import json
+import lzma
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from constants import INDEX_COMPRESSION, INDEX_BLOCK_CHARS, INDEX_BLOCK_CACHE_SIZE
+
+SEGMENT_MAGIC = b'MSIDXSEG'
+SEGMENT_FORMAT_VERSION = 2
+
+# ファイル全体から求めた内容のハッシュに付ける接頭辞。以前の先頭8KBだけのハッシュとは区別する
+CONTENT_HASH_PREFIX = 'blake2b:'
+
+# 圧縮方式: (圧縮, 展開)
+_CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def write_file_atomic(path: str, data: bytes) -> None:
+    """一時ファイルに書いてから置き換え、書き込み途中のファイルが残らないようにする"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.index_', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def encode_postings(doc_ids: Iterable[int]) -> bytes:
+    """昇順の文書番号を、前の番号との差を可変長整数（7ビットずつ）で並べたバイト列にする"""
+    out = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        value = doc_id - previous
+        previous = doc_id
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> List[int]:
+    doc_ids = []
+    doc_id = 0
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        doc_id += value
+        doc_ids.append(doc_id)
+        value = 0
+        shift = 0
+    return doc_ids
+
+
+def text_grams(text: str) -> Set[str]:
+    """連続する2文字の組（小文字にした本文・検索語から作る）"""
+    return set(map(str.__add__, text, text[1:]))
+
+
+class SegmentWriter:
+    """ファイルを追加して、インデックスのセグメントファイルの内容を作る
+
+    セグメントはファイル（パスと更新日時など）と文書（本文）を分けて持ち、
+    内容のハッシュが同じファイルは1つの文書を共有する。
+    本文は全文書を続けた1本の文字列として INDEX_BLOCK_CHARS 文字ごとに圧縮し、
+    文書・ページの位置から必要なブロックだけを展開できるようにする。
+    転置リスト（2文字の組ごとの文書番号）は差分＋可変長整数で保存する。
+    """
+
+    def __init__(self, codec: str = INDEX_COMPRESSION, block_chars: int = INDEX_BLOCK_CHARS):
+        self.codec = codec
+        self.block_chars = block_chars
+        self._compress = _CODECS[codec][0]
+        self._files: List[Dict[str, Any]] = []
+        self._documents: List[Dict[str, Any]] = []
+        self._doc_ids_by_hash: Dict[str, int] = {}
+        self._blocks: List[bytes] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._text_length = 0
+        self._postings: Dict[str, List[int]] = {}
+
+    def add_document(self, file_path: str, record: Dict[str, Any], get_text: Callable[[], str]) -> int:
+        """ファイルを追加してファイル番号を返す。同じ内容の文書があれば get_text は呼ばない"""
+        content_hash = record.get("hash") or ""
+        doc_id = self._doc_ids_by_hash.get(content_hash)
+        if doc_id is None:
+            text = get_text()
+            doc_id = len(self._documents)
+            self._documents.append({
+                "hash": content_hash,
+                "page_offsets": record.get("page_offsets"),
+                "start": self._text_length,
+                "length": len(text),
+            })
+            self._append_text(text)
+            for gram in text_grams(text.lower()):
+                self._postings.setdefault(gram, []).append(doc_id)
+            if content_hash.startswith(CONTENT_HASH_PREFIX):
+                self._doc_ids_by_hash[content_hash] = doc_id
+
+        self._files.append({
+            "path": file_path,
+            "mtime": record.get("mtime"),
+            "size": record.get("size"),
+            "indexed_at": record.get("indexed_at"),
+            "doc": doc_id,
+        })
+        return len(self._files) - 1
+
+    def _append_text(self, text: str) -> None:
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        self._text_length += len(text)
+        if self._pending_chars < self.block_chars:
+            return
+
+        buffer = ''.join(self._pending)
+        full_length = len(buffer) - len(buffer) % self.block_chars
+        for start in range(0, full_length, self.block_chars):
+            self._blocks.append(self._compress_text(buffer[start:start + self.block_chars]))
+        rest = buffer[full_length:]
+        self._pending = [rest] if rest else []
+        self._pending_chars = len(rest)
+
+    def _compress_text(self, text: str) -> bytes:
+        return self._compress(text.encode('utf-8', 'surrogatepass'))
+
+    def _encode_postings_section(self) -> bytes:
+        grams = sorted(self._postings)
+        postings = [encode_postings(self._postings[gram]) for gram in grams]
+        ends = array('I', accumulate(len(entry) for entry in postings))
+        if sys.byteorder != 'little':
+            ends.byteswap()
+        grams_bytes = ''.join(grams).encode('utf-8', 'surrogatepass')
+        raw = b''.join([struct.pack('<II', len(grams), len(grams_bytes)), grams_bytes, ends.tobytes()] + postings)
+        return self._compress(raw)
+
+    def finish(self, root: str, created_at: Optional[str], last_updated: Optional[str]) -> bytes:
+        if self._pending:
+            self._blocks.append(self._compress_text(''.join(self._pending)))
+            self._pending = []
+            self._pending_chars = 0
+
+        postings_section = self._encode_postings_section()
+        header = zlib.compress(json.dumps({
+            "format": SEGMENT_FORMAT_VERSION,
+            "root": root,
+            "created_at": created_at,
+            "last_updated": last_updated,
+            "codec": self.codec,
+            "block_chars": self.block_chars,
+            "block_sizes": [len(block) for block in self._blocks],
+            "postings_size": len(postings_section),
+            "files": self._files,
+            "documents": self._documents,
+        }, ensure_ascii=False).encode('utf-8'))
+
+        return b''.join([SEGMENT_MAGIC, struct.pack('<I', len(header)), header] + self._blocks + [postings_section])
+
+
+class IndexSegment:
+    """セグメントファイルの読み込み
+
+    ファイル全体（圧縮済み）をメモリに置き、本文のブロックと転置リストは使う時点で展開する。
+    """
+
+    def __init__(self, data: bytes):
+        if data[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError("インデックスファイルの形式が不明です")
+        position = len(SEGMENT_MAGIC)
+        header_size, = struct.unpack_from('<I', data, position)
+        position += 4
+        self.header: Dict[str, Any] = json.loads(zlib.decompress(data[position:position + header_size]))
+        position += header_size
+
+        if self.header.get("format") not in (1, SEGMENT_FORMAT_VERSION):
+            raise ValueError(f"対応していないインデックスの形式です: {self.header.get('format')}")
+
+        self.documents: List[Dict[str, Any]] = self.header["documents"]
+        if "files" in self.header:
+            self.files: List[Dict[str, Any]] = self.header["files"]
+        else:
+            # 形式1はファイルと文書が1対1
+            self.files = [dict(document, doc=doc_id) for doc_id, document in enumerate(self.documents)]
+        self.block_chars: int = self.header["block_chars"]
+        self._decompress = _CODECS[self.header["codec"]][1]
+        self._data = memoryview(data)
+        # 各ブロックの開始位置。最後の要素は転置リストの開始位置
+        self._block_offsets = list(accumulate(self.header["block_sizes"], initial=position))
+        self._postings_offset = self._block_offsets[-1]
+
+        self._block_cache: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._gram_index: Optional[Dict[str, int]] = None
+        self._posting_ends: Optional[array] = None
+        self._postings_blob: Optional[memoryview] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    @classmethod
+    def load(cls, path: str) -> 'IndexSegment':
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def get_text(self, doc_id: int, start: int = 0, end: Optional[int] = None) -> str:
+        """文書の本文（start/end は文書先頭からの文字位置）を、必要なブロックだけ展開して返す"""
+        document = self.documents[doc_id]
+        length = document["length"]
+        end = length if end is None else min(end, length)
+        if start >= end:
+            return ""
+
+        text_start = document["start"] + start
+        text_end = document["start"] + end
+        parts = []
+        for block_index in range(text_start // self.block_chars, (text_end - 1) // self.block_chars + 1):
+            block_start = block_index * self.block_chars
+            block = self._get_block(block_index)
+            parts.append(block[max(text_start - block_start, 0):text_end - block_start])
+        return ''.join(parts)
+
+    def _get_block(self, block_index: int) -> str:
+        with self._lock:
+            block = self._block_cache.get(block_index)
+            if block is not None:
+                self._block_cache.move_to_end(block_index)
+                return block
+
+        start = self._block_offsets[block_index]
+        size = self.header["block_sizes"][block_index]
+        block = self._decompress(self._data[start:start + size]).decode('utf-8', 'surrogatepass')
+
+        with self._lock:
+            self._block_cache[block_index] = block
+            while len(self._block_cache) > INDEX_BLOCK_CACHE_SIZE:
+                self._block_cache.popitem(last=False)
+        return block
+
+    def _ensure_postings(self) -> None:
+        if self._gram_index is not None:
+            return
+        with self._lock:
+            if self._gram_index is not None:
+                return
+            raw = self._decompress(self._data[self._postings_offset:self._postings_offset + self.header["postings_size"]])
+            gram_count, grams_size = struct.unpack_from('<II', raw, 0)
+            position = 8
+            grams = raw[position:position + grams_size].decode('utf-8', 'surrogatepass')
+            position += grams_size
+            ends = array('I')
+            ends.frombytes(raw[position:position + 4 * gram_count])
+            if sys.byteorder != 'little':
+                ends.byteswap()
+            position += 4 * gram_count
+
+            self._posting_ends = ends
+            self._postings_blob = memoryview(raw)[position:]
+            self._gram_index = dict(zip(map(str.__add__, grams[0::2], grams[1::2]), range(gram_count)))
+
+    def _posting_range(self, gram: str) -> Optional[Tuple[int, int]]:
+        index = self._gram_index.get(gram)
+        if index is None:
+            return None
+        start = self._posting_ends[index - 1] if index else 0
+        return start, self._posting_ends[index]
+
+    def postings(self, gram: str) -> List[int]:
+        self._ensure_postings()
+        posting_range = self._posting_range(gram)
+        if posting_range is None:
+            return []
+        start, end = posting_range
+        return decode_postings(self._postings_blob[start:end])
+
+    def candidate_documents(self, search_terms: List[str], search_type: str) -> Optional[Set[int]]:
+        """検索語を含みうる文書番号の集合を返す。絞り込めない場合（1文字の検索語など）はNone
+
+        転置リストは2文字の組の有無しか分からないため、最終的な一致は本文で確かめる。
+        """
+        self._ensure_postings()
+        term_documents = []
+        for term in search_terms:
+            grams = text_grams(term.lower())
+            if not grams:
+                term_documents.append(None)
+                continue
+
+            documents: Optional[Set[int]] = None
+            # 文書数の少ない組から順に絞り込む
+            for gram in sorted(grams, key=self._posting_size):
+                postings = set(self.postings(gram))
+                documents = postings if documents is None else documents & postings
+                if not documents:
+                    break
+            term_documents.append(documents)
+
+        if search_type == "AND":
+            known = [documents for documents in term_documents if documents is not None]
+            return set.intersection(*known) if known else None
+
+        if not term_documents or any(documents is None for documents in term_documents):
+            return None
+        return set().union(*term_documents)
+
+    def _posting_size(self, gram: str) -> int:
+        posting_range = self._posting_range(gram)
+        return 0 if posting_range is None else posting_range[1] - posting_range[0]
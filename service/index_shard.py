@@ -0,0 +1,477 @@
+import json
+import math
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from constants import (
+    MAX_INDEX_MATCHES_PER_FILE,
+    INDEX_SEGMENT_FILE_EXTENSION,
+    INDEX_MERGE_FACTOR,
+    INDEX_MERGE_MIN_SEGMENT_SIZE,
+    INDEX_MERGE_DELETED_RATIO
+)
+from service.index_segment import CONTENT_HASH_PREFIX, IndexSegment, SegmentWriter, write_file_atomic
+
+FileMatches = Tuple[str, List[Tuple[int, int, int]]]
+
+# 旧形式（1ファイルのインデックス）から移行したファイルを、フォルダに振り分けるまで保持するシャード
+LEGACY_SHARD_ROOT = ''
+
+
+def write_json_atomic(path: str, data: Any, indent: Optional[int] = None) -> None:
+    write_file_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8'))
+
+
+class ShardSegment:
+    """シャードを構成するセグメントファイル1つと、その中で削除済み（置き換え済み）のファイル番号"""
+
+    __slots__ = ('file', 'deleted', 'reader')
+
+    def __init__(self, file: str, deleted: Iterable[int] = ()):
+        self.file = file
+        self.deleted: Set[int] = set(deleted)
+        self.reader: Optional[IndexSegment] = None
+
+
+class IndexShard:
+    """検索対象フォルダ1つ分のインデックス
+
+    シャードは書き換えないセグメントファイルの集まりで、必要になった時点で読み込む。
+    追加・更新したファイルは保存のたびに小さな新しいセグメントへ書き、更新前や
+    削除したファイルは元のセグメントに削除済み（トゥームストーン）として記録するだけにする。
+    セグメントの一覧と削除済みのファイル番号はマニフェストに保存する。
+    セグメントが増えたり削除済みが溜まったりした場合は merge_segments() でまとめる。
+    内容のハッシュが同じファイル（別のフォルダにコピーされたマニュアルなど）は、
+    セグメント内で本文と転置リストを共有する。
+
+    files の各レコードは、保存済みならセグメント（segment）とファイル番号（file_id）・
+    文書番号（doc）を、保存前なら本文（content）を持つ。
+    """
+
+    def __init__(self, root: str, shard_dir: str, name: str, entry: Optional[Dict[str, Any]] = None):
+        self.root = root
+        self.shard_dir = shard_dir
+        self.name = name
+        entry = entry or {}
+        # 以前の形式では1シャード1ファイル（"file"）だった
+        segments = entry.get("segments", [{"file": entry["file"]}] if "file" in entry else [])
+        self.segments: List[ShardSegment] = [ShardSegment(info["file"], info.get("deleted", ()))
+                                             for info in segments]
+        self.data: Dict[str, Any] = self._empty_data()
+        self.data["created_at"] = entry.get("created_at") or self.data["created_at"]
+        self.data["last_updated"] = entry.get("last_updated")
+        self.loaded = False
+        self.dirty = False
+        self.obsolete_files: List[str] = []
+        self._lock = threading.RLock()
+        self._paths_by_hash: Dict[str, Set[str]] = {}
+        self._doc_paths: List[str] = []
+        self._extension_bitmaps: Dict[str, int] = {}
+        self._bitmaps_dirty = True
+
+    def _empty_data(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "created_at": datetime.now().isoformat(),
+            "last_updated": None,
+            "files": {}  # file_path: {mtime, size, hash, indexed_at, page_offsets, segment・file_id・doc または content}
+        }
+
+    def segment_path(self, file_name: str) -> str:
+        return os.path.join(self.shard_dir, file_name)
+
+    def segment_paths(self) -> List[str]:
+        return [self.segment_path(segment.file) for segment in self.segments]
+
+    @property
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        self.ensure_loaded()
+        return self.data["files"]
+
+    def ensure_loaded(self) -> None:
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            files = {}
+            for segment in list(self.segments):
+                path = self.segment_path(segment.file)
+                try:
+                    if segment.file.endswith('.json'):
+                        files.update(self._load_json(path))
+                        # JSONで保存していた以前のシャード。次の保存時にセグメントへ書き換える
+                        self.segments.remove(segment)
+                        self.obsolete_files.append(path)
+                        self.dirty = True
+                        continue
+                    segment.reader = IndexSegment.load(path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"インデックスの読み込みに失敗: {path} - {e}")
+                    self.segments.remove(segment)
+                    continue
+                for file_id, file_entry in enumerate(segment.reader.files):
+                    if file_id not in segment.deleted:
+                        files[file_entry["path"]] = self._stored_record(file_entry, segment, file_id)
+            self.data["files"] = files
+            self._rebuild_hash_index()
+            self._bitmaps_dirty = True
+            self.loaded = True
+
+    @staticmethod
+    def _load_json(path: str) -> Dict[str, Dict[str, Any]]:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)["files"]
+
+    @staticmethod
+    def _stored_record(record: Dict[str, Any], segment: ShardSegment, file_id: int) -> Dict[str, Any]:
+        """セグメントに書いたファイルのレコード（本文に由来する値は共有する文書から取る）"""
+        doc_id = segment.reader.files[file_id]["doc"]
+        document = segment.reader.documents[doc_id]
+        stored = {key: record.get(key) for key in ("mtime", "size", "indexed_at")}
+        stored["hash"] = document.get("hash")
+        if document.get("page_offsets") is not None:
+            stored["page_offsets"] = document["page_offsets"]
+        stored["segment"] = segment
+        stored["file_id"] = file_id
+        stored["doc"] = doc_id
+        return stored
+
+    @staticmethod
+    def _get_content(record: Dict[str, Any]) -> str:
+        if "content" in record:
+            return record["content"]
+        return record["segment"].reader.get_text(record["doc"])
+
+    @staticmethod
+    def _delete_stored(record: Dict[str, Any]) -> None:
+        if "segment" in record:
+            record["segment"].deleted.add(record["file_id"])
+
+    def _rebuild_hash_index(self) -> None:
+        self._paths_by_hash = {}
+        for file_path, record in self.data["files"].items():
+            self._index_hash(file_path, record)
+
+    def _index_hash(self, file_path: str, record: Dict[str, Any]) -> None:
+        content_hash = record.get("hash") or ""
+        if content_hash.startswith(CONTENT_HASH_PREFIX):
+            self._paths_by_hash.setdefault(content_hash, set()).add(file_path)
+
+    def _unindex_hash(self, file_path: str, record: Dict[str, Any]) -> None:
+        paths = self._paths_by_hash.get(record.get("hash") or "")
+        if paths is not None:
+            paths.discard(file_path)
+            if not paths:
+                del self._paths_by_hash[record["hash"]]
+
+    def find_content(self, content_hash: str) -> Optional[Tuple[str, Optional[List[int]]]]:
+        """内容のハッシュが同じファイルがあれば、その (本文, ページ位置) を返す"""
+        with self._lock:
+            self.ensure_loaded()
+            paths = self._paths_by_hash.get(content_hash)
+            if not paths:
+                return None
+            record = self.data["files"][next(iter(paths))]
+        return self._get_content(record), record.get("page_offsets")
+
+    def replace_files(self, files: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            for record in self.files.values():
+                self._delete_stored(record)
+            self.data["files"] = files
+            self._rebuild_hash_index()
+            self.mark_changed()
+
+    def set_record(self, file_path: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            files = self.files
+            previous = files.get(file_path)
+            if previous is None:
+                self._bitmaps_dirty = True
+            else:
+                self._delete_stored(previous)
+                self._unindex_hash(file_path, previous)
+            files[file_path] = record
+            self._index_hash(file_path, record)
+            self.dirty = True
+
+    def pop_record(self, file_path: str, with_content: bool = False) -> Optional[Dict[str, Any]]:
+        """レコードを取り除く。with_content の場合は他のシャードへ移せるよう本文を含めて返す"""
+        with self._lock:
+            record = self.files.pop(file_path, None)
+            if record is None:
+                return None
+            self._delete_stored(record)
+            self._unindex_hash(file_path, record)
+            self.mark_changed()
+        if with_content and "content" not in record:
+            content = self._get_content(record)
+            record = {key: value for key, value in record.items() if key not in ("segment", "file_id", "doc")}
+            record["content"] = content
+        return record
+
+    def mark_changed(self) -> None:
+        self.dirty = True
+        self._bitmaps_dirty = True
+
+    def save(self) -> None:
+        """保存前の文書だけを新しいセグメントに書く（削除はマニフェストに記録される）"""
+        with self._lock:
+            self.data["last_updated"] = datetime.now().isoformat()
+            pending = [(file_path, record) for file_path, record in self.files.items() if "content" in record]
+            if pending:
+                writer = SegmentWriter()
+                for file_path, record in pending:
+                    writer.add_document(file_path, record, lambda record=record: record["content"])
+                segment = self._write_segment(self._new_segment_file(), writer)
+                self.segments.append(segment)
+                # 保存前の本文はメモリから外し、書き込んだセグメントから読むようにする
+                for file_id, (file_path, record) in enumerate(pending):
+                    self.files[file_path] = self._stored_record(record, segment, file_id)
+            self.dirty = False
+
+    def _new_segment_file(self) -> str:
+        return f"{self.name}_{uuid.uuid4().hex[:12]}{INDEX_SEGMENT_FILE_EXTENSION}"
+
+    def _write_segment(self, file_name: str, writer: SegmentWriter) -> ShardSegment:
+        data = writer.finish(self.root, self.data["created_at"], self.data["last_updated"])
+        write_file_atomic(self.segment_path(file_name), data)
+        segment = ShardSegment(file_name)
+        segment.reader = IndexSegment(data)
+        return segment
+
+    def plan_merge(self) -> List[ShardSegment]:
+        """まとめるセグメントを選ぶ。まとめる必要がなければ空のリスト
+
+        削除済みの割合が大きいセグメントは単独で書き直し（全て削除済みなら消すだけ）、
+        それ以外は大きさの段（INDEX_MERGE_FACTOR 倍ごと）が同じセグメントが
+        INDEX_MERGE_FACTOR 個溜まったらまとめる。
+        """
+        with self._lock:
+            if not self.loaded:
+                return []
+            for segment in self.segments:
+                if len(segment.deleted) >= len(segment.reader.files) * INDEX_MERGE_DELETED_RATIO:
+                    return [segment]
+
+            tiers: Dict[int, List[ShardSegment]] = {}
+            for segment in self.segments:
+                tiers.setdefault(self._merge_tier(segment), []).append(segment)
+            for tier in sorted(tiers):
+                if len(tiers[tier]) >= INDEX_MERGE_FACTOR:
+                    return tiers[tier]
+            return []
+
+    @staticmethod
+    def _merge_tier(segment: ShardSegment) -> int:
+        size = segment.reader.size
+        if size <= INDEX_MERGE_MIN_SEGMENT_SIZE:
+            return 0
+        return int(math.log(size / INDEX_MERGE_MIN_SEGMENT_SIZE, INDEX_MERGE_FACTOR)) + 1
+
+    def merge_segments(self, segments: List[ShardSegment]) -> None:
+        """セグメントの削除されていないファイルを1つのセグメントに書き直す
+
+        書き込み中も検索・更新できるよう、ロックは対象の確定と置き換えの時だけ取る。
+        まとめている間に更新・削除されたファイルは、新しいセグメント側で削除済みにする。
+        別々のセグメントにあった同じ内容の文書は、ここで1つにまとまる。
+        """
+        with self._lock:
+            live = [(file_path, record) for file_path, record in self.files.items()
+                    if record.get("segment") in segments]
+
+        merged = None
+        if live:
+            writer = SegmentWriter()
+            for file_path, record in live:
+                writer.add_document(file_path, record, lambda record=record: self._get_content(record))
+            merged = self._write_segment(self._new_segment_file(), writer)
+
+        with self._lock:
+            if merged is not None:
+                for file_id, (file_path, record) in enumerate(live):
+                    if self.files.get(file_path) is record:
+                        self.files[file_path] = self._stored_record(record, merged, file_id)
+                    else:
+                        merged.deleted.add(file_id)
+                self.segments.insert(self.segments.index(segments[0]), merged)
+            for segment in segments:
+                self.segments.remove(segment)
+                self.obsolete_files.append(self.segment_path(segment.file))
+
+    def take_obsolete_files(self) -> List[str]:
+        """マニフェストから外れたセグメントファイル（マニフェストの保存後に削除する）"""
+        with self._lock:
+            files, self.obsolete_files = self.obsolete_files, []
+        return files
+
+    def manifest_entry(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats(),
+                root=self.root,
+                created_at=self.data["created_at"],
+                segments=[{"file": segment.file, "deleted": sorted(segment.deleted)} for segment in self.segments]
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        files = self.files
+        return {
+            "files_count": len(files),
+            "total_size": sum(info.get("size", 0) for info in files.values()),
+            "last_updated": self.data.get("last_updated"),
+        }
+
+    def iter_search(self, search_terms: List[str], search_type: str = "AND",
+                    file_extensions: Optional[List[str]] = None,
+                    stop: Optional[threading.Event] = None) -> Iterator[FileMatches]:
+        """一致したファイルから順に返す。stopがセットされたら次の文書を調べる前にやめる"""
+        files = self.files
+        candidates: Dict[ShardSegment, Optional[Set[int]]] = {}
+        # 同じ文書を共有するファイルは、一致の確認を1回だけ行う
+        document_matches: Dict[Tuple[ShardSegment, int, bool], Optional[List[Tuple[int, int, int]]]] = {}
+        for file_path in self._select_documents(file_extensions):
+            if stop is not None and stop.is_set():
+                return
+            file_info = files.get(file_path)
+            if file_info is None:
+                continue
+            segment = file_info.get("segment")
+            if segment is not None:
+                # セグメントごとに、転置リストで検索語を含みうる文書を絞り込む
+                if segment not in candidates:
+                    candidates[segment] = segment.reader.candidate_documents(search_terms, search_type)
+                documents = candidates[segment]
+                if documents is not None and file_info["doc"] not in documents:
+                    continue
+
+                key = (segment, file_info["doc"], file_path.lower().endswith('.pdf'))
+                if key not in document_matches:
+                    document_matches[key] = self._match_file(file_path, file_info, search_terms, search_type)
+                matches = document_matches[key]
+            else:
+                matches = self._match_file(file_path, file_info, search_terms, search_type)
+
+            if matches:
+                yield file_path, matches
+
+    def _match_file(self, file_path: str, file_info: Dict[str, Any], search_terms: List[str],
+                    search_type: str) -> Optional[List[Tuple[int, int, int]]]:
+        content = self._get_content(file_info)
+        if not self._match_search_terms(content, search_terms, search_type):
+            return None
+        return self._find_matches_in_content(content, search_terms, file_path, file_info.get("page_offsets"))
+
+    def _select_documents(self, file_extensions: Optional[List[str]] = None) -> List[str]:
+        """拡張子ビットマップで検索対象の文書を先に絞り込む"""
+        if file_extensions is None:
+            return list(self.files)
+
+        if self._bitmaps_dirty:
+            self._rebuild_extension_bitmaps()
+
+        candidates = 0
+        for ext in {ext.lower() for ext in file_extensions}:
+            candidates |= self._extension_bitmaps.get(ext, 0)
+
+        return [self._doc_paths[doc_id] for doc_id in self._iter_bitmap(candidates)]
+
+    def _rebuild_extension_bitmaps(self) -> None:
+        self._doc_paths = list(self.files)
+
+        doc_ids_by_extension: Dict[str, List[int]] = {}
+        for doc_id, file_path in enumerate(self._doc_paths):
+            file_extension = os.path.splitext(file_path)[1].lower()
+            doc_ids_by_extension.setdefault(file_extension, []).append(doc_id)
+
+        bitmap_size = (len(self._doc_paths) + 7) // 8
+        self._extension_bitmaps = {}
+        for file_extension, doc_ids in doc_ids_by_extension.items():
+            bits = bytearray(bitmap_size)
+            for doc_id in doc_ids:
+                bits[doc_id >> 3] |= 1 << (doc_id & 7)
+            self._extension_bitmaps[file_extension] = int.from_bytes(bits, 'little')
+
+        self._bitmaps_dirty = False
+
+    @staticmethod
+    def _iter_bitmap(bitmap: int):
+        bits = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+        for byte_index, byte in enumerate(bits):
+            while byte:
+                low_bit = byte & -byte
+                yield (byte_index << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    @staticmethod
+    def _match_search_terms(content: str, search_terms: List[str], search_type: str) -> bool:
+        content_lower = content.lower()
+
+        if search_type == "AND":
+            return all(term.lower() in content_lower for term in search_terms)
+        else:  # OR
+            return any(term.lower() in content_lower for term in search_terms)
+
+    @staticmethod
+    def _find_matches_in_content(content: str, search_terms: List[str], file_path: str,
+                                 page_offsets: Optional[List[int]] = None) -> List[Tuple[int, int, int]]:
+        """(ページ/行番号, ページ/ファイル先頭からのオフセット, 検索語番号) のリストを返す"""
+        matches = []
+        terms_lower = [term.lower() for term in search_terms]
+
+        if file_path.lower().endswith('.pdf'):
+            page_offsets = page_offsets or [0]
+            for page_num, page_start in enumerate(page_offsets, 1):
+                page_end = page_offsets[page_num] if page_num < len(page_offsets) else len(content)
+                page_lower = content[page_start:page_end].lower()
+                for term_index, term in enumerate(terms_lower):
+                    found = page_lower.find(term)
+                    if found != -1:
+                        matches.append((page_num, found, term_index))
+                        break  # ページごとに1つのマッチのみ
+                if len(matches) >= MAX_INDEX_MATCHES_PER_FILE:
+                    break
+        else:
+            line_start = 0
+            for line_num, line in enumerate(content.split('\n'), 1):
+                line_lower = line.lower()
+                for term_index, term in enumerate(terms_lower):
+                    found = line_lower.find(term)
+                    if found != -1:
+                        matches.append((line_num, line_start + found, term_index))
+                        break  # 行ごとに1つのマッチのみ
+                if len(matches) >= MAX_INDEX_MATCHES_PER_FILE:
+                    break
+                line_start += len(line) + 1
+
+        return matches
+
+    def get_document_text(self, file_path: str, page_number: Optional[int] = None) -> Optional[str]:
+        """保存された本文（PDFは指定ページ）を返す。古い場合はNone"""
+        file_info = self.files.get(file_path)
+        if not file_info:
+            return None
+
+        try:
+            if os.path.getmtime(file_path) != file_info.get("mtime"):
+                return None
+        except OSError:
+            pass
+
+        if page_number is None:
+            return self._get_content(file_info)
+
+        page_offsets = file_info.get("page_offsets")
+        if not page_offsets or not 1 <= page_number <= len(page_offsets):
+            return None
+
+        page_start = page_offsets[page_number - 1]
+        page_end = page_offsets[page_number] if page_number < len(page_offsets) else None
+        if "content" in file_info:
+            return file_info["content"][page_start:page_end]
+        # 保存済みの文書は、そのページを含むブロックだけを展開する
+        return file_info["segment"].reader.get_text(file_info["doc"], page_start, page_end)
@@ -1,17 +1,26 @@
 import os
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Optional
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from constants import MAX_INDEX_MATCHES_PER_FILE
+from service.hit_locations import HitLocationStore
+from service.result_batcher import ProgressThrottler
+from service.search_daemon import SearchDaemonClient
+from service.search_engine import CancellationToken, FileScanSearch, IndexSearch
+from service.search_hit import FileRegistry, SearchHitBatch
 from service.search_indexer import SearchIndexer
-from service.file_searcher import FileSearcher as OriginalFileSearcher
 
 
 class IndexedFileSearcher(QThread):
+    """インデックス検索（IndexSearch）と直接検索（FileScanSearch）をスレッドで実行する"""
 
-    result_found = pyqtSignal(str, list)
+    results_found = pyqtSignal(object)  # SearchHitBatch
     progress_update = pyqtSignal(int)
     search_completed = pyqtSignal()
     index_status_changed = pyqtSignal(str)
+    # 抜粋の本文を取り出せるもの（get_document_text を持つ SearchIndexer / SearchDaemonClient）。
+    # インデックスは検索スレッドで読み込んでから渡し、GUIスレッドでは読み込まない
+    text_source_ready = pyqtSignal(object)
 
     def __init__(
             self,
@@ -22,7 +31,9 @@ class IndexedFileSearcher(QThread):
             file_extensions: List[str],
             context_length: int,
             use_index: bool = True,
-            index_file_path: str = "search_index.json"
+            index_file_path: str = "search_index.json",
+            file_registry: Optional[FileRegistry] = None,
+            hit_locations: Optional[HitLocationStore] = None
     ):
         super().__init__()
         self.directory = directory
@@ -32,10 +43,18 @@ class IndexedFileSearcher(QThread):
         self.file_extensions = file_extensions
         self.context_length = context_length
         self.use_index = use_index
-        self.cancel_flag = False
-
-        self.indexer = SearchIndexer(index_file_path)
-        self.fallback_searcher = None
+        self.file_registry = file_registry if file_registry is not None else FileRegistry()
+        self.hit_locations = hit_locations if hit_locations is not None else HitLocationStore()
+        self.cancel_token = CancellationToken()
+        self.index_file_path = index_file_path
+        self._indexer: Optional[SearchIndexer] = None
+
+    @property
+    def indexer(self) -> SearchIndexer:
+        # インデックスの読み込みは重いため、最初に必要になった時点（通常は検索スレッド内）で行う
+        if self._indexer is None:
+            self._indexer = SearchIndexer(self.index_file_path)
+        return self._indexer
 
     def run(self) -> None:
         try:
@@ -49,7 +68,7 @@ class IndexedFileSearcher(QThread):
             self.search_completed.emit()
 
     def _is_index_available(self) -> bool:
-        if not os.path.exists(self.indexer.index_file_path):
+        if not os.path.exists(self.index_file_path):
             self.index_status_changed.emit("インデックスファイルが見つかりません")
             return False
 
@@ -61,22 +80,11 @@ class IndexedFileSearcher(QThread):
         return True
 
     def _search_with_index(self) -> None:
+        self.text_source_ready.emit(self.indexer)
+        engine = IndexSearch(self.indexer, self.directory, self.search_terms, self.include_subdirs,
+                             self.search_type, self.file_extensions, self.file_registry, self.hit_locations)
         try:
-            results = self.indexer.search_in_index(self.search_terms, self.search_type)
-
-            total_results = len(results)
-            emitted_count = 0
-            for i, (file_path, matches) in enumerate(results):
-                if self.cancel_flag:
-                    break
-
-                if self._should_include_file(file_path):
-                    self.result_found.emit(file_path, matches)
-                    emitted_count += 1
-
-                progress = int((i + 1) / total_results * 100) if total_results > 0 else 100
-                self.progress_update.emit(progress)
-
+            self._emit_batches(engine.search(self.cancel_token, ProgressThrottler(self.progress_update.emit).update))
         except Exception as e:
             print(f"インデックス検索でエラー: {e}")
             self.index_status_changed.emit("インデックス検索でエラーが発生しました")
@@ -85,44 +93,16 @@ class IndexedFileSearcher(QThread):
     def _search_without_index(self) -> None:
         self.index_status_changed.emit("インデックスなしで検索中...")
 
-        self.fallback_searcher = OriginalFileSearcher(
-            self.directory,
-            self.search_terms,
-            self.include_subdirs,
-            self.search_type,
-            self.file_extensions,
-            self.context_length
-        )
-
-        self.fallback_searcher.result_found.connect(self.result_found.emit)
-        self.fallback_searcher.progress_update.connect(self.progress_update.emit)
-        self.fallback_searcher.search_completed.connect(self.search_completed.emit)
-        self.fallback_searcher.run()
-
-    def _should_include_file(self, file_path: str) -> bool:
-        try:
-            if not os.path.isabs(file_path):
-                file_path = os.path.abspath(file_path)
-
-            file_dir = os.path.normpath(os.path.dirname(file_path))
-            target_dir = os.path.normpath(os.path.abspath(self.directory))
+        engine = FileScanSearch(self.directory, self.search_terms, self.include_subdirs, self.search_type,
+                                self.file_extensions, self.file_registry, self.hit_locations)
+        self._emit_batches(engine.search(self.cancel_token, ProgressThrottler(self.progress_update.emit).update))
 
-            if self.include_subdirs:
-                result = os.path.commonpath([file_dir, target_dir]) == target_dir
-                print(f"フィルタリング: {file_path} -> {result} (target: {target_dir})")
-                return result
-            else:
-                result = file_dir == target_dir
-                print(f"フィルタリング: {file_path} -> {result} (target: {target_dir})")
-                return result
-        except (ValueError, OSError) as e:
-            print(f"フィルタリングエラー: {file_path} - {e}")
-            return True
+    def _emit_batches(self, batches: Iterator[SearchHitBatch]) -> None:
+        for batch in batches:
+            self.results_found.emit(batch)
 
     def cancel_search(self) -> None:
-        self.cancel_flag = True
-        if self.fallback_searcher:
-            self.fallback_searcher.cancel_search()
+        self.cancel_token.cancel()
 
     def create_or_update_index(self, directories: List[str], progress_callback: Optional[callable] = None) -> None:
         self.index_status_changed.emit("インデックスを作成中...")
@@ -196,3 +176,85 @@ class SmartFileSearcher(IndexedFileSearcher):
         except Exception as e:
             print(f"インデックス自動更新チェックでエラー: {e}")
             return False
+
+
+class DaemonFileSearcher(SmartFileSearcher):
+    """検索サービスにインデックス検索を依頼する。サービスが応じない場合はこのプロセスで検索する
+
+    サービスへの接続と生存確認は待たされることがあるため、GUIスレッドではなく検索スレッドで行う。
+    """
+
+    def __init__(self, *args, text_client: Optional[SearchDaemonClient] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.daemon_client: Optional[SearchDaemonClient] = None
+        # 前回の検索で使った抜粋用の接続。生きていれば使い回す
+        self.text_client = text_client
+
+    def run(self) -> None:
+        if self.search_mode != SearchMode.TRADITIONAL and self._connect_daemon() and self._search_with_daemon():
+            self.search_completed.emit()
+            return
+        super().run()
+
+    def _connect_daemon(self) -> bool:
+        self.daemon_client = SearchDaemonClient.connect()
+        if self.daemon_client is None:
+            return False
+
+        if self.text_client is None or self.text_client.ping() is None:
+            if self.text_client is not None:
+                self.text_client.close()
+            self.text_client = SearchDaemonClient.connect()
+        if self.text_client is not None:
+            self.text_source_ready.emit(self.text_client)
+        return True
+
+    def _search_with_daemon(self) -> bool:
+        """検索サービスで検索できた場合はTrue（キャンセルや途中の切断を含む）"""
+        request = {
+            'index_file_path': os.path.abspath(self.index_file_path),
+            'directory': self.directory,
+            'search_terms': self.search_terms,
+            'include_subdirs': self.include_subdirs,
+            'search_type': self.search_type,
+            'file_extensions': self.file_extensions,
+        }
+        progress_throttler = ProgressThrottler(self.progress_update.emit)
+        received_results = False
+
+        try:
+            for message in self.daemon_client.search(request, self.cancel_token):
+                message_type = message['type']
+                if message_type == 'hits':
+                    self.results_found.emit(self._to_batch(message['files']))
+                    received_results = True
+                elif message_type == 'progress':
+                    progress_throttler.update(message['value'])
+                elif message_type == 'status':
+                    self.index_status_changed.emit(message['message'])
+                elif message_type == 'done':
+                    return True
+                else:
+                    print(f"検索サービスで検索できませんでした: {message.get('message')}")
+                    return received_results
+        except (OSError, EOFError, ValueError) as e:
+            print(f"検索サービスとの通信でエラーが発生しました: {e}")
+            if received_results:
+                self.index_status_changed.emit("検索サービスとの接続が切れました")
+            return received_results
+        finally:
+            # 接続はサービスのワーカーを1つ使い続けるため、検索ごとに閉じる
+            self.daemon_client.close()
+
+        # キャンセルされた
+        return True
+
+    def _to_batch(self, files: list) -> SearchHitBatch:
+        batch = SearchHitBatch(self.file_registry)
+        for file_path, matches in files:
+            matches = [tuple(match) for match in matches]
+            batch.add_file_matches(file_path, matches)
+            if file_path.lower().endswith('.pdf'):
+                self.hit_locations.record_pages(file_path, (position for position, _, _ in matches),
+                                                truncated=len(matches) >= MAX_INDEX_MATCHES_PER_FILE)
+        return batch
@@ -0,0 +1,206 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from constants import (
+    PREVIEW_RENDER_ZOOM,
+    PREVIEW_CACHE_MAX_PAGES,
+    PREVIEW_MAX_OPEN_DOCUMENTS
+)
+from service.hit_locations import PdfHitLocations
+from service.pdf_highlight_cache import normalize_search_terms
+
+if TYPE_CHECKING:
+    import fitz
+
+PreviewRequest = Tuple[str, int, List[str], Optional[PdfHitLocations]]
+
+
+class RenderedPage:
+    """描画済みのページ画像（RGB）と、画像座標に変換したハイライト矩形"""
+
+    __slots__ = ('width', 'height', 'stride', 'samples', 'highlight_rects')
+
+    def __init__(self, width: int, height: int, stride: int, samples: bytes,
+                 highlight_rects: List[Tuple[int, float, float, float, float]]):
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.samples = samples
+        self.highlight_rects = highlight_rects  # (検索語番号, x0, y0, x1, y1)
+
+
+class PageRenderer:
+    """PDFページをPyMuPDFで画像化し、LRUキャッシュと先読みで閲覧を高速化する
+
+    PyMuPDFの呼び出し（文書を開く・描画する）は全て1本のワーカースレッドで行い、
+    ロックはキャッシュの参照・更新の間だけ取る。表示するページの描画を頼まれたら、
+    まだ始まっていない先読みは飛ばして先に描画する。
+    """
+
+    def __init__(self, zoom: float = PREVIEW_RENDER_ZOOM, max_pages: int = PREVIEW_CACHE_MAX_PAGES):
+        self.zoom = zoom
+        self.max_pages = max_pages
+        self._pages: "OrderedDict[tuple, RenderedPage]" = OrderedDict()
+        # ワーカースレッドだけが使う
+        self._documents: "OrderedDict[Tuple[str, float], fitz.Document]" = OrderedDict()
+        self._pending: set = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-renderer')
+
+    def render(self, file_path: str, page_number: int, search_terms: List[str],
+               hit_locations: Optional[PdfHitLocations] = None) -> Optional[RenderedPage]:
+        """描画が終わるまで待って返す（GUIスレッドからは render_async を使う）"""
+        return self.render_async(file_path, page_number, search_terms, hit_locations).result()
+
+    def render_async(self, file_path: str, page_number: int, search_terms: List[str],
+                     hit_locations: Optional[PdfHitLocations] = None) -> 'Future[Optional[RenderedPage]]':
+        """ページを描画する Future を返す。キャッシュ済みなら完了済みの Future を返す"""
+        try:
+            key = self._make_key(file_path, page_number, search_terms)
+        except OSError as e:
+            print(f"プレビュー対象のファイルにアクセスできません: {file_path} - {e}")
+            return self._completed(None)
+
+        with self._lock:
+            rendered = self._get_cached(key)
+            if rendered is not None:
+                return self._completed(rendered)
+            # 待っている先読みより先に描画する
+            self._generation += 1
+
+        try:
+            return self._executor.submit(self._render_and_store, key, file_path, page_number,
+                                         search_terms, hit_locations)
+        except RuntimeError:
+            # close() の後
+            return self._completed(None)
+
+    def prefetch(self, requests: Iterable[PreviewRequest]) -> None:
+        for file_path, page_number, search_terms, hit_locations in requests:
+            try:
+                key = self._make_key(file_path, page_number, search_terms)
+            except OSError:
+                continue
+
+            with self._lock:
+                if key in self._pages or key in self._pending:
+                    continue
+                self._pending.add(key)
+                generation = self._generation
+
+            try:
+                self._executor.submit(self._prefetch_one, generation, key, file_path, page_number,
+                                      search_terms, hit_locations)
+            except RuntimeError:
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            self._pages.clear()
+        try:
+            # 描画中の文書を閉じないよう、文書はワーカースレッドで閉じる
+            self._executor.submit(self._close_documents)
+        except RuntimeError:
+            return
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _completed(rendered: Optional[RenderedPage]) -> 'Future[Optional[RenderedPage]]':
+        future = Future()
+        future.set_result(rendered)
+        return future
+
+    def _get_cached(self, key: tuple) -> Optional[RenderedPage]:
+        rendered = self._pages.get(key)
+        if rendered is not None:
+            self._pages.move_to_end(key)
+        return rendered
+
+    def _prefetch_one(self, generation: int, key: tuple, file_path: str, page_number: int,
+                      search_terms: List[str], hit_locations: Optional[PdfHitLocations]) -> None:
+        try:
+            with self._lock:
+                if generation != self._generation:
+                    # 後から表示するページの描画を頼まれた。必要なら次の prefetch で頼み直される
+                    return
+            self._render_and_store(key, file_path, page_number, search_terms, hit_locations)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _render_and_store(self, key: tuple, file_path: str, page_number: int, search_terms: List[str],
+                          hit_locations: Optional[PdfHitLocations]) -> Optional[RenderedPage]:
+        with self._lock:
+            rendered = self._get_cached(key)
+        if rendered is not None:
+            return rendered
+
+        try:
+            rendered = self._render_page(key, file_path, page_number, search_terms, hit_locations)
+        except Exception as e:
+            print(f"プレビューの描画に失敗: {file_path} (ページ {page_number}) - {e}")
+            return None
+
+        with self._lock:
+            self._store(key, rendered)
+        return rendered
+
+    def _close_documents(self) -> None:
+        for doc in self._documents.values():
+            doc.close()
+        self._documents.clear()
+
+    def _make_key(self, file_path: str, page_number: int, search_terms: List[str]) -> tuple:
+        mtime = os.path.getmtime(file_path)
+        terms_key = tuple(term.casefold() for term in normalize_search_terms(search_terms))
+        return file_path, mtime, page_number, self.zoom, terms_key
+
+    def _render_page(self, key: tuple, file_path: str, page_number: int, search_terms: List[str],
+                     hit_locations: Optional[PdfHitLocations]) -> Optional[RenderedPage]:
+        doc = self._open_document(file_path, key[1])
+        if not 1 <= page_number <= doc.page_count:
+            return None
+
+        page = doc[page_number - 1]
+        import fitz
+
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(self.zoom, self.zoom), alpha=False)
+
+        highlight_rects = []
+        for term_index, term in enumerate(normalize_search_terms(search_terms)):
+            rects = hit_locations.get_rects(page_number, term) if hit_locations is not None else None
+            if rects is None:
+                rects = page.search_for(term)
+            for rect in rects:
+                x0, y0, x1, y1 = tuple(rect)
+                highlight_rects.append((term_index, x0 * self.zoom, y0 * self.zoom,
+                                        x1 * self.zoom, y1 * self.zoom))
+
+        return RenderedPage(pixmap.width, pixmap.height, pixmap.stride, bytes(pixmap.samples), highlight_rects)
+
+    def _open_document(self, file_path: str, mtime: float) -> 'fitz.Document':
+        doc_key = (file_path, mtime)
+        doc = self._documents.get(doc_key)
+        if doc is not None:
+            self._documents.move_to_end(doc_key)
+            return doc
+
+        import fitz
+
+        doc = fitz.open(file_path)
+        self._documents[doc_key] = doc
+        while len(self._documents) > PREVIEW_MAX_OPEN_DOCUMENTS:
+            _, evicted = self._documents.popitem(last=False)
+            evicted.close()
+        return doc
+
+    def _store(self, key: tuple, rendered: Optional[RenderedPage]) -> None:
+        if rendered is None:
+            return
+        self._pages[key] = rendered
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
@@ -1,94 +1,44 @@
 import subprocess
-import tempfile
-import time
-import os
-import atexit
-from typing import List, Tuple, Optional
-
-import fitz
-import psutil
-import pyautogui
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, FrozenSet, Iterable, List, Tuple, Optional
 
 from constants import (
     PDF_HIGHLIGHT_COLORS,
-    ACROBAT_WAIT_TIMEOUT,
-    ACROBAT_WAIT_INTERVAL,
-    PAGE_NAVIGATION_RETRY_COUNT,
-    PAGE_NAVIGATION_DELAY,
-    PROCESS_TERMINATE_TIMEOUT,
-    PROCESS_CLEANUP_DELAY,
-    ACROBAT_PROCESS_NAMES
+    PDF_HIGHLIGHT_NEIGHBOR_PAGES,
+    PDF_TWO_PHASE_MIN_PAGES
 )
+from service.artifact_store import close_artifact_store
+from service.hit_locations import PdfHitLocations
+from service.pdf_highlight_cache import get_highlight_cache, normalize_search_terms
+from service.viewer_launcher import PdfViewerLauncher, AcrobatLauncher
 
-_temp_files: List[str] = []
-
-
-def cleanup_temp_files() -> None:
-    global _temp_files
-    for temp_file in _temp_files[:]:
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            _temp_files.remove(temp_file)
-        except (OSError, ValueError) as e:
-            print(f"一時ファイルの削除に失敗: {temp_file} - {e}")
-
-
-atexit.register(cleanup_temp_files)
-
-
-def close_existing_acrobat_processes() -> None:
-    try:
-        acrobat_processes = []
-        for proc in psutil.process_iter(['pid', 'name']):
-            proc_name = proc.info['name'].lower()
-            for acrobat_name in ACROBAT_PROCESS_NAMES:
-                if proc_name == acrobat_name.lower() or proc_name == f"{acrobat_name.lower()}.exe":
-                    acrobat_processes.append(proc)
-                    break
-
-        if acrobat_processes:
-            print(f"既存のAcrobatプロセスが{len(acrobat_processes)}個見つかりました。すべて終了します。")
-
-            for proc in acrobat_processes:
-                try:
-                    print(f"プロセス終了中: {proc.info['name']} (PID: {proc.pid})")
-                    proc.terminate()
-
-                    try:
-                        proc.wait(timeout=PROCESS_TERMINATE_TIMEOUT)
-                        print(f"Acrobatプロセス (PID: {proc.pid}) を正常に終了しました")
-                    except psutil.TimeoutExpired:
-                        proc.kill()
-                        print(f"Acrobatプロセス (PID: {proc.pid}) を強制終了しました")
-
-                except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-                    print(f"プロセス終了中にエラー: {e}")
-                except Exception as e:
-                    print(f"予期せぬエラー: {e}")
-
-            time.sleep(PROCESS_CLEANUP_DELAY)
-
-        else:
-            print("既存のAcrobatプロセスは見つかりませんでした")
+if TYPE_CHECKING:
+    import fitz
 
-    except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-        print(f"プロセス確認中にエラー: {e}")
-    except Exception as e:
-        print(f"予期せぬエラー: {e}")
+_background_executor = ThreadPoolExecutor(max_workers=1)
+_background_keys: set = set()
+_background_lock = threading.Lock()
 
 
-def open_pdf(file_path: str, acrobat_path: str, current_position: int, search_terms: List[str]) -> None:
+def cleanup_temp_files() -> None:
+    """終了時の後片付け。設定に応じて生成物ストアの内容を削除する"""
+    close_artifact_store()
+
+
+def open_pdf(
+        file_path: str,
+        acrobat_path: str,
+        current_position: int,
+        search_terms: List[str],
+        hit_locations: Optional[PdfHitLocations] = None,
+        launcher: Optional[PdfViewerLauncher] = None
+) -> None:
     try:
-        close_existing_acrobat_processes()
-        highlighted_pdf_path = highlight_pdf(file_path, search_terms)
-        process = subprocess.Popen([acrobat_path, highlighted_pdf_path])
-
-        if wait_for_acrobat(process.pid):
-            time.sleep(PROCESS_CLEANUP_DELAY)
-            navigate_to_page(current_position)
-        else:
-            print("Acrobatの起動確認に失敗しました")
+        highlighted_pdf_path = highlight_pdf(file_path, search_terms, current_position, hit_locations)
+        launcher = launcher or AcrobatLauncher(acrobat_path)
+        launcher.open(highlighted_pdf_path, current_position)
 
     except FileNotFoundError:
         raise FileNotFoundError(f"指定されたファイルが見つかりません: {file_path}")
@@ -98,108 +48,163 @@ def open_pdf(file_path: str, acrobat_path: str, current_position: int, search_te
         raise RuntimeError(f"PDFを開く際に予期せぬエラーが発生しました: {str(e)}")
 
 
-def wait_for_acrobat(pid: int, timeout: int = ACROBAT_WAIT_TIMEOUT) -> bool:
-    start_time = time.time()
+def highlight_pdf(
+        pdf_path: str,
+        search_terms: List[str],
+        current_page: Optional[int] = None,
+        hit_locations: Optional[PdfHitLocations] = None
+) -> str:
+    """ハイライト済みPDFのパスを返す
 
-    while time.time() - start_time < timeout:
-        try:
-            process = psutil.Process(pid)
-            if process.status() == psutil.STATUS_RUNNING:
-                time.sleep(ACROBAT_WAIT_INTERVAL)
-                try:
-                    active_window = pyautogui.getActiveWindowTitle()
-                    if active_window and any(acrobat_name in active_window.lower() 
-                                           for acrobat_name in ['acrobat', 'adobe']):
-                        return True
-                except Exception:
-                    pass
-
-        except psutil.NoSuchProcess:
-            return False
-        except Exception as e:
-            print(f"Acrobat待機中にエラー: {e}")
+    hit_locationsがあれば検索時に見つかったページだけを、記録済みの座標で注釈する。
+    current_pageが指定され対象ページが多い場合は、対象ページと前後のページだけを
+    ハイライトしてすぐに返し、残りのページはバックグラウンドで処理する。
+    """
+    import fitz
 
-        time.sleep(ACROBAT_WAIT_INTERVAL)
+    search_terms = normalize_search_terms(search_terms)
+    cache = get_highlight_cache()
 
-    print(f"Acrobat起動のタイムアウト（{timeout}秒）")
-    return False
+    try:
+        variant = hit_locations.fingerprint() if hit_locations is not None else ''
+        cache_key = cache.make_key(pdf_path, search_terms, variant)
+        cached_path = cache.get(cache_key, current_page)
+        if cached_path:
+            return cached_path
+
+        output_path, highlighted_pages = _write_highlighted_pdf(pdf_path, search_terms, current_page, hit_locations)
+        cache.put(cache_key, output_path, highlighted_pages)
+        if highlighted_pages is not None:
+            _schedule_full_highlight(pdf_path, search_terms, cache_key, hit_locations)
+        return output_path
 
+    except fitz.FileDataError:
+        raise ValueError(f"無効なPDFファイル: {pdf_path}")
+    except Exception as e:
+        raise RuntimeError(f"PDFのハイライト処理中にエラーが発生しました: {str(e)}")
 
-def navigate_to_page(page_number: int) -> None:
-    if page_number == 1:
-        return
 
-    try:
-        for attempt in range(PAGE_NAVIGATION_RETRY_COUNT):
-            try:
-                pyautogui.hotkey('ctrl', 'shift', 'n')
-                time.sleep(PAGE_NAVIGATION_DELAY)
+def _annotate_pages(
+        doc: 'fitz.Document',
+        search_terms: List[str],
+        page_numbers: Iterable[int],
+        hit_locations: Optional[PdfHitLocations] = None
+) -> None:
+    import fitz
 
-                pyautogui.hotkey('ctrl', 'a')
-                time.sleep(0.2)
+    for page_number in page_numbers:
+        page = doc[page_number - 1]
+        for i, term in enumerate(search_terms):
+            text_instances = hit_locations.get_rects(page_number, term) if hit_locations is not None else None
+            if text_instances is None:
+                text_instances = page.search_for(term)
 
-                pyautogui.write(str(page_number))
-                time.sleep(PAGE_NAVIGATION_DELAY)
-                pyautogui.press('enter')
+            for inst in text_instances:
+                try:
+                    highlight = page.add_highlight_annot(fitz.Rect(inst))
+                    highlight.set_colors(stroke=PDF_HIGHLIGHT_COLORS[i % len(PDF_HIGHLIGHT_COLORS)])
+                    highlight.update()
+                except Exception as e:
+                    print(f"ハイライト追加エラー (term: {term}): {e}")
+                    continue
 
-                break
 
-            except Exception as e:
-                print(f"ページ移動試行{attempt + 1}でエラー: {e}")
-                if attempt < PAGE_NAVIGATION_RETRY_COUNT - 1:  # 最後の試行でなければ少し待つ
-                    time.sleep(PROCESS_CLEANUP_DELAY)
+def _select_target_pages(page_count: int, hit_locations: Optional[PdfHitLocations]) -> List[int]:
+    if hit_locations is None or hit_locations.truncated:
+        return list(range(1, page_count + 1))
+    return sorted(page for page in hit_locations.pages if 1 <= page <= page_count)
 
-    except Exception as e:
-        print(f"ページ移動中にエラーが発生しました: {str(e)}")
 
+def _select_first_phase_pages(target_pages: List[int], current_page: Optional[int]) -> Optional[FrozenSet[int]]:
+    """先に処理するページを返す。すべて一度に処理する場合はNone"""
+    if current_page is None or len(target_pages) < PDF_TWO_PHASE_MIN_PAGES:
+        return None
+
+    first_page = current_page - PDF_HIGHLIGHT_NEIGHBOR_PAGES
+    last_page = current_page + PDF_HIGHLIGHT_NEIGHBOR_PAGES
+    return frozenset(page for page in target_pages if first_page <= page <= last_page)
 
-def highlight_pdf(pdf_path: str, search_terms: List[str]) -> str:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_path = tmp_file.name
 
-    global _temp_files
-    _temp_files.append(tmp_path)
+def _write_highlighted_pdf(
+        pdf_path: str,
+        search_terms: List[str],
+        current_page: Optional[int] = None,
+        hit_locations: Optional[PdfHitLocations] = None
+) -> Tuple[str, Optional[FrozenSet[int]]]:
+    """元ファイルの複製に注釈を追記保存し、(パス, 処理済みページ) を返す
 
+    処理済みページがNoneの場合は対象ページをすべて処理済み。
+    """
+    cache = get_highlight_cache()
+    output_path = cache.create_output_path()
     doc = None
     try:
-        doc = fitz.open(pdf_path)
+        shutil.copyfile(pdf_path, output_path)
+        import fitz
+
+        doc = fitz.open(output_path)
+
+        target_pages = _select_target_pages(doc.page_count, hit_locations)
+        highlighted_pages = _select_first_phase_pages(target_pages, current_page)
+        pages_to_annotate = target_pages if highlighted_pages is None else sorted(highlighted_pages)
+        _annotate_pages(doc, search_terms, pages_to_annotate, hit_locations)
+
+        if doc.can_save_incrementally():
+            doc.saveIncr()
+            return output_path, highlighted_pages
+
+        full_output_path = cache.create_output_path()
+        doc.save(full_output_path)
+        _close_document(doc)
+        doc = None
+        cleanup_single_temp_file(output_path)
+        return full_output_path, highlighted_pages
+    except Exception:
+        _close_document(doc)
+        doc = None
+        cleanup_single_temp_file(output_path)
+        raise
+    finally:
+        _close_document(doc)
 
-        for page in doc:
-            for i, term in enumerate(search_terms):
-                if not term or not term.strip():
-                    continue
 
-                text_instances = page.search_for(term.strip())
-                for inst in text_instances:
-                    try:
-                        highlight = page.add_highlight_annot(inst)
-                        highlight.set_colors(stroke=PDF_HIGHLIGHT_COLORS[i % len(PDF_HIGHLIGHT_COLORS)])
-                        highlight.update()
-                    except Exception as e:
-                        print(f"ハイライト追加エラー (term: {term}): {e}")
-                        continue
+def _schedule_full_highlight(
+        pdf_path: str,
+        search_terms: List[str],
+        cache_key: str,
+        hit_locations: Optional[PdfHitLocations]
+) -> None:
+    with _background_lock:
+        if cache_key in _background_keys:
+            return
+        _background_keys.add(cache_key)
 
-        doc.save(tmp_path)
-        return tmp_path
+    _background_executor.submit(_complete_highlight, pdf_path, list(search_terms), cache_key, hit_locations)
 
-    except fitz.FileDataError:
-        raise ValueError(f"無効なPDFファイル: {pdf_path}")
+
+def _complete_highlight(
+        pdf_path: str,
+        search_terms: List[str],
+        cache_key: str,
+        hit_locations: Optional[PdfHitLocations]
+) -> None:
+    try:
+        output_path, _ = _write_highlighted_pdf(pdf_path, search_terms, None, hit_locations)
+        get_highlight_cache().put(cache_key, output_path)
     except Exception as e:
-        raise RuntimeError(f"PDFのハイライト処理中にエラーが発生しました: {str(e)}")
+        print(f"バックグラウンドのハイライト処理でエラー: {pdf_path} - {e}")
     finally:
-        if doc is not None:
-            try:
-                doc.close()
-            except Exception as e:
-                print(f"PDF document クローズ時にエラー: {e}")
+        with _background_lock:
+            _background_keys.discard(cache_key)
+
+
+def _close_document(doc: Optional['fitz.Document']) -> None:
+    if doc is not None:
+        try:
+            doc.close()
+        except Exception as e:
+            print(f"PDF document クローズ時にエラー: {e}")
 
 
 def cleanup_single_temp_file(file_path: str) -> None:
-    global _temp_files
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        if file_path in _temp_files:
-            _temp_files.remove(file_path)
-    except (OSError, ValueError) as e:
-        print(f"一時ファイルの削除に失敗: {file_path} - {e}")
+    get_highlight_cache().discard(file_path)
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from constants import FILE_HASH_CHUNK_SIZE
+from service.artifact_store import ArtifactStore, get_artifact_store
+
+ARTIFACT_KIND_PDF = 'pdf'
+
+
+def normalize_search_terms(search_terms: List[str]) -> List[str]:
+    """空の検索語と重複を除き、順序（=ハイライト色）は保持する"""
+    normalized = []
+    seen = set()
+    for term in search_terms:
+        term = term.strip() if term else ''
+        key = term.casefold()
+        if term and key not in seen:
+            seen.add(key)
+            normalized.append(term)
+    return normalized
+
+
+class PdfHighlightCache:
+    """ハイライト済みPDFを (ファイルハッシュ, 検索語) をキーに保持するキャッシュ
+
+    ファイルの保存・削除は生成物ストアに任せる。一部のページだけハイライトしたファイルは、
+    処理済みページの一覧をメタデータとして登録する。
+    """
+
+    def __init__(self, store: Optional[ArtifactStore] = None):
+        self._store = store
+        self._file_hashes: Dict[Tuple[str, float, int], str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> ArtifactStore:
+        if self._store is None:
+            self._store = get_artifact_store()
+        return self._store
+
+    def make_key(self, pdf_path: str, search_terms: List[str], variant: str = '') -> str:
+        """variantにはハイライト対象ページの違いなど、出力を変える追加条件を渡す"""
+        terms_key = '\x1f'.join(term.casefold() for term in normalize_search_terms(search_terms))
+        key_source = f"{self._file_hash(pdf_path)}\x1e{terms_key}\x1e{variant}"
+        return f"{ARTIFACT_KIND_PDF}:{hashlib.sha1(key_source.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str, page_number: Optional[int] = None) -> Optional[str]:
+        """全ページ処理済み、または指定ページを処理済みのファイルを返す"""
+        cached = self.store.get(key)
+        if cached is None:
+            return None
+
+        cached_path, meta = cached
+        pages = meta.get('pages')
+        if pages is not None and (page_number is None or page_number not in pages):
+            return None
+        return cached_path
+
+    def create_output_path(self) -> str:
+        return self.store.create_path(suffix='.pdf')
+
+    def put(self, key: str, cached_path: str, pages: Optional[FrozenSet[int]] = None) -> None:
+        meta = {'pages': sorted(pages) if pages is not None else None}
+        self.store.put(key, cached_path, ARTIFACT_KIND_PDF, meta)
+
+    def discard(self, cached_path: str) -> None:
+        self.store.discard(cached_path)
+
+    def clear(self) -> None:
+        self.store.clear(ARTIFACT_KIND_PDF)
+
+    def _file_hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        identity = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+        with self._lock:
+            file_hash = self._file_hashes.get(identity)
+        if file_hash is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            file_hash = hasher.hexdigest()
+            with self._lock:
+                self._file_hashes[identity] = file_hash
+        return file_hash
+
+
+_highlight_cache = PdfHighlightCache()
+
+
+def get_highlight_cache() -> PdfHighlightCache:
+    return _highlight_cache
@@ -0,0 +1,67 @@
+import time
+from typing import Callable, List, Optional, Tuple
+
+from constants import (
+    RESULT_BATCH_INTERVAL,
+    RESULT_BATCH_MAX_ITEMS,
+    PROGRESS_UPDATE_INTERVAL
+)
+from service.search_hit import FileRegistry, SearchHitBatch
+
+
+class ResultBatcher:
+    """検索結果をまとめて送信し、UIスレッドへのシグナル数を抑える"""
+
+    def __init__(
+        self,
+        emit_batch: Callable[[SearchHitBatch], None],
+        registry: Optional[FileRegistry] = None,
+        interval: float = RESULT_BATCH_INTERVAL,
+        max_items: int = RESULT_BATCH_MAX_ITEMS
+    ):
+        self.emit_batch = emit_batch
+        self.registry = registry if registry is not None else FileRegistry()
+        self.interval = interval
+        self.max_items = max_items
+        self._pending = SearchHitBatch(self.registry)
+        self._last_flush = time.monotonic()
+
+    def add(self, file_path: str, matches: List[Tuple[int, int, int]]) -> None:
+        self._pending.add_file_matches(file_path, matches)
+        if len(self._pending) >= self.max_items:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        if self._pending and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = SearchHitBatch(self.registry)
+        self.emit_batch(batch)
+
+
+class ProgressThrottler:
+    """進捗通知を一定間隔に間引く（0%と100%は必ず通知）"""
+
+    def __init__(self, emit_progress: Callable[[int], None], interval: float = PROGRESS_UPDATE_INTERVAL):
+        self.emit_progress = emit_progress
+        self.interval = interval
+        self._last_value = -1
+        self._last_emit = 0.0
+
+    def update(self, value: int) -> None:
+        if value == self._last_value:
+            return
+
+        now = time.monotonic()
+        if value in (0, 100) or now - self._last_emit >= self.interval:
+            self._last_value = value
+            self._last_emit = now
+            self.emit_progress(value)
@@ -0,0 +1,355 @@
+import getpass
+import hashlib
+import json
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import AuthenticationError, Client, Connection, Listener
+from typing import Any, Dict, Iterator, Optional
+
+from constants import (
+    SEARCH_DAEMON_NAME,
+    SEARCH_DAEMON_KEY_FILENAME,
+    SEARCH_DAEMON_KEY_BYTES,
+    SEARCH_DAEMON_MAX_CLIENTS,
+    SEARCH_DAEMON_IDLE_TIMEOUT,
+    SEARCH_DAEMON_POLL_INTERVAL
+)
+from service.result_batcher import ProgressThrottler
+from service.search_engine import CancellationToken, IndexSearch
+from service.search_indexer import SearchIndexer
+
+Message = Dict[str, Any]
+
+
+def _user_tag() -> str:
+    """ユーザーごとに異なる名前を作るための識別子（ターミナルサーバーでは利用者ごとにサービスを起動する）"""
+    user = f"{os.environ.get('USERDOMAIN', '')}\\{getpass.getuser()}".lower()
+    return hashlib.sha1(user.encode('utf-8')).hexdigest()[:16]
+
+
+def _private_directory(path: str) -> str:
+    """本人だけが読み書きできるフォルダを用意する（他のユーザーが先に作ったものは使わない）"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if sys.platform != 'win32':
+        info = os.lstat(path)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+            raise PermissionError(f"検索サービス用のフォルダを安全に使えません: {path}")
+        if stat.S_IMODE(info.st_mode) != 0o700:
+            os.chmod(path, 0o700)
+    return path
+
+
+def _key_directory() -> str:
+    # Windowsの LOCALAPPDATA は既定で本人しかアクセスできない
+    base = os.environ.get('LOCALAPPDATA') if sys.platform == 'win32' else None
+    return _private_directory(os.path.join(base or os.path.expanduser('~'), f'.{SEARCH_DAEMON_NAME}'))
+
+
+def load_daemon_authkey(create: bool = False) -> Optional[bytes]:
+    """このユーザー用の認証キーを返す。create の場合はなければ作る（キーのファイルは本人だけが読める）
+
+    キーを知っている相手としか接続を確立しないため（クライアント・サービスの双方で確認する）、
+    他のユーザーはパイプを開けても要求を送れず、偽のサービスにも接続しない。
+    """
+    key_path = os.path.join(_key_directory(), SEARCH_DAEMON_KEY_FILENAME)
+    for _ in range(50):
+        try:
+            with open(key_path, 'rb') as f:
+                key = f.read()
+        except FileNotFoundError:
+            if not create:
+                return None
+            try:
+                fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_bytes(SEARCH_DAEMON_KEY_BYTES))
+            continue
+        if len(key) == SEARCH_DAEMON_KEY_BYTES:
+            return key
+        # 他のプロセスが書き込んでいる途中
+        time.sleep(0.01)
+    raise RuntimeError(f"検索サービスの認証キーを読み込めません: {key_path}")
+
+
+def default_daemon_address() -> str:
+    """ユーザーごとのアドレス。Windowsは名前付きパイプ、それ以外は本人専用フォルダ内のUNIXソケット"""
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\{SEARCH_DAEMON_NAME}_{_user_tag()}'
+    directory = _private_directory(os.path.join(tempfile.gettempdir(), f'{SEARCH_DAEMON_NAME}_{os.getuid()}'))
+    return os.path.join(directory, 'search.sock')
+
+
+def _send(conn: Connection, message: Message) -> None:
+    # pickleは受信側でコードを実行できてしまうため、やり取りはJSONに限る
+    conn.send_bytes(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+
+
+def _receive(conn: Connection) -> Message:
+    return json.loads(conn.recv_bytes().decode('utf-8'))
+
+
+def _same_path(path1: str, path2: str) -> bool:
+    return os.path.normcase(os.path.abspath(path1)) == os.path.normcase(os.path.abspath(path2))
+
+
+class SearchDaemon:
+    """インデックスを読み込んだまま常駐し、ローカル接続からの検索要求に応える
+
+    要求ごとにJSONのメッセージを受け取り、検索結果は見つかった順に複数のメッセージで返す。
+    インデックスファイルが更新された場合は次の要求の前に読み込み直す。
+
+    要求（op）:
+        ping          サービスの状態を返す
+        search        検索して hits / progress / status を順に送り、最後に done を送る
+        document_text インデックスに保存された本文（PDFはページ）を返す
+        shutdown      サービスを終了する
+    """
+
+    def __init__(self, index_file_path: str,
+                 address: Optional[str] = None, authkey: Optional[bytes] = None,
+                 max_clients: int = SEARCH_DAEMON_MAX_CLIENTS):
+        self.index_file_path = os.path.abspath(index_file_path)
+        self.address = address or default_daemon_address()
+        self.authkey = authkey or load_daemon_authkey(create=True)
+        self.max_clients = max_clients
+        self._indexer: Optional[SearchIndexer] = None
+        self._index_mtime: Optional[float] = None
+        self._index_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._listener: Optional[Listener] = None
+
+    def serve_forever(self) -> None:
+        self._prepare_address()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.get_indexer()
+        print(f"検索サービスを開始しました: {self.address}")
+
+        with ThreadPoolExecutor(max_workers=self.max_clients) as executor:
+            while not self._stopping.is_set():
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    if not self._stopping.is_set():
+                        print(f"検索サービスへの接続を受け付けられませんでした: {e}")
+                    continue
+                if self._stopping.is_set():
+                    conn.close()
+                    break
+                executor.submit(self._serve_connection, conn)
+
+        self._listener.close()
+        print("検索サービスを終了しました")
+
+    def stop(self) -> None:
+        self._stopping.set()
+        # accept() で待っているスレッドを起こすため、自分自身に接続する
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+
+    def _prepare_address(self) -> None:
+        if sys.platform == 'win32' or not os.path.exists(self.address):
+            return
+        if SearchDaemonClient.connect(self.address, self.authkey) is not None:
+            raise RuntimeError(f"検索サービスはすでに起動しています: {self.address}")
+        # 異常終了したサービスのソケットファイルが残っている
+        os.remove(self.address)
+
+    def get_indexer(self) -> SearchIndexer:
+        """読み込み済みのインデックスを返す。ファイルが更新されていれば読み込み直す"""
+        try:
+            mtime = os.path.getmtime(self.index_file_path)
+        except OSError:
+            mtime = None
+
+        with self._index_lock:
+            if self._indexer is None or mtime != self._index_mtime:
+                self._indexer = SearchIndexer(self.index_file_path)
+                self._index_mtime = mtime
+            return self._indexer
+
+    def _serve_connection(self, conn: Connection) -> None:
+        try:
+            while not self._stopping.is_set():
+                try:
+                    if not self._wait_for_request(conn):
+                        break
+                    request = _receive(conn)
+                except (EOFError, OSError):
+                    break
+                if not self._handle_request(conn, request):
+                    break
+        except Exception as e:
+            print(f"検索サービスで要求の処理中にエラーが発生しました: {e}")
+        finally:
+            conn.close()
+
+    def _wait_for_request(self, conn: Connection) -> bool:
+        """次の要求が届いたらTrue。接続ごとにワーカーを1つ使うため、使われていない接続と終了時はFalse"""
+        deadline = time.monotonic() + SEARCH_DAEMON_IDLE_TIMEOUT
+        while not self._stopping.is_set():
+            if conn.poll(SEARCH_DAEMON_POLL_INTERVAL):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+        return False
+
+    def _handle_request(self, conn: Connection, request: Message) -> bool:
+        """要求を処理する。接続を閉じる場合はFalse"""
+        op = request.get('op')
+        if op == 'ping':
+            stats = self.get_indexer().get_index_stats()
+            _send(conn, {'type': 'pong', 'index_file_path': self.index_file_path,
+                         'files_count': stats['files_count'], 'pid': os.getpid()})
+        elif op == 'search':
+            return self._handle_search(conn, request)
+        elif op == 'document_text':
+            text = self.get_indexer().get_document_text(request['file_path'], request.get('page_number'))
+            _send(conn, {'type': 'document_text', 'text': text})
+        elif op == 'shutdown':
+            _send(conn, {'type': 'done'})
+            threading.Thread(target=self.stop, daemon=True).start()
+            return False
+        else:
+            _send(conn, {'type': 'error', 'message': f"不明な要求です: {op}"})
+        return True
+
+    def _handle_search(self, conn: Connection, request: Message) -> bool:
+        if not _same_path(request.get('index_file_path', ''), self.index_file_path):
+            _send(conn, {'type': 'unsupported', 'message': "検索サービスのインデックスが異なります"})
+            return True
+
+        token = CancellationToken()
+        progress = ProgressThrottler(lambda value: _send(conn, {'type': 'progress', 'value': value}))
+        engine_arguments = (request['directory'], request['search_terms'], request['include_subdirs'],
+                            request['search_type'], request['file_extensions'])
+
+        indexer = self.get_indexer()
+        if indexer.get_index_stats()['files_count'] == 0:
+            # フォルダの直接検索は利用者の権限で行うよう、クライアント側に任せる
+            _send(conn, {'type': 'unsupported', 'message': "検索サービスのインデックスが空です"})
+            return True
+
+        engine = IndexSearch(indexer, *engine_arguments)
+
+        try:
+            _send(conn, {'type': 'status', 'message': "検索サービスのインデックスで検索中..."})
+            for batch in engine.search(token, progress.update):
+                _send(conn, {
+                    'type': 'hits',
+                    'files': [[file_path, [[hit.position, hit.offset, hit.term_id] for hit in hits]]
+                              for file_path, hits in batch.iter_files()],
+                })
+            _send(conn, {'type': 'done'})
+        except (OSError, EOFError):
+            # クライアントが接続を閉じた（検索のキャンセル）
+            token.cancel()
+            return False
+        except Exception as e:
+            print(f"検索サービスで検索中にエラーが発生しました: {e}")
+            _send(conn, {'type': 'error', 'message': str(e)})
+        return True
+
+
+class SearchDaemonClient:
+    """検索サービスへの接続。サービスが起動していなければ connect() はNoneを返す
+
+    接続はサービス側のワーカーを1つ使い続けるため、使い終わったら close() する。
+    要求の無いまま SEARCH_DAEMON_IDLE_TIMEOUT が過ぎた接続はサービス側で閉じられる。
+    """
+
+    def __init__(self, conn: Connection, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        self._conn = conn
+        self._address = address
+        self._authkey = authkey
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, address: Optional[str] = None,
+                authkey: Optional[bytes] = None) -> Optional['SearchDaemonClient']:
+        try:
+            address = address or default_daemon_address()
+            if sys.platform != 'win32' and not os.path.exists(address):
+                return None
+            # キーがなければ、このユーザーのサービスは起動したことがない
+            authkey = authkey or load_daemon_authkey()
+            if authkey is None:
+                return None
+            return cls(Client(address, authkey=authkey), address, authkey)
+        except (OSError, EOFError, AuthenticationError, RuntimeError):
+            return None
+
+    def request(self, message: Message) -> Message:
+        with self._lock:
+            _send(self._conn, message)
+            return _receive(self._conn)
+
+    def ping(self) -> Optional[Message]:
+        try:
+            return self.request({'op': 'ping'})
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def get_document_text(self, file_path: str, page_number: Optional[int] = None) -> Optional[str]:
+        """SnippetProvider から indexer の代わりに使う。使われずに閉じられた接続は1度だけ接続し直す"""
+        message = {'op': 'document_text', 'file_path': file_path, 'page_number': page_number}
+        try:
+            response = self.request(message)
+        except (OSError, EOFError, ValueError):
+            if not self._reconnect():
+                return None
+            try:
+                response = self.request(message)
+            except (OSError, EOFError, ValueError):
+                return None
+        return response.get('text')
+
+    def _reconnect(self) -> bool:
+        if self._address is None:
+            return False
+        with self._lock:
+            self.close()
+            try:
+                self._conn = Client(self._address, authkey=self._authkey)
+            except (OSError, EOFError, AuthenticationError):
+                return False
+        return True
+
+    def search(self, request: Message, token: Optional[CancellationToken] = None,
+               poll_interval: float = SEARCH_DAEMON_POLL_INTERVAL) -> Iterator[Message]:
+        """検索結果のメッセージを順に返す。tokenがキャンセルされたら接続を閉じて終了する"""
+        token = token or CancellationToken()
+        with self._lock:
+            _send(self._conn, dict(request, op='search'))
+            while not token.cancelled:
+                if not self._conn.poll(poll_interval):
+                    continue
+                message = _receive(self._conn)
+                yield message
+                if message['type'] in ('done', 'error', 'unsupported'):
+                    return
+
+        # 送信途中の結果が残っているため、この接続は使い続けない
+        self.close()
+
+    def shutdown(self) -> None:
+        try:
+            self.request({'op': 'shutdown'})
+        except (OSError, EOFError, ValueError):
+            pass
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._conn.close()
+        except OSError:
+            pass
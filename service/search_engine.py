@@ -0,0 +1,257 @@
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Deque, Iterator, List, Optional, Tuple
+
+from constants import (
+    SEARCH_METHODS_MAPPING,
+    MAX_SEARCH_RESULTS_PER_FILE,
+    MAX_INDEX_MATCHES_PER_FILE,
+    SEARCH_TYPE_AND,
+    SEARCH_TYPE_OR,
+    COLLECT_PDF_HIT_RECTS
+)
+from service.directory_scanner import DirectoryScanner
+from service.hit_locations import HitLocationStore, PdfHitLocations
+from service.result_batcher import ResultBatcher
+from service.search_hit import FileRegistry, SearchHitBatch
+from utils.helpers import normalize_path, check_file_accessibility, read_file_with_auto_encoding
+
+if TYPE_CHECKING:
+    import fitz
+
+    from service.search_indexer import SearchIndexer
+
+ProgressCallback = Callable[[int], None]
+FileMatches = Tuple[str, List[Tuple[int, int, int]]]
+
+
+class CancellationToken:
+    """検索の中断要求を、検索を実行しているスレッドへ伝える"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+def is_under_directory(file_path: str, directory: str, include_subdirs: bool) -> bool:
+    file_dir = os.path.normpath(os.path.dirname(os.path.abspath(file_path)))
+    target_dir = os.path.normpath(os.path.abspath(directory))
+    if not include_subdirs:
+        return os.path.normcase(file_dir) == os.path.normcase(target_dir)
+    try:
+        return os.path.normcase(os.path.commonpath([file_dir, target_dir])) == os.path.normcase(target_dir)
+    except ValueError:
+        return False
+
+
+class _BatchQueue:
+    """ResultBatcherが送り出したバッチを溜めて、ジェネレータから順に返す"""
+
+    def __init__(self, registry: FileRegistry):
+        self._ready: List[SearchHitBatch] = []
+        self.batcher = ResultBatcher(self._ready.append, registry)
+
+    def drain(self) -> Iterator[SearchHitBatch]:
+        while self._ready:
+            yield self._ready.pop(0)
+
+
+class FileScanSearch:
+    """フォルダ内のファイルを直接読み込んで検索する（Qtに依存しない）
+
+    search() はヒットをまとめた SearchHitBatch を見つかった順に返すジェネレータで、
+    CancellationToken で途中終了できる。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        search_terms: List[str],
+        include_subdirs: bool,
+        search_type: str,
+        file_extensions: List[str],
+        file_registry: Optional[FileRegistry] = None,
+        hit_locations: Optional[HitLocationStore] = None
+    ):
+        self.directory = directory
+        self.search_terms = search_terms
+        self.include_subdirs = include_subdirs
+        self.search_type = search_type
+        self.file_extensions = [ext.lower() for ext in file_extensions]
+        self.file_registry = file_registry if file_registry is not None else FileRegistry()
+        self.hit_locations = hit_locations if hit_locations is not None else HitLocationStore()
+
+    def search(self, token: Optional[CancellationToken] = None,
+               progress_callback: Optional[ProgressCallback] = None) -> Iterator[SearchHitBatch]:
+        token = token or CancellationToken()
+        report_progress = progress_callback or (lambda value: None)
+        queue = _BatchQueue(self.file_registry)
+        scanner = DirectoryScanner()
+        pending: Deque[Future] = deque()
+
+        # 一覧が返ってきたファイルから順に検索を始め、完了したものから結果を返す
+        with ThreadPoolExecutor() as executor:
+            for entry in scanner.scan([self.directory], self.include_subdirs, self.file_extensions, token):
+                pending.append(executor.submit(self.search_file, entry.path))
+                while pending and pending[0].done():
+                    self._collect(pending.popleft(), queue)
+                yield from queue.drain()
+                report_progress(scanner.progress())
+
+            while pending and not token.cancelled:
+                self._collect(pending.popleft(), queue)
+                yield from queue.drain()
+            for future in pending:
+                future.cancel()
+
+        if not token.cancelled:
+            report_progress(100)
+        queue.batcher.flush()
+        yield from queue.drain()
+
+    @staticmethod
+    def _collect(future: Future, queue: _BatchQueue) -> None:
+        result = future.result()
+        if result:
+            file_path, matches = result
+            queue.batcher.add(file_path, matches)
+        else:
+            queue.batcher.flush_if_due()
+
+    def search_file(self, file_path: str) -> Optional[FileMatches]:
+        normalized_path = normalize_path(file_path)
+        if not check_file_accessibility(normalized_path):
+            return None
+
+        file_extension = os.path.splitext(normalized_path)[1].lower()
+        method_name = SEARCH_METHODS_MAPPING.get(file_extension)
+        if not method_name:
+            print(f"サポートされていないファイル形式: {file_extension}")
+            return None
+
+        try:
+            return getattr(self, method_name)(normalized_path)
+        except Exception as e:
+            print(f"検索エラー: {normalized_path} - {e}")
+            return None
+
+    def search_pdf(self, file_path: str) -> Optional[FileMatches]:
+        results = []
+        locations = PdfHitLocations()
+        doc = None
+        try:
+            import fitz
+
+            doc = fitz.open(file_path)
+            for page_num, page in enumerate(doc):
+                text = page.get_text()
+                if self.match_search_terms(text):
+                    for term_index, search_term in enumerate(self.search_terms):
+                        for match in re.finditer(re.escape(search_term), text, re.IGNORECASE):
+                            results.append((page_num + 1, match.start(), term_index))
+                    self._record_page_hits(locations, page, page_num + 1)
+                if len(results) >= MAX_SEARCH_RESULTS_PER_FILE:
+                    # 残りのページは調べていないため、ハイライトでは全ページを対象にする
+                    locations.truncated = page_num + 1 < doc.page_count
+                    break
+        except Exception as e:
+            print(f"PDFの処理中にエラーが発生しました: {file_path} - {str(e)}")
+        finally:
+            if doc is not None:
+                doc.close()
+        if results:
+            self.hit_locations.record(file_path, locations)
+        return (file_path, results) if results else None
+
+    def _record_page_hits(self, locations: PdfHitLocations, page: 'fitz.Page', page_number: int) -> None:
+        """ヒットしたページを記録する。COLLECT_PDF_HIT_RECTS の場合は矩形も記録し、ハイライト時の再検索を省く"""
+        if not COLLECT_PDF_HIT_RECTS:
+            locations.add_page(page_number)
+            return
+
+        for search_term in self.search_terms:
+            rects = page.search_for(search_term)
+            locations.add_rects(page_number, search_term, (tuple(rect) for rect in rects))
+
+    def search_text(self, file_path: str) -> Optional[FileMatches]:
+        results = []
+        try:
+            content = read_file_with_auto_encoding(file_path)
+            if self.match_search_terms(content):
+                for term_index, search_term in enumerate(self.search_terms):
+                    line_number = 1
+                    counted_until = 0
+                    for match in re.finditer(re.escape(search_term), content, re.IGNORECASE):
+                        line_number += content.count('\n', counted_until, match.start())
+                        counted_until = match.start()
+                        results.append((line_number, match.start(), term_index))
+        except UnicodeDecodeError as e:
+            print(f"ファイルのデコードエラー: {file_path} - {str(e)}")
+        except ValueError as e:
+            print(f"ファイルの読み込みに失敗しました: {file_path} - {str(e)}")
+        return (file_path, results) if results else None
+
+    def match_search_terms(self, text: str) -> bool:
+        if self.search_type == SEARCH_TYPE_AND:
+            return all(term.lower() in text.lower() for term in self.search_terms)
+        elif self.search_type == SEARCH_TYPE_OR:
+            return any(term.lower() in text.lower() for term in self.search_terms)
+        return False
+
+
+class IndexSearch:
+    """インデックスを検索し、対象フォルダ内のヒットをバッチで返す（Qtに依存しない）"""
+
+    def __init__(
+        self,
+        indexer: 'SearchIndexer',
+        directory: str,
+        search_terms: List[str],
+        include_subdirs: bool,
+        search_type: str,
+        file_extensions: List[str],
+        file_registry: Optional[FileRegistry] = None,
+        hit_locations: Optional[HitLocationStore] = None
+    ):
+        self.indexer = indexer
+        self.directory = directory
+        self.search_terms = search_terms
+        self.include_subdirs = include_subdirs
+        self.search_type = search_type
+        self.file_extensions = file_extensions
+        self.file_registry = file_registry if file_registry is not None else FileRegistry()
+        self.hit_locations = hit_locations if hit_locations is not None else HitLocationStore()
+
+    def search(self, token: Optional[CancellationToken] = None,
+               progress_callback: Optional[ProgressCallback] = None) -> Iterator[SearchHitBatch]:
+        token = token or CancellationToken()
+        report_progress = progress_callback or (lambda value: None)
+        queue = _BatchQueue(self.file_registry)
+
+        report_progress(0)
+        for file_path, matches in self.indexer.iter_search_in_index(
+                self.search_terms, self.search_type, file_extensions=self.file_extensions,
+                directory=self.directory):
+            if token.cancelled:
+                break
+            if not is_under_directory(file_path, self.directory, self.include_subdirs):
+                continue
+
+            queue.batcher.add(file_path, matches)
+            if file_path.lower().endswith('.pdf'):
+                self.hit_locations.record_pages(file_path, (position for position, _, _ in matches),
+                                                truncated=len(matches) >= MAX_INDEX_MATCHES_PER_FILE)
+            yield from queue.drain()
+
+        queue.batcher.flush()
+        yield from queue.drain()
+        report_progress(100)
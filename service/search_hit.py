@@ -0,0 +1,94 @@
+import threading
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+
+class FileRegistry:
+    """ファイルパスを整数IDに変換して共有する（スレッドセーフ）"""
+
+    def __init__(self):
+        self._paths: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, file_path: str) -> int:
+        file_id = self._ids.get(file_path)
+        if file_id is not None:
+            return file_id
+
+        with self._lock:
+            file_id = self._ids.get(file_path)
+            if file_id is None:
+                file_id = len(self._paths)
+                self._paths.append(file_path)
+                self._ids[file_path] = file_id
+            return file_id
+
+    def path(self, file_id: int) -> str:
+        return self._paths[file_id]
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+class SearchHit:
+    __slots__ = ('file_id', 'position', 'offset', 'term_id')
+
+    def __init__(self, file_id: int, position: int, offset: int, term_id: int):
+        self.file_id = file_id
+        self.position = position
+        self.offset = offset
+        self.term_id = term_id
+
+    def __repr__(self) -> str:
+        return (f"SearchHit(file_id={self.file_id}, position={self.position}, "
+                f"offset={self.offset}, term_id={self.term_id})")
+
+
+class SearchHitBatch:
+    """検索結果を列ごとの配列で保持するバッチ
+
+    シグナルでは参照のまま受け渡し、受け側は配列単位でコピーする。
+    file_runsには同一ファイルの結果が始まるバッチ内位置を記録する。
+    """
+
+    __slots__ = ('registry', 'file_ids', 'positions', 'offsets', 'term_ids', 'file_runs')
+
+    def __init__(self, registry: FileRegistry):
+        self.registry = registry
+        self.file_ids = array('I')
+        self.positions = array('I')
+        self.offsets = array('Q')
+        self.term_ids = array('H')
+        self.file_runs = array('I')
+
+    def add_file_matches(self, file_path: str, matches: List[Tuple[int, int, int]]) -> None:
+        if not matches:
+            return
+
+        file_id = self.registry.intern(file_path)
+        self.file_runs.append(len(self.file_ids))
+        self.file_ids.extend([file_id] * len(matches))
+        for position, offset, term_id in matches:
+            self.positions.append(position)
+            self.offsets.append(offset)
+            self.term_ids.append(term_id)
+
+    def file_path(self, index: int) -> str:
+        return self.registry.path(self.file_ids[index])
+
+    def iter_files(self) -> Iterator[Tuple[str, List[SearchHit]]]:
+        run_ends = list(self.file_runs[1:]) + [len(self)]
+        for start, end in zip(self.file_runs, run_ends):
+            yield self.file_path(start), [self[i] for i in range(start, end)]
+
+    def __len__(self) -> int:
+        return len(self.file_ids)
+
+    def __getitem__(self, index: int) -> SearchHit:
+        return SearchHit(self.file_ids[index], self.positions[index],
+                         self.offsets[index], self.term_ids[index])
+
+    def __iter__(self) -> Iterator[SearchHit]:
+        for i in range(len(self)):
+            yield self[i]
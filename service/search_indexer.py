@@ -1,114 +1,200 @@
 import hashlib
 import json
 import os
-import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import fitz
-
-from constants import SUPPORTED_FILE_EXTENSIONS
+from constants import (
+    SUPPORTED_FILE_EXTENSIONS,
+    FILE_HASH_CHUNK_SIZE,
+    INDEX_SHARD_DIR_SUFFIX,
+    INDEX_SEARCH_MAX_WORKERS,
+    INDEX_RETIRED_FILE_KEEP_SECONDS
+)
+from service.directory_scanner import DirectoryScanner, ScanEntry
+from service.index_segment import CONTENT_HASH_PREFIX
+from service.index_shard import IndexShard, LEGACY_SHARD_ROOT, write_json_atomic
 from utils.helpers import read_file_with_auto_encoding
 
+_SHARD_FINISHED = object()
+
 
 class SearchIndexer:
+    """検索対象フォルダ（ルート）ごとのシャードをまとめて扱うインデックス
+
+    index_file_path にはシャードの一覧（マニフェスト）を保存し、各シャードは
+    「インデックスファイル名_shards」フォルダに別ファイルで保存する。
+    シャードは使う時点で読み込み、更新した文書だけを新しいセグメントとして追記する。
+    セグメントの統合は保存後にバックグラウンドで行う。
+    検索は複数のシャードを並行して調べ、見つかった順に結果を返す。
+    """
+
     def __init__(self, index_file_path: str = "search_index.json"):
         self.index_file_path = index_file_path
-        self.index_data = {
-            "version": "1.0",
-            "created_at": None,
-            "last_updated": None,
-            "files": {}  # file_path: {content, mtime, size, hash}
-        }
+        self.shard_dir = os.path.splitext(index_file_path)[0] + INDEX_SHARD_DIR_SUFFIX
+        self.manifest: Dict[str, Any] = {}
+        self.shards: Dict[str, IndexShard] = {}
+        self._removed_files: List[str] = []
+        self._save_lock = threading.RLock()
+        self._merge_executor: Optional[ThreadPoolExecutor] = None
+        self._merge_future: Optional[Future] = None
         self._load_existing_index()
     
     def _load_existing_index(self) -> None:
-        if os.path.exists(self.index_file_path):
-            try:
-                with open(self.index_file_path, encoding='utf-8') as f:
-                    self.index_data = json.load(f)
-                print(f"既存のインデックスを読み込みました: {len(self.index_data.get('files', {}))} ファイル")
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"インデックスファイルの読み込みに失敗: {e}")
-                self._initialize_new_index()
-        else:
+        if not os.path.exists(self.index_file_path):
             self._initialize_new_index()
+            return
+
+        try:
+            with open(self.index_file_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"インデックスファイルの読み込みに失敗: {e}")
+            self._initialize_new_index()
+            return
+
+        if "shards" in data:
+            self.manifest = data
+            for key, info in data["shards"].items():
+                self.shards[key] = IndexShard(info["root"], self.shard_dir, self._shard_name(key), info)
+            print(f"既存のインデックスを読み込みました: {self._count_files()} ファイル（{len(self.shards)} フォルダ）")
+            return
+
+        # 旧形式（全ファイルを1つに保存したインデックス）は、次の更新時にフォルダごとへ振り分ける
+        self._initialize_new_index()
+        self.manifest["created_at"] = data.get("created_at") or self.manifest["created_at"]
+        legacy_shard = self._get_or_create_shard(LEGACY_SHARD_ROOT)
+        legacy_shard.replace_files(data.get("files", {}))
+        print(f"既存のインデックスを読み込みました: {len(legacy_shard.files)} ファイル（旧形式）")
     
     def _initialize_new_index(self) -> None:
-        """新しいインデックスを初期化"""
-        self.index_data = {
-            "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "last_updated": None,
-            "files": {}
-        }
+        """新しいインデックスを初期化（既存のシャードは次の保存時に削除する）"""
+        # shards と _removed_files はセグメント統合のスレッドからも参照するため、変更は _save_lock の中で行う
+        with self._save_lock:
+            for shard in self.shards.values():
+                self._removed_files.extend(shard.segment_paths())
+            self.shards = {}
+            self.manifest = {
+                "version": "2.0",
+                "created_at": datetime.now().isoformat(),
+                "last_updated": None,
+                "shards": {},  # root_key: {root, segments, files_count, total_size, created_at, last_updated}
+                "retired_files": self.manifest.get("retired_files", [])  # [{file, retired_at}] 削除待ちのファイル
+            }
+
+    def reset_shards(self, directories: List[str]) -> None:
+        """指定したフォルダのシャードだけを空にする（他のフォルダのインデックスはそのまま）"""
+        with self._save_lock:
+            for directory in directories:
+                shard = self.shards.pop(self._shard_key(directory), None)
+                if shard is not None:
+                    self._removed_files.extend(shard.segment_paths())
+
+    @staticmethod
+    def _shard_key(root: str) -> str:
+        if root == LEGACY_SHARD_ROOT:
+            return LEGACY_SHARD_ROOT
+        return os.path.normcase(os.path.normpath(os.path.abspath(root)))
+
+    @staticmethod
+    def _shard_name(key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def _get_or_create_shard(self, root: str) -> IndexShard:
+        key = self._shard_key(root)
+        with self._save_lock:
+            shard = self.shards.get(key)
+            if shard is None:
+                shard_root = os.path.normpath(os.path.abspath(root)) if root != LEGACY_SHARD_ROOT else root
+                shard = IndexShard(shard_root, self.shard_dir, self._shard_name(key))
+                # 新しいシャードは空から作る
+                shard.loaded = True
+                self.shards[key] = shard
+            return shard
     
     def create_index(self, directories: List[str], include_subdirs: bool = True, 
                     progress_callback: Optional[callable] = None) -> None:
 
-        file_list = self._get_file_list(directories, include_subdirs)
-        total_files = len(file_list)
+        file_lists = [(directory, self._get_file_list([directory], include_subdirs)) for directory in directories]
+        total_files = sum(len(entries) for _, entries in file_lists)
         print(f"対象ファイル数: {total_files}")
         
         processed = 0
         updated_files = 0
         
-        for file_path in file_list:
-            try:
-                if self._should_update_file(file_path):
-                    self._process_file(file_path)
-                    updated_files += 1
-                
-                processed += 1
-                
-                if progress_callback:
-                    progress_callback(processed, total_files)
+        for directory, entries in file_lists:
+            if not entries and self._shard_key(directory) not in self.shards:
+                continue
+            shard = self._get_or_create_shard(directory)
 
-                if processed % max(1, total_files // 10) == 0:
-                    print(f"進行状況: {processed}/{total_files} ({(processed/total_files)*100:.1f}%)")
+            for entry in entries:
+                file_path = entry.path
+                try:
+                    self._adopt_legacy_record(shard, file_path)
+                    if self._should_update_file(shard, file_path, entry.mtime, entry.size):
+                        self._process_file(shard, file_path)
+                        updated_files += 1
                     
-            except Exception as e:
-                print(f"ファイル処理エラー: {file_path} - {e}")
+                    processed += 1
+                    
+                    if progress_callback:
+                        progress_callback(processed, total_files)
+
+                    if processed % max(1, total_files // 10) == 0:
+                        print(f"進行状況: {processed}/{total_files} ({(processed/total_files)*100:.1f}%)")
+                        
+                except Exception as e:
+                    print(f"ファイル処理エラー: {file_path} - {e}")
 
         self._save_index()
         
         print(f"インデックス作成完了: {updated_files} ファイルを更新")
+
+    def _adopt_legacy_record(self, shard: IndexShard, file_path: str) -> None:
+        """旧形式から移行したファイルを、抽出し直さずにフォルダのシャードへ移す"""
+        legacy_shard = self.shards.get(LEGACY_SHARD_ROOT)
+        if legacy_shard is None or shard is legacy_shard:
+            return
+        record = legacy_shard.pop_record(file_path, with_content=True)
+        if record is not None:
+            shard.set_record(file_path, record)
     
-    def _get_file_list(self, directories: List[str], include_subdirs: bool) -> List[str]:
-        file_list = []
-        
+    def _get_file_list(self, directories: List[str], include_subdirs: bool) -> List[ScanEntry]:
+        """対象ファイルを一覧取得時の stat 情報付きで返す（フォルダは並行して走査する）"""
+        roots = []
         for directory in directories:
             if not os.path.exists(directory):
                 print(f"ディレクトリが見つかりません: {directory}")
                 continue
-            
-            if include_subdirs:
-                for root, _, files in os.walk(directory):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        if self._is_supported_file(file_path):
-                            file_list.append(file_path)
-            else:
-                for file in os.listdir(directory):
-                    file_path = os.path.join(directory, file)
-                    if os.path.isfile(file_path) and self._is_supported_file(file_path):
-                        file_list.append(file_path)
-        
-        return file_list
+            roots.append(directory)
+
+        if not roots:
+            return []
+
+        # 対応する全ての拡張子を登録し、拡張子での絞り込みは検索時に行う
+        entries = DirectoryScanner().scan(roots, include_subdirs, SUPPORTED_FILE_EXTENSIONS)
+        # 走査は返ってきた順になるため、インデックス内の並びが毎回変わらないよう整列する
+        return sorted(entries, key=lambda entry: entry.path)
     
     def _is_supported_file(self, file_path: str) -> bool:
-        return any(file_path.lower().endswith(ext) for ext in SUPPORTED_FILE_EXTENSIONS)
+        return os.path.splitext(file_path)[1].lower() in SUPPORTED_FILE_EXTENSIONS
     
-    def _should_update_file(self, file_path: str) -> bool:
+    def _should_update_file(self, shard: IndexShard, file_path: str, current_mtime: Optional[float] = None,
+                            current_size: Optional[int] = None) -> bool:
         try:
-            current_mtime = os.path.getmtime(file_path)
-            current_size = os.path.getsize(file_path)
+            if current_mtime is None or current_size is None:
+                current_mtime = os.path.getmtime(file_path)
+                current_size = os.path.getsize(file_path)
             
-            if file_path not in self.index_data["files"]:
+            stored_info = shard.files.get(file_path)
+            if stored_info is None:
+                return True
+
+            if file_path.lower().endswith('.pdf') and "page_offsets" not in stored_info:
                 return True
-            
-            stored_info = self.index_data["files"][file_path]
 
             return (stored_info.get("mtime", 0) != current_mtime or 
                    stored_info.get("size", 0) != current_size)
@@ -116,44 +202,69 @@ class SearchIndexer:
         except OSError:
             return False
     
-    def _process_file(self, file_path: str) -> None:
+    def _process_file(self, shard: IndexShard, file_path: str) -> None:
         try:
-            content = self._extract_text_content(file_path)
-            if content:
-                file_stats = os.stat(file_path)
+            file_stats = os.stat(file_path)
+            file_hash = self._calculate_file_hash(file_path)
 
-                file_hash = self._calculate_file_hash(file_path)
-                
-                self.index_data["files"][file_path] = {
+            # 内容が同じファイルがインデックス済みなら、テキストの抽出を省く
+            known_content = self._find_known_content(shard, file_hash) if file_hash else None
+            if known_content is not None:
+                content, page_offsets = known_content
+            else:
+                content, page_offsets = self._extract_text_content(file_path)
+
+            if content:
+                file_record = {
                     "content": content,
                     "mtime": file_stats.st_mtime,
                     "size": file_stats.st_size,
                     "hash": file_hash,
                     "indexed_at": datetime.now().isoformat()
                 }
+                if page_offsets is not None:
+                    file_record["page_offsets"] = page_offsets
+
+                shard.set_record(file_path, file_record)
                 
         except Exception as e:
             print(f"ファイル処理エラー: {file_path} - {e}")
+
+    def _find_known_content(self, shard: IndexShard, file_hash: str) -> Optional[Tuple[str, Optional[List[int]]]]:
+        """処理中のシャード、次に読み込み済みの他のシャードから同じ内容の文書を探す"""
+        other_shards = [other for other in self.shards.values() if other is not shard and other.loaded]
+        for candidate in [shard] + other_shards:
+            known_content = candidate.find_content(file_hash)
+            if known_content is not None:
+                return known_content
+        return None
     
-    def _extract_text_content(self, file_path: str) -> str:
+    def _extract_text_content(self, file_path: str) -> Tuple[str, Optional[List[int]]]:
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
             return self._extract_pdf_content(file_path)
         else:
-            return self._extract_text_file_content(file_path)
+            return self._extract_text_file_content(file_path), None
     
-    def _extract_pdf_content(self, file_path: str) -> str:
-        content = ""
+    def _extract_pdf_content(self, file_path: str) -> Tuple[str, List[int]]:
+        page_texts = []
+        page_offsets = []
+        offset = 0
         try:
+            import fitz
+
             doc = fitz.open(file_path)
             for page in doc:
-                content += page.get_text() + "\n"
+                page_text = page.get_text() + "\n"
+                page_offsets.append(offset)
+                page_texts.append(page_text)
+                offset += len(page_text)
             doc.close()
         except Exception as e:
             print(f"PDF読み込みエラー: {file_path} - {e}")
         
-        return content
+        return "".join(page_texts), page_offsets
     
     def _extract_text_file_content(self, file_path: str) -> str:
         try:
@@ -163,105 +274,234 @@ class SearchIndexer:
             return ""
     
     def _calculate_file_hash(self, file_path: str) -> str:
-        hash_md5 = hashlib.md5()
+        """ファイル全体のハッシュ（サイズか更新日時が変わったファイルだけで求める）"""
+        hasher = hashlib.blake2b(digest_size=16)
         try:
             with open(file_path, "rb") as f:
-                chunk = f.read(8192)
-                hash_md5.update(chunk)
+                for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
         except Exception:
             return ""
         
-        return hash_md5.hexdigest()
+        return CONTENT_HASH_PREFIX + hasher.hexdigest()
     
     def _save_index(self) -> None:
-        """インデックスをファイルに保存"""
-        self.index_data["last_updated"] = datetime.now().isoformat()
-        
+        """変更のあったシャードの追加分とマニフェストを保存し、セグメントの統合を予約する"""
         try:
-            with open(self.index_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.index_data, f, ensure_ascii=False, indent=2)
+            with self._save_lock:
+                legacy_shard = self.shards.get(LEGACY_SHARD_ROOT)
+                if legacy_shard is not None and not legacy_shard.files:
+                    del self.shards[LEGACY_SHARD_ROOT]
+                    self._removed_files.extend(legacy_shard.segment_paths())
+
+                for shard in self.shards.values():
+                    if shard.dirty:
+                        shard.save()
+                self._write_manifest()
             print(f"インデックスを保存しました: {self.index_file_path}")
         except Exception as e:
             print(f"インデックス保存エラー: {e}")
+            return
+
+        self._schedule_merge()
+
+    def _write_manifest(self) -> None:
+        with self._save_lock:
+            previous_info = self.manifest.get("shards", {})
+            shard_info = {}
+            for key, shard in self.shards.items():
+                shard_info[key] = shard.manifest_entry() if shard.loaded else previous_info[key]
+
+            # マニフェストから外れたファイルは削除待ちとして記録し、古いマニフェストを読んだ
+            # 検索サービスなどが読み込み直すまで残しておく
+            now = datetime.now()
+            removed_files, self._removed_files = self._removed_files, []
+            for shard in self.shards.values():
+                removed_files.extend(shard.take_obsolete_files())
+            retired_files = []
+            expired_files = []
+            for entry in self.manifest.get("retired_files", []):
+                retired_for = (now - datetime.fromisoformat(entry["retired_at"])).total_seconds()
+                if retired_for >= INDEX_RETIRED_FILE_KEEP_SECONDS:
+                    expired_files.append(os.path.join(self.shard_dir, entry["file"]))
+                else:
+                    retired_files.append(entry)
+            retired_files.extend({"file": os.path.basename(file_path), "retired_at": now.isoformat()}
+                                 for file_path in removed_files)
+
+            self.manifest["version"] = "2.0"
+            self.manifest["shards"] = shard_info
+            self.manifest["retired_files"] = retired_files
+            self.manifest["last_updated"] = now.isoformat()
+            # 検索サービスはマニフェストの更新日時で再読み込みを判断する
+            write_json_atomic(self.index_file_path, self.manifest, indent=2)
+
+            # 削除待ちの期間が過ぎたファイルは、新しいマニフェストを書いた後に削除する
+            for file_path in expired_files:
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"不要になったインデックスファイルを削除できませんでした: {file_path} - {e}")
+
+    def _schedule_merge(self) -> None:
+        if self._merge_executor is None:
+            self._merge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='index-merge')
+        self._merge_future = self._merge_executor.submit(self._merge_segments)
+
+    def _merge_segments(self) -> None:
+        """統合方針に当てはまるセグメントがなくなるまで統合する（バックグラウンドで実行）"""
+        try:
+            with self._save_lock:
+                shards = list(self.shards.values())
+            for shard in shards:
+                while True:
+                    segments = shard.plan_merge()
+                    if not segments:
+                        break
+                    shard.merge_segments(segments)
+                    with self._save_lock:
+                        if shard not in self.shards.values():
+                            # 統合している間にシャードが破棄された。書いたセグメントも削除する
+                            self._removed_files.extend(shard.segment_paths() + shard.take_obsolete_files())
+                            break
+                        self._write_manifest()
+        except Exception as e:
+            print(f"インデックスのセグメント統合でエラー: {e}")
+
+    def wait_for_merge(self) -> None:
+        """予約済みのセグメント統合が終わるまで待つ"""
+        if self._merge_future is not None:
+            self._merge_future.result()
     
-    def search_in_index(self, search_terms: List[str], search_type: str = "AND") -> List[Tuple[str, List[Tuple[int, str]]]]:
-        results = []
-        
-        for file_path, file_info in self.index_data["files"].items():
-            content = file_info.get("content", "")
-            
-            if self._match_search_terms(content, search_terms, search_type):
-                matches = self._find_matches_in_content(content, search_terms, file_path)
-                if matches:
-                    results.append((file_path, matches))
-        
-        return results
-    
-    def _match_search_terms(self, content: str, search_terms: List[str], search_type: str) -> bool:
-        content_lower = content.lower()
-        
-        if search_type == "AND":
-            return all(term.lower() in content_lower for term in search_terms)
-        else:  # OR
-            return any(term.lower() in content_lower for term in search_terms)
-    
-    def _find_matches_in_content(self, content: str, search_terms: List[str], 
-                               file_path: str, context_length: int = 100) -> List[Tuple[int, str]]:
-        matches = []
-        
-        if file_path.lower().endswith('.pdf'):
-            pages = content.split('\n\n')
-            for page_num, page_content in enumerate(pages, 1):
-                for term in search_terms:
-                    if term.lower() in page_content.lower():
-                        context = self._extract_context(page_content, term, context_length)
-                        matches.append((page_num, context))
-                        break  # ページごとに1つのマッチのみ
-        else:
-            lines = content.split('\n')
-            for line_num, line in enumerate(lines, 1):
-                for term in search_terms:
-                    if term.lower() in line.lower():
-                        context = self._extract_context(line, term, context_length)
-                        matches.append((line_num, context))
-                        break  # 行ごとに1つのマッチのみ
-
-        return matches[:200]
-    
-    def _extract_context(self, text: str, search_term: str, context_length: int) -> str:
-        term_index = text.lower().find(search_term.lower())
-        if term_index == -1:
-            return text[:context_length * 2]
-        
-        start = max(0, term_index - context_length)
-        end = min(len(text), term_index + len(search_term) + context_length)
-        
-        return text[start:end]
+    def search_in_index(self, search_terms: List[str], search_type: str = "AND",
+                        file_extensions: Optional[List[str]] = None) -> List[Tuple[str, List[Tuple[int, int, int]]]]:
+        return list(self.iter_search_in_index(search_terms, search_type, file_extensions))
+
+    def iter_search_in_index(self, search_terms: List[str], search_type: str = "AND",
+                             file_extensions: Optional[List[str]] = None, directory: Optional[str] = None
+                             ) -> Iterator[Tuple[str, List[Tuple[int, int, int]]]]:
+        """一致したファイルから順に (ファイルパス, マッチ) を返す
+
+        directory を指定した場合は、そのフォルダと重なるシャードだけを調べる。
+        """
+        shards = [shard for shard in self.shards.values()
+                  if directory is None or self._shard_overlaps(shard, directory)]
+        if len(shards) <= 1:
+            for shard in shards:
+                yield from shard.iter_search(search_terms, search_type, file_extensions)
+            return
+
+        yield from self._search_shards_in_parallel(shards, search_terms, search_type, file_extensions)
+
+    def _search_shards_in_parallel(self, shards: List[IndexShard], search_terms: List[str], search_type: str,
+                                   file_extensions: Optional[List[str]]) -> Iterator[Tuple[str, List[Tuple[int, int, int]]]]:
+        results: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+
+        def search_shard(shard: IndexShard) -> None:
+            try:
+                for file_matches in shard.iter_search(search_terms, search_type, file_extensions, stop):
+                    results.put(file_matches)
+            except Exception as e:
+                print(f"インデックス検索でエラー: {shard.root} - {e}")
+            finally:
+                results.put(_SHARD_FINISHED)
+
+        executor = ThreadPoolExecutor(max_workers=min(len(shards), INDEX_SEARCH_MAX_WORKERS))
+        for shard in shards:
+            executor.submit(search_shard, shard)
+
+        remaining = len(shards)
+        seen = set()
+        try:
+            while remaining:
+                item = results.get()
+                if item is _SHARD_FINISHED:
+                    remaining -= 1
+                    continue
+                # 入れ子になったフォルダを別々に登録している場合の重複を除く
+                if item[0] in seen:
+                    continue
+                seen.add(item[0])
+                yield item
+        finally:
+            # 呼び出し側が途中でやめた場合も、ワーカーが文書を展開し続けないよう終了を待つ
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _shard_overlaps(shard: IndexShard, directory: str) -> bool:
+        if shard.root == LEGACY_SHARD_ROOT:
+            return True
+        root = os.path.normcase(shard.root)
+        target = os.path.normcase(os.path.normpath(os.path.abspath(directory)))
+        try:
+            return os.path.commonpath([root, target]) in (root, target)
+        except ValueError:
+            return False
+
+    def _shards_for_file(self, file_path: str) -> List[IndexShard]:
+        """ファイルを含みうるシャードを、フォルダの深い順に返す"""
+        normalized_path = os.path.normcase(os.path.abspath(file_path))
+        candidates = []
+        for shard in self.shards.values():
+            if shard.root == LEGACY_SHARD_ROOT:
+                candidates.append((-1, shard))
+                continue
+            root = os.path.normcase(shard.root)
+            try:
+                if os.path.commonpath([root, normalized_path]) == root:
+                    candidates.append((len(root), shard))
+            except ValueError:
+                continue
+        return [shard for _, shard in sorted(candidates, key=lambda item: item[0], reverse=True)]
+
+    def get_document_text(self, file_path: str, page_number: Optional[int] = None) -> Optional[str]:
+        """インデックスに保存された本文（PDFは指定ページ）を返す。古い場合はNone"""
+        for shard in self._shards_for_file(file_path):
+            if file_path in shard.files:
+                return shard.get_document_text(file_path, page_number)
+        return None
+
+    def _count_files(self) -> int:
+        shard_info = self.manifest.get("shards", {})
+        return sum(len(shard.files) if shard.loaded else shard_info.get(key, {}).get("files_count", 0)
+                   for key, shard in self.shards.items())
     
     def get_index_stats(self) -> Dict:
-        files_count = len(self.index_data.get("files", {}))
-        total_size = sum(info.get("size", 0) for info in self.index_data.get("files", {}).values())
+        shard_info = self.manifest.get("shards", {})
+        total_size = sum(shard.stats()["total_size"] if shard.loaded else shard_info.get(key, {}).get("total_size", 0)
+                         for key, shard in self.shards.items())
+
+        index_files = [self.index_file_path]
+        for shard in self.shards.values():
+            index_files.extend(shard.segment_paths())
+        index_file_size = sum(os.path.getsize(path) for path in index_files if os.path.exists(path))
         
         return {
-            "files_count": files_count,
+            "files_count": self._count_files(),
             "total_size_mb": total_size / (1024 * 1024),
-            "created_at": self.index_data.get("created_at"),
-            "last_updated": self.index_data.get("last_updated"),
-            "index_file_size_mb": os.path.getsize(self.index_file_path) / (1024 * 1024) if os.path.exists(self.index_file_path) else 0
+            "created_at": self.manifest.get("created_at"),
+            "last_updated": self.manifest.get("last_updated"),
+            "index_file_size_mb": index_file_size / (1024 * 1024),
+            "shards_count": len(self.shards),
+            "segments_count": sum(len(shard.segments) for shard in self.shards.values())
         }
     
     def remove_missing_files(self) -> int:
-        missing_files = []
-        
-        for file_path in self.index_data["files"]:
-            if not os.path.exists(file_path):
-                missing_files.append(file_path)
-        
-        for file_path in missing_files:
-            del self.index_data["files"][file_path]
+        removed_count = 0
+
+        with self._save_lock:
+            for shard in self.shards.values():
+                missing_files = [file_path for file_path in list(shard.files) if not os.path.exists(file_path)]
+                for file_path in missing_files:
+                    shard.pop_record(file_path)
+                removed_count += len(missing_files)
         
-        if missing_files:
+        if removed_count:
             self._save_index()
-            print(f"{len(missing_files)} 個の存在しないファイルをインデックスから削除しました")
+            print(f"{removed_count} 個の存在しないファイルをインデックスから削除しました")
         
-        return len(missing_files)
+        return removed_count
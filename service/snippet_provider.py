@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from constants import SNIPPET_CACHE_MAX_ENTRIES, SNIPPET_CACHE_MAX_CHARS
+from utils.helpers import read_file_with_auto_encoding
+
+
+class SnippetProvider:
+    """検索結果の抜粋テキストを表示時に生成する
+
+    本文はインデックスの保存テキストを優先し、無ければファイルから読み込んで
+    LRUキャッシュに保持する。
+    """
+
+    def __init__(self, context_length: int, indexer=None,
+                 max_entries: int = SNIPPET_CACHE_MAX_ENTRIES,
+                 max_chars: int = SNIPPET_CACHE_MAX_CHARS):
+        self.context_length = context_length
+        self.indexer = indexer
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._cache: "OrderedDict[Tuple[str, Optional[int]], str]" = OrderedDict()
+        self._cached_chars = 0
+
+    def get_snippet(self, file_path: str, position: int, offset: int, term_length: int) -> str:
+        text = self.get_source_text(file_path, position)
+        if not text:
+            return ""
+
+        start = max(0, offset - self.context_length)
+        end = min(len(text), offset + term_length + self.context_length)
+        return text[start:end]
+
+    def get_source_text(self, file_path: str, position: int) -> Optional[str]:
+        page_number = position if file_path.lower().endswith('.pdf') else None
+        key = (file_path, page_number)
+
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+
+        if self.indexer is not None:
+            text = self.indexer.get_document_text(file_path, page_number)
+
+        if text is None:
+            try:
+                if page_number is not None:
+                    text = self._load_pdf_page_text(file_path, page_number)
+                else:
+                    text = read_file_with_auto_encoding(file_path)
+            except Exception as e:
+                print(f"抜粋テキストの読み込みに失敗: {file_path} - {e}")
+                return None
+
+        self._store(key, text)
+        return text
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._cached_chars = 0
+
+    @staticmethod
+    def _load_pdf_page_text(file_path: str, page_number: int) -> str:
+        import fitz
+
+        doc = fitz.open(file_path)
+        try:
+            if not 1 <= page_number <= doc.page_count:
+                return ""
+            return doc[page_number - 1].get_text()
+        finally:
+            doc.close()
+
+    def _store(self, key: Tuple[str, Optional[int]], text: str) -> None:
+        if len(text) > self.max_chars:
+            return
+
+        self._cache[key] = text
+        self._cached_chars += len(text)
+        while len(self._cache) > self.max_entries or self._cached_chars > self.max_chars:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_chars -= len(evicted)
@@ -1,14 +1,18 @@
+import codecs
+import hashlib
 import html
+import json
 import os
 import re
 import sys
-import tempfile
+import threading
 import webbrowser
-from typing import List, Optional, Dict, Any
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Iterator, Set, Tuple
 from dataclasses import dataclass
 
-import markdown
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 
 from constants import (
     HIGHLIGHT_COLORS,
@@ -18,9 +22,44 @@ from constants import (
     MARKDOWN_EXTENSIONS,
     HIGHLIGHT_STYLE_TEMPLATE,
     MIN_FONT_SIZE,
-    MAX_FONT_SIZE
+    MAX_FONT_SIZE,
+    TEXT_MARKDOWN_CACHE_MAX_ENTRIES,
+    TEXT_CHUNKED_VIEWER_TEMPLATE,
+    TEXT_CHUNKED_VIEW_MIN_BYTES,
+    TEXT_VIEW_CHUNK_LINES,
+    TEXT_VIEW_MAX_INDEXED_HITS,
+    ENCODING_DETECTION_SAMPLE_BYTES
 )
-from utils.helpers import read_file_with_auto_encoding
+from service.artifact_store import get_artifact_store
+from service.pdf_highlight_cache import normalize_search_terms
+from utils.helpers import detect_file_encoding, read_file_with_auto_encoding
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+_jinja_environment: Optional['Environment'] = None
+_template_cache: Dict[str, 'Template'] = {}
+# Markdown変換結果（本文のハッシュ → HTML）
+_markdown_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# 完成したHTMLファイルと分割表示のフォルダは生成物ストアに保存する
+ARTIFACT_KIND_HTML = 'html'
+ARTIFACT_KIND_TEXT_VIEW = 'text_view'
+
+# 分割表示のフォルダに全てのチャンクを書き終えたことを示すファイル
+_CHUNKED_VIEW_COMPLETE_MARKER = '.complete'
+# このプロセスで残りのチャンクを書き出している最中のフォルダ
+_chunked_view_writers: Set[str] = set()
+_chunked_view_lock = threading.Lock()
+# チャンクの境界を探すときに一度に読むバイト数
+_CHUNK_SCAN_BLOCK_BYTES = 1024 * 1024
+_NEWLINE_BYTES_PATTERN = re.compile(b'\n')
+
+# ハイライト対象外とするHTMLの範囲
+_MARKUP_BLOCK_PATTERN = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_ENTITY_PATTERN = re.compile(r'&#?\w+;')
+_MAX_ENTITY_LENGTH = 32
 
 
 def get_template_directory() -> str:
@@ -34,7 +73,9 @@ def get_template_directory() -> str:
     return os.path.join(base_path, TEMPLATE_DIRECTORY)
 
 
-def create_jinja_environment() -> Environment:
+def create_jinja_environment() -> 'Environment':
+    from jinja2 import Environment, FileSystemLoader
+
     template_dir = get_template_directory()
 
     if not os.path.exists(template_dir):
@@ -48,9 +89,36 @@ def create_jinja_environment() -> Environment:
     )
 
 
-def open_text_file(file_path: str, search_terms: List[str], html_font_size: int) -> None:
+def get_viewer_template(template_name: str = TEXT_VIEWER_TEMPLATE) -> 'Template':
+    """コンパイル済みテンプレートをモジュール内で使い回す"""
+    global _jinja_environment
+
+    with _cache_lock:
+        template = _template_cache.get(template_name)
+        if template is None:
+            if _jinja_environment is None:
+                _jinja_environment = create_jinja_environment()
+            template = _jinja_environment.get_template(template_name)
+            _template_cache[template_name] = template
+        return template
+
+
+def clear_render_caches() -> None:
+    with _cache_lock:
+        _template_cache.clear()
+        _markdown_cache.clear()
+    store = get_artifact_store()
+    store.clear(ARTIFACT_KIND_HTML)
+    store.clear(ARTIFACT_KIND_TEXT_VIEW)
+
+
+def open_text_file(file_path: str, search_terms: List[str], html_font_size: int,
+                   line_number: Optional[int] = None) -> None:
     try:
-        highlighted_html_path = highlight_text_file(file_path, search_terms, html_font_size)
+        if os.path.getsize(file_path) >= TEXT_CHUNKED_VIEW_MIN_BYTES:
+            highlighted_html_path = create_chunked_viewer(file_path, search_terms, html_font_size, line_number or 1)
+        else:
+            highlighted_html_path = highlight_text_file(file_path, search_terms, html_font_size)
         file_url = highlighted_html_path.replace('\\', '/')
         webbrowser.open(f'file:///{file_url}')
     except Exception as e:
@@ -58,6 +126,11 @@ def open_text_file(file_path: str, search_terms: List[str], html_font_size: int)
 
 
 def highlight_text_file(file_path: str, search_terms: List[str], html_font_size: int) -> str:
+    cache_key = _make_html_cache_key(ARTIFACT_KIND_HTML, file_path, search_terms, html_font_size)
+    cached = get_artifact_store().get(cache_key) if cache_key else None
+    if cached:
+        return cached[0]
+
     try:
         content = read_file_with_auto_encoding(file_path)
     except ValueError as e:
@@ -67,7 +140,7 @@ def highlight_text_file(file_path: str, search_terms: List[str], html_font_size:
     is_markdown = file_extension == '.md'
 
     if is_markdown:
-        content = markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS)
+        content = render_markdown(content)
     else:
         content = html.escape(content)
 
@@ -75,27 +148,361 @@ def highlight_text_file(file_path: str, search_terms: List[str], html_font_size:
 
     html_content = generate_html_content(file_path, content, is_markdown, html_font_size, search_terms)
 
-    return create_temp_html_file(html_content)
+    html_path = create_temp_html_file(html_content)
+    if cache_key:
+        get_artifact_store().put(cache_key, html_path, ARTIFACT_KIND_HTML)
+    return html_path
+
+
+def create_chunked_viewer(file_path: str, search_terms: List[str], html_font_size: int,
+                          line_number: int = 1) -> str:
+    """巨大なテキストファイルを行単位のチャンク（JSファイル）に分けて書き出す
+
+    改行の位置だけをバイト列のまま数え、表示する行を含むチャンクだけを読み込んで
+    先に書き出してビューアを返す。残りのチャンクと一致行の一覧はバックグラウンドで書き出す。
+    ビューアはスクロールに応じてチャンクを読み込む。
+    Markdownも分割表示ではプレーンテキストとして扱う。
+    """
+    store = get_artifact_store()
+    cache_key = _make_html_cache_key(ARTIFACT_KIND_TEXT_VIEW, file_path, search_terms, html_font_size)
+    cached = store.get(cache_key) if cache_key else None
+    if cached is not None and not _is_chunked_view_usable(cached[0]):
+        # 前回のセッションが書き出しの途中で終了した
+        store.remove(cache_key)
+        cached = None
+
+    if cached is None:
+        try:
+            source = _open_chunk_source(file_path)
+        except ValueError as e:
+            raise ValueError(f"ファイルの読み込みに失敗しました: {file_path} - {str(e)}")
+
+        output_dir = store.create_path(directory=True)
+        first_chunk = (max(1, min(line_number, source.line_count)) - 1) // TEXT_VIEW_CHUNK_LINES
+        _write_chunk(output_dir, first_chunk, source.read_lines(first_chunk), search_terms)
+
+        with _chunked_view_lock:
+            _chunked_view_writers.add(output_dir)
+        threading.Thread(
+            target=_write_remaining_chunks,
+            args=(output_dir, source, first_chunk, search_terms),
+            daemon=True
+        ).start()
+
+        meta = {'line_count': source.line_count}
+        if cache_key:
+            # チャンクは後から書き足されるため、容量は元ファイルのサイズで見積もる
+            store.put(cache_key, output_dir, ARTIFACT_KIND_TEXT_VIEW, meta, size=os.path.getsize(file_path))
+        cached = (output_dir, meta)
+
+    output_dir, meta = cached
+    line_count = meta['line_count']
+    line_number = max(1, min(line_number, line_count))
+    viewer_path = os.path.join(output_dir, f'view_{line_number}.html')
+    if not os.path.exists(viewer_path):
+        html_content = _generate_chunked_html(file_path, line_count, line_number, html_font_size)
+        with open(viewer_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+    return viewer_path
+
+
+class _FileChunkSource:
+    """チャンクの先頭のバイト位置を覚えておき、必要なチャンクだけを元ファイルから読んで文字列にする"""
+
+    def __init__(self, file_path: str, encoding: str, offsets: List[int], line_count: int):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.offsets = offsets
+        self.line_count = line_count
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.offsets)
+
+    def read_lines(self, index: int) -> List[str]:
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offsets[index])
+            if index + 1 < len(self.offsets):
+                # 次のチャンクの直前にある改行は含めない
+                data = f.read(self.offsets[index + 1] - self.offsets[index] - 1)
+            else:
+                data = f.read()
+        return data.decode(self.encoding, errors='replace').split('\n')
+
+
+class _MemoryChunkSource:
+    """改行をバイト列のまま数えられない文字コード（UTF-16など）は全体を読み込んで保持する"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.line_count = len(lines)
+
+    @property
+    def chunk_count(self) -> int:
+        return (self.line_count + TEXT_VIEW_CHUNK_LINES - 1) // TEXT_VIEW_CHUNK_LINES
+
+    def read_lines(self, index: int) -> List[str]:
+        first_line = index * TEXT_VIEW_CHUNK_LINES
+        return self.lines[first_line:first_line + TEXT_VIEW_CHUNK_LINES]
+
+
+def _open_chunk_source(file_path: str):
+    encoding = detect_file_encoding(file_path, ENCODING_DETECTION_SAMPLE_BYTES) or 'utf-8'
+    if not _is_newline_byte_compatible(encoding):
+        content = read_file_with_auto_encoding(file_path, sample_size=ENCODING_DETECTION_SAMPLE_BYTES)
+        return _MemoryChunkSource(content.split('\n'))
+
+    offsets, line_count = _scan_chunk_offsets(file_path)
+    return _FileChunkSource(file_path, encoding, offsets, line_count)
+
+
+def _is_newline_byte_compatible(encoding: str) -> bool:
+    """改行が1バイトの0x0Aで表され、他の文字の一部に0x0Aが現れない文字コードならTrue"""
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return False
+    if name.startswith(('iso2022', 'utf-7')):
+        # エスケープシーケンスで状態を持つため、途中から復号できない
+        return False
+    return '\n'.encode(name) == b'\n'
+
+
+def _scan_chunk_offsets(file_path: str) -> Tuple[List[int], int]:
+    """各チャンクの先頭のバイト位置と、行数（改行の数 + 1）を返す"""
+    offsets = [0]
+    newline_count = 0
+    position = 0
+    next_boundary = TEXT_VIEW_CHUNK_LINES
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(_CHUNK_SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            block_newlines = block.count(b'\n')
+            if newline_count + block_newlines >= next_boundary:
+                newlines = _NEWLINE_BYTES_PATTERN.finditer(block)
+                consumed = 0
+                while newline_count + block_newlines >= next_boundary:
+                    # このブロックの中で境界になる改行まで読み飛ばす
+                    skip = next_boundary - newline_count - consumed - 1
+                    match = next(islice(newlines, skip, None))
+                    consumed += skip + 1
+                    offsets.append(position + match.end())
+                    next_boundary += TEXT_VIEW_CHUNK_LINES
+            newline_count += block_newlines
+            position += len(block)
+    return offsets, newline_count + 1
+
+
+def _is_chunked_view_usable(output_dir: str) -> bool:
+    """全てのチャンクを書き終えたか、このプロセスで書き出している最中ならTrue"""
+    if os.path.exists(os.path.join(output_dir, _CHUNKED_VIEW_COMPLETE_MARKER)):
+        return True
+    with _chunked_view_lock:
+        return output_dir in _chunked_view_writers
+
+
+def _generate_chunked_html(file_path: str, line_count: int, line_number: int, html_font_size: int) -> str:
+    from jinja2 import TemplateNotFound
+
+    chunks = [
+        {
+            'index': index,
+            'first_line': first_line,
+            'line_count': min(TEXT_VIEW_CHUNK_LINES, line_count - first_line + 1),
+        }
+        for index, first_line in enumerate(range(1, line_count + 1, TEXT_VIEW_CHUNK_LINES))
+    ]
+
+    try:
+        template = get_viewer_template(TEXT_CHUNKED_VIEWER_TEMPLATE)
+        return template.render(
+            title=os.path.basename(file_path),
+            file_path=file_path,
+            file_type=get_file_type_display_name(os.path.splitext(file_path)[1]),
+            font_size=max(MIN_FONT_SIZE, min(MAX_FONT_SIZE, html_font_size or 16)),
+            line_count=line_count,
+            chunks=chunks,
+            chunk_lines=TEXT_VIEW_CHUNK_LINES,
+            initial_line=line_number,
+        )
+    except TemplateNotFound as e:
+        raise FileNotFoundError(f"テンプレートファイルが見つかりません: {e}")
+
+
+def _write_chunk(output_dir: str, index: int, chunk_lines: List[str], search_terms: List[str]) -> None:
+    first_line = index * TEXT_VIEW_CHUNK_LINES
+
+    highlighted = highlight_search_terms(html.escape('\n'.join(chunk_lines)), search_terms)
+    # 検索語は改行を含まないため、ハイライトのspanが行をまたぐことはない
+    body = '\n'.join(
+        f'<span id="L{first_line + offset + 1}">{line}</span>'
+        for offset, line in enumerate(highlighted.split('\n'))
+    )
+    _write_atomic(os.path.join(output_dir, f'chunk_{index:05d}.js'),
+                  f'loadChunk({index}, {json.dumps(body, ensure_ascii=False)});\n')
+
+
+def _find_hit_lines(index: int, chunk_lines: List[str], terms: List[str]) -> List[int]:
+    first_line = index * TEXT_VIEW_CHUNK_LINES
+    return [
+        first_line + offset + 1
+        for offset, line in enumerate(chunk_lines)
+        if any(term in line.lower() for term in terms)
+    ]
+
+
+def _write_remaining_chunks(output_dir: str, source, first_chunk: int, search_terms: List[str]) -> None:
+    terms = [term.strip().lower() for term in search_terms if term and term.strip()]
+    hits_by_chunk: Dict[int, List[int]] = {}
+    try:
+        # 表示中のチャンクに近い順に書き出す
+        for index in sorted(range(source.chunk_count), key=lambda i: (abs(i - first_chunk), i)):
+            if not os.path.isdir(output_dir):
+                return
+            chunk_lines = source.read_lines(index)
+            if index != first_chunk:
+                _write_chunk(output_dir, index, chunk_lines, search_terms)
+            if terms:
+                hits_by_chunk[index] = _find_hit_lines(index, chunk_lines, terms)
+
+        all_hits = []
+        for index in sorted(hits_by_chunk):
+            all_hits.extend(hits_by_chunk[index])
+            if len(all_hits) >= TEXT_VIEW_MAX_INDEXED_HITS:
+                break
+        _write_atomic(os.path.join(output_dir, 'hits.js'),
+                      f'loadHits({json.dumps(all_hits[:TEXT_VIEW_MAX_INDEXED_HITS])});\n')
+        # 書き出し中に終了したフォルダは、次に開くときにこのファイルが無いことで作り直す
+        _write_atomic(os.path.join(output_dir, _CHUNKED_VIEW_COMPLETE_MARKER), '')
+    except OSError as e:
+        print(f"分割表示用ファイルの書き出しに失敗: {output_dir} - {e}")
+    finally:
+        with _chunked_view_lock:
+            _chunked_view_writers.discard(output_dir)
+
+
+def _write_atomic(file_path: str, text: str) -> None:
+    # ブラウザが書き込み途中のファイルを読まないよう、書き終えてから置き換える
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, file_path)
+
+
+def render_markdown(content: str) -> str:
+    content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    with _cache_lock:
+        rendered = _markdown_cache.get(content_hash)
+        if rendered is not None:
+            _markdown_cache.move_to_end(content_hash)
+            return rendered
+
+    import markdown
+
+    rendered = markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS)
+
+    with _cache_lock:
+        _markdown_cache[content_hash] = rendered
+        while len(_markdown_cache) > TEXT_MARKDOWN_CACHE_MAX_ENTRIES:
+            _markdown_cache.popitem(last=False)
+    return rendered
+
+
+def _make_html_cache_key(kind: str, file_path: str, search_terms: List[str], html_font_size: int) -> Optional[str]:
+    """(パス, 更新日時, サイズ, 検索語, 文字サイズ) から生成物ストアのキーを作る"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    terms_key = '\x1f'.join(normalize_search_terms(search_terms))
+    key_source = f"{os.path.abspath(file_path)}\x1e{stat.st_mtime}\x1e{stat.st_size}\x1e{terms_key}\x1e{html_font_size}"
+    return f"{kind}:{hashlib.sha1(key_source.encode('utf-8')).hexdigest()}"
 
 
 def highlight_search_terms(content: str, search_terms: List[str]) -> str:
-    for i, term in enumerate(search_terms):
-        if not term.strip():
+    return ''.join(iter_highlighted_html(content, search_terms))
+
+
+def iter_highlighted_html(content: str, search_terms: List[str]) -> Iterator[str]:
+    """HTMLを1回だけ走査し、テキスト部分の検索語をハイライトした断片を順に返す
+
+    全検索語を1つの正規表現で探し、タグ・コメント・script/style要素・文字参照の内側に
+    ある一致は読み飛ばす。タグの内外は前回の一致位置からの差分だけで判定するため、
+    処理量はファイルサイズに比例する。
+    """
+    term_colors = _collect_term_colors(search_terms)
+    if not term_colors:
+        yield content
+        return
+
+    # 長い語を先に置き、重なる語は長い方でハイライトする
+    alternation = '|'.join(re.escape(term) for term in sorted(term_colors, key=len, reverse=True))
+    lowered = content.lower()
+    if len(lowered) == len(content):
+        # 小文字化した本文に対する照合はIGNORECASEより大幅に速い
+        haystack = lowered
+        term_pattern = re.compile(alternation)
+    else:
+        haystack = content
+        term_pattern = re.compile(alternation, re.IGNORECASE)
+
+    blocks = [match.span() for match in _MARKUP_BLOCK_PATTERN.finditer(haystack)]
+    block_starts = [start for start, _ in blocks]
+    span_tags = {
+        term: f'<span style="{HIGHLIGHT_STYLE_TEMPLATE.format(color=color)}">'
+        for term, color in term_colors.items()
+    }
+    default_span_tag = f'<span style="{HIGHLIGHT_STYLE_TEMPLATE.format(color=HIGHLIGHT_COLORS[0])}">'
+
+    in_tag = False
+    scanned = 0
+    last_end = 0
+    for match in term_pattern.finditer(haystack):
+        start, end = match.span()
+        last_open = content.rfind('<', scanned, start)
+        last_close = content.rfind('>', scanned, start)
+        if last_open != last_close:
+            in_tag = last_open > last_close
+        scanned = start
+
+        if in_tag or (blocks and _is_inside_block(blocks, block_starts, start)):
+            continue
+        if content.rfind('&', max(0, start - _MAX_ENTITY_LENGTH), start) >= 0 and _is_inside_entity(content, start):
             continue
 
-        color = HIGHLIGHT_COLORS[i % len(HIGHLIGHT_COLORS)]  # 色をループさせる
-        try:
-            content = re.sub(
-                f'({re.escape(term.strip())})',
-                f'<span style="{HIGHLIGHT_STYLE_TEMPLATE.format(color=color)}">\\1</span>',
-                content,
-                flags=re.IGNORECASE
-            )
-        except re.error as e:
-            print(f"ハイライト処理でエラーが発生しました: {term} - {e}")
+        yield content[last_end:start]
+        yield span_tags.get(match.group().lower(), default_span_tag)
+        yield content[start:end]
+        yield '</span>'
+        last_end = end
+    yield content[last_end:]
+
+
+def _collect_term_colors(search_terms: List[str]) -> Dict[str, str]:
+    term_colors: Dict[str, str] = {}
+    for i, term in enumerate(search_terms):
+        if not term or not term.strip():
             continue
+        # 本文はエスケープ済みのため、検索語も同じ形にしてから照合する
+        escaped_term = html.escape(term.strip(), quote=False)
+        term_colors.setdefault(escaped_term.lower(), HIGHLIGHT_COLORS[i % len(HIGHLIGHT_COLORS)])
+    return term_colors
 
-    return content
+
+def _is_inside_block(blocks: List[Tuple[int, int]], block_starts: List[int], position: int) -> bool:
+    index = bisect_right(block_starts, position) - 1
+    return index >= 0 and position < blocks[index][1]
+
+
+def _is_inside_entity(content: str, position: int) -> bool:
+    amp = content.rfind('&', max(0, position - _MAX_ENTITY_LENGTH), position)
+    if amp < 0:
+        return False
+    entity = _ENTITY_PATTERN.match(content, amp)
+    return entity is not None and entity.end() > position
 
 
 def generate_html_content(
@@ -105,9 +512,10 @@ def generate_html_content(
         html_font_size: int,
         search_terms: Optional[List[str]] = None,
 ) -> str:
+    from jinja2 import TemplateNotFound
+
     try:
-        env = create_jinja_environment()
-        template = env.get_template(TEXT_VIEWER_TEMPLATE)
+        template = get_viewer_template()
 
         file_extension = os.path.splitext(file_path)[1].lower()
         file_type = get_file_type_display_name(file_extension)
@@ -132,9 +540,10 @@ def generate_html_content(
 
 def create_temp_html_file(html_content: str) -> str:
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.html', mode='w', encoding='utf-8') as tmp_file:
-            tmp_file.write(html_content)
-            return tmp_file.name
+        html_path = get_artifact_store().create_path(suffix='.html')
+        with open(html_path, 'w', encoding='utf-8') as html_file:
+            html_file.write(html_content)
+        return html_path
     except IOError as e:
         raise IOError(f"一時HTMLファイルの作成に失敗しました: {e}")
 
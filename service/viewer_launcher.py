@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+from typing import List
+
+from constants import ACROBAT_WAIT_TIMEOUT, ACROBAT_LAUNCH_CHECK_SECONDS
+
+WAIT_OBJECT_0 = 0x00000000
+WAIT_TIMEOUT = 0x00000102
+
+
+class PdfViewerLauncher:
+    """PDFビューアを指定ページで開くためのインターフェース"""
+
+    def open(self, file_path: str, page_number: int) -> None:
+        raise NotImplementedError
+
+
+class AcrobatLauncher(PdfViewerLauncher):
+    """Acrobat / Acrobat Readerをオープンパラメータ (/A page=N) で起動する
+
+    起動済みのAcrobatがあれば、新しいプロセスは文書を既存のウィンドウに渡して終了するため、
+    ビューアは再利用される。起動完了は固定時間の待機ではなく入力待ち状態で判定する。
+    呼び出し元（GUIスレッド）は起動直後の異常終了だけを短時間確認し、入力待ちになるまでの
+    確認はバックグラウンドのスレッドで行う。
+    """
+
+    def __init__(self, acrobat_path: str, timeout: float = ACROBAT_WAIT_TIMEOUT):
+        self.acrobat_path = acrobat_path
+        self.timeout = timeout
+
+    def build_command(self, file_path: str, page_number: int) -> List[str]:
+        command = [self.acrobat_path]
+        if page_number and page_number > 1:
+            command += ['/A', f'page={page_number}']
+        command.append(os.path.normpath(file_path))
+        return command
+
+    def open(self, file_path: str, page_number: int) -> None:
+        process = subprocess.Popen(self.build_command(file_path, page_number))
+
+        try:
+            return_code = process.wait(timeout=ACROBAT_LAUNCH_CHECK_SECONDS)
+        except subprocess.TimeoutExpired:
+            threading.Thread(target=self._report_startup, args=(process,), daemon=True).start()
+            return
+
+        # 既存のAcrobatに文書を渡した場合は、すぐに終了コード0で終わる
+        if return_code != 0:
+            raise subprocess.SubprocessError(f"Acrobatが終了コード {return_code} で終了しました")
+
+    def _report_startup(self, process: subprocess.Popen) -> None:
+        if not self._wait_until_ready(process):
+            return_code = process.poll()
+            if return_code not in (None, 0):
+                print(f"Acrobatが終了コード {return_code} で終了しました")
+            if return_code is None:
+                print(f"Acrobat起動の確認がタイムアウトしました（{self.timeout}秒）")
+
+    def _wait_until_ready(self, process: subprocess.Popen) -> bool:
+        if sys.platform != 'win32':
+            return process.poll() in (None, 0)
+
+        import ctypes
+
+        handle = getattr(process, '_handle', None)
+        if handle is None:
+            return False
+
+        result = ctypes.windll.user32.WaitForInputIdle(int(handle), int(self.timeout * 1000))
+        if result == WAIT_OBJECT_0:
+            return True
+        if result == WAIT_TIMEOUT:
+            return False
+
+        # 既存のAcrobatに文書を渡してすぐ終了した場合など
+        return process.poll() in (None, 0)
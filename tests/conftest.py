@@ -0,0 +1,7 @@
+import os
+import sys
+
+# テストはリポジトリのルートをimportの起点にする（python -m pytest 以外から実行した場合も同じ）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,96 @@
+import os
+import time
+
+from service.artifact_store import ArtifactStore
+
+
+def _put(store, key, kind='html'):
+    path = store.create_path('.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(key)
+    store.put(key, path, kind)
+    return path
+
+
+def test_evicts_least_recently_used_per_kind(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_entries=2, cleanup_on_exit=False)
+    first = _put(store, 'a')
+    _put(store, 'b')
+    store.get('a')
+    _put(store, 'c')
+    pdf = _put(store, 'pdf', kind='pdf')
+
+    assert store.get('a') is not None
+    assert store.get('b') is None
+    assert store.get('c') is not None
+    assert store.get('pdf') is not None
+    assert os.path.exists(first) and os.path.exists(pdf)
+
+
+def test_evicts_over_total_size(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=2, cleanup_on_exit=False)
+    old = _put(store, 'old')
+    _put(store, 'new')
+
+    assert store.get('old') is None
+    assert not os.path.exists(old)
+    assert store.get('new') is not None
+
+
+def test_expired_entries_are_removed(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_age=0.01, cleanup_on_exit=False)
+    path = _put(store, 'a')
+    time.sleep(0.05)
+
+    assert store.get('a') is None
+    assert not os.path.exists(path)
+
+
+def test_instances_merge_their_changes(tmp_path):
+    first = ArtifactStore(str(tmp_path), cleanup_on_exit=False)
+    second = ArtifactStore(str(tmp_path), cleanup_on_exit=False)
+    _put(first, 'from_first')
+    _put(second, 'from_second')
+    first.remove('from_first')
+    first.close()
+    second.close()
+
+    reopened = ArtifactStore(str(tmp_path), cleanup_on_exit=False)
+    assert reopened.get('from_first') is None
+    assert reopened.get('from_second') is not None
+
+
+def test_entries_are_reused_by_next_session(tmp_path):
+    store = ArtifactStore(str(tmp_path), cleanup_on_exit=False)
+    path = _put(store, 'a')
+    store.close()
+
+    assert ArtifactStore(str(tmp_path)).get('a')[0] == os.path.abspath(path)
+
+
+def test_close_keeps_entries_used_later_by_another_instance(tmp_path):
+    first = ArtifactStore(str(tmp_path))
+    second = ArtifactStore(str(tmp_path))
+    shared = _put(first, 'shared')
+    own = _put(first, 'own')
+    time.sleep(0.01)
+    second.configure()
+    assert second.get('shared') is not None
+
+    first.close()
+    assert os.path.exists(shared)
+    assert not os.path.exists(own)
+
+    second.close()
+    assert not os.path.exists(shared)
+
+
+def test_reclaims_unregistered_files_after_grace_period(tmp_path, monkeypatch):
+    monkeypatch.setattr('service.artifact_store.ARTIFACT_ORPHAN_GRACE_SECONDS', 0)
+    orphan = tmp_path / 'orphan.html'
+    orphan.write_text('left over')
+    old = time.time() - 10
+    os.utime(orphan, (old, old))
+
+    ArtifactStore(str(tmp_path))
+    assert not orphan.exists()
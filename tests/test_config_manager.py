@@ -0,0 +1,47 @@
+import os
+
+from utils.config_manager import ConfigManager
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_changes_are_written_on_flush(tmp_path):
+    config_file = str(tmp_path / 'config.ini')
+    manager = ConfigManager(config_file, save_delay=60)
+    manager.set_font_size(20)
+    manager.set_context_length(50)
+
+    assert not os.path.exists(config_file)
+    manager.flush()
+
+    reloaded = ConfigManager(config_file, save_delay=60)
+    assert reloaded.get_font_size() == 20
+    assert reloaded.get_context_length() == 50
+
+
+def test_delayed_write_happens_without_flush(tmp_path):
+    config_file = str(tmp_path / 'config.ini')
+    manager = ConfigManager(config_file, save_delay=0.01)
+    manager.set_font_size(18)
+    manager._save_timer.join(5)
+
+    assert ConfigManager(config_file).get_font_size() == 18
+
+
+def test_unchanged_settings_are_not_rewritten(tmp_path):
+    config_file = str(tmp_path / 'config.ini')
+    manager = ConfigManager(config_file, save_delay=60)
+    manager.set_font_size(20)
+    manager.flush()
+    before = os.stat(config_file).st_mtime_ns
+    os.utime(config_file, ns=(before - 10 ** 9, before - 10 ** 9))
+
+    reloaded = ConfigManager(config_file, save_delay=60)
+    reloaded.set_font_size(20)
+    reloaded.flush()
+
+    assert os.stat(config_file).st_mtime_ns == before - 10 ** 9
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
@@ -0,0 +1,145 @@
+import json
+import struct
+import zlib
+
+import pytest
+
+from service.index_segment import (
+    CONTENT_HASH_PREFIX,
+    SEGMENT_MAGIC,
+    IndexSegment,
+    SegmentWriter,
+    decode_postings,
+    encode_postings,
+)
+
+
+def _build_segment(documents, codec='zlib', block_chars=8):
+    writer = SegmentWriter(codec=codec, block_chars=block_chars)
+    for path, text, content_hash in documents:
+        writer.add_document(path, {"hash": content_hash, "mtime": 1.0, "size": len(text)}, lambda text=text: text)
+    return writer.finish('/root', 'created', 'updated')
+
+
+def _split_segment(data):
+    position = len(SEGMENT_MAGIC)
+    header_size, = struct.unpack_from('<I', data, position)
+    position += 4
+    header = json.loads(zlib.decompress(data[position:position + header_size]))
+    return header, data[position + header_size:]
+
+
+def _join_segment(header, body):
+    header_bytes = zlib.compress(json.dumps(header).encode('utf-8'))
+    return SEGMENT_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + body
+
+
+@pytest.mark.parametrize('doc_ids', [
+    [],
+    [0],
+    [0, 1, 2, 3],
+    [127, 128, 255, 16383, 16384],
+    [5, 10 ** 9, 2 ** 40, 2 ** 40 + 1],
+])
+def test_postings_round_trip(doc_ids):
+    assert decode_postings(encode_postings(doc_ids)) == doc_ids
+
+
+def test_postings_empty_is_empty_bytes():
+    assert encode_postings([]) == b''
+    assert decode_postings(b'') == []
+
+
+def test_postings_varint_boundaries():
+    # 差分が7ビットに収まれば1バイト、128以上は継続ビット付きで2バイト以上になる
+    assert encode_postings([127]) == b'\x7f'
+    assert encode_postings([128]) == b'\x80\x01'
+    assert len(encode_postings([0, 2 ** 40])) == 1 + 6
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_segment_round_trip(codec):
+    texts = ['alpha beta gamma', '', 'デルタ イプシロン', 'x' * 50]
+    data = _build_segment([(f'/root/{i}.txt', text, '') for i, text in enumerate(texts)], codec=codec)
+    segment = IndexSegment(data)
+
+    assert segment.header['root'] == '/root'
+    assert [file_info['path'] for file_info in segment.files] == [f'/root/{i}.txt' for i in range(len(texts))]
+    for doc_id, text in enumerate(texts):
+        assert segment.get_text(doc_id) == text
+
+
+def test_segment_get_text_ranges_across_blocks():
+    text = 'abcdefghijklmnopqrstuvwxyz'
+    segment = IndexSegment(_build_segment([('/root/a.txt', 'prefix', ''), ('/root/b.txt', text, '')], block_chars=4))
+
+    assert segment.get_text(1, 3, 17) == text[3:17]
+    assert segment.get_text(1, 20) == text[20:]
+    assert segment.get_text(1, 10, 100) == text[10:]
+    assert segment.get_text(1, 5, 5) == ''
+
+
+def test_segment_shares_documents_with_same_content_hash():
+    content_hash = CONTENT_HASH_PREFIX + 'same'
+    calls = []
+    writer = SegmentWriter(block_chars=8)
+    for path in ('/root/a.txt', '/root/b.txt'):
+        writer.add_document(path, {"hash": content_hash}, lambda: calls.append(path) or 'shared text')
+    segment = IndexSegment(writer.finish('/root', None, None))
+
+    assert len(calls) == 1
+    assert len(segment.documents) == 1
+    assert [file_info['doc'] for file_info in segment.files] == [0, 0]
+
+
+def test_segment_without_documents():
+    segment = IndexSegment(_build_segment([]))
+
+    assert segment.files == []
+    assert segment.postings('ab') == []
+    assert segment.candidate_documents(['ab'], 'OR') == set()
+
+
+def test_candidate_documents():
+    segment = IndexSegment(_build_segment([
+        ('/root/0.txt', 'Apple pie', ''),
+        ('/root/1.txt', 'banana split', ''),
+        ('/root/2.txt', 'apple and banana', ''),
+    ]))
+
+    assert segment.postings('ap') == [0, 2]
+    assert segment.candidate_documents(['APPLE'], 'OR') == {0, 2}
+    assert segment.candidate_documents(['apple', 'banana'], 'AND') == {2}
+    assert segment.candidate_documents(['apple', 'banana'], 'OR') == {0, 1, 2}
+    assert segment.candidate_documents(['cherry'], 'OR') == set()
+    # 1文字の検索語は転置リストで絞り込めない
+    assert segment.candidate_documents(['a'], 'OR') is None
+    assert segment.candidate_documents(['a', 'banana'], 'AND') == {1, 2}
+
+
+def test_reads_format_version_1():
+    data = _build_segment([('/root/a.txt', 'first document', ''), ('/root/b.txt', 'second', '')])
+    header, body = _split_segment(data)
+    # 形式1はファイルの一覧を持たず、文書がそのままファイルに対応する
+    header['format'] = 1
+    documents = header.pop('files')
+    for document, file_info in zip(header['documents'], documents):
+        document.update(path=file_info['path'], mtime=file_info['mtime'], size=file_info['size'])
+
+    segment = IndexSegment(_join_segment(header, body))
+
+    assert [file_info['path'] for file_info in segment.files] == ['/root/a.txt', '/root/b.txt']
+    assert [file_info['doc'] for file_info in segment.files] == [0, 1]
+    assert segment.get_text(1) == 'second'
+    assert segment.candidate_documents(['document'], 'OR') == {0}
+
+
+def test_rejects_unknown_magic_and_format():
+    data = _build_segment([('/root/a.txt', 'text', '')])
+    with pytest.raises(ValueError):
+        IndexSegment(b'NOTINDEX' + data[len(SEGMENT_MAGIC):])
+
+    header, body = _split_segment(data)
+    header['format'] = 99
+    with pytest.raises(ValueError):
+        IndexSegment(_join_segment(header, body))
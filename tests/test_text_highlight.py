@@ -0,0 +1,79 @@
+import html
+import re
+
+from constants import HIGHLIGHT_COLORS
+from service.text_handler import highlight_search_terms, iter_highlighted_html
+
+_HIGHLIGHT_PATTERN = re.compile(r'<span style="background-color: ([^;]+);[^"]*">(.*?)</span>')
+
+
+def highlighted(content, search_terms):
+    """(色, ハイライトされた文字列) の一覧"""
+    return _HIGHLIGHT_PATTERN.findall(highlight_search_terms(content, search_terms))
+
+
+def strip_highlights(result):
+    return _HIGHLIGHT_PATTERN.sub(lambda match: match.group(2), result)
+
+
+def test_highlights_text_case_insensitively():
+    assert highlighted('Error and error and ERROR', ['error']) == [(HIGHLIGHT_COLORS[0], 'Error'),
+                                                                 (HIGHLIGHT_COLORS[0], 'error'),
+                                                                 (HIGHLIGHT_COLORS[0], 'ERROR')]
+
+
+def test_only_markup_is_added():
+    content = '<p>foo <b>bar</b> &amp; foo</p>'
+    assert strip_highlights(highlight_search_terms(content, ['foo', 'bar'])) == content
+
+
+def test_no_terms_returns_content_unchanged():
+    content = '<p>text</p>'
+    assert highlight_search_terms(content, []) == content
+    assert highlight_search_terms(content, ['', '  ']) == content
+
+
+def test_iter_matches_joined_result():
+    content = '<div title="term">term</div>' * 3
+    assert ''.join(iter_highlighted_html(content, ['term'])) == highlight_search_terms(content, ['term'])
+
+
+def test_skips_matches_inside_tags():
+    content = '<a href="/manual/page" title="manual">manual</a><img alt="manual">'
+    assert highlighted(content, ['manual']) == [(HIGHLIGHT_COLORS[0], 'manual')]
+    assert '<a href="/manual/page" title="manual">' in highlight_search_terms(content, ['manual'])
+
+
+def test_skips_matches_inside_entities():
+    content = 'a &amp; b &nbsp; amp nbsp &#1234; 1234'
+    assert highlighted(content, ['amp', 'nbsp', '1234']) == [(HIGHLIGHT_COLORS[0], 'amp'),
+                                                             (HIGHLIGHT_COLORS[1], 'nbsp'),
+                                                             (HIGHLIGHT_COLORS[2], '1234')]
+
+
+def test_skips_script_style_and_comment_blocks():
+    content = ('<script>var target = "<b>target</b>";</script>'
+               '<style>.target { color: red; }</style>'
+               '<!-- target -->'
+               '<p>target</p>'
+               '<SCRIPT type="text/javascript">target()</SCRIPT>')
+    result = highlight_search_terms(content, ['target'])
+    assert highlighted(content, ['target']) == [(HIGHLIGHT_COLORS[0], 'target')]
+    assert '<p><span' in result
+
+
+def test_matches_escaped_search_terms_in_escaped_text():
+    content = html.escape('if a < b && c > d: <tag>', quote=False)
+    assert highlighted(content, ['<tag>', 'a < b']) == [(HIGHLIGHT_COLORS[1], 'a &lt; b'),
+                                                        (HIGHLIGHT_COLORS[0], '&lt;tag&gt;')]
+
+
+def test_longer_term_wins_on_overlap():
+    assert highlighted('search searching', ['search', 'searching']) == [(HIGHLIGHT_COLORS[0], 'search'),
+                                                                         (HIGHLIGHT_COLORS[1], 'searching')]
+
+
+def test_text_whose_length_changes_when_lowercased():
+    # 'İ' は小文字にすると2文字になるため、元の本文に対してIGNORECASEで照合する
+    assert highlighted('İstanbul <b>Manual</b> manual', ['manual']) == [(HIGHLIGHT_COLORS[0], 'Manual'),
+                                                                      (HIGHLIGHT_COLORS[0], 'manual')]
@@ -1,10 +1,15 @@
+import atexit
 import configparser
+import io
 import os
 import sys
-from typing import List
+import tempfile
+import threading
+from typing import List, Optional
 
 from constants import (
     CONFIG_FILENAME,
+    CONFIG_SAVE_DELAY,
     DEFAULT_WINDOW_WIDTH,
     DEFAULT_WINDOW_HEIGHT,
     DEFAULT_WINDOW_X,
@@ -43,10 +48,22 @@ CONFIG_PATH = get_config_path()
 
 
 class ConfigManager:
-    def __init__(self, config_file: str = CONFIG_PATH):
+    """設定の読み書き
+
+    設定はメモリ上で変更し、ファイルへの書き込みは最後の変更からCONFIG_SAVE_DELAY秒後に
+    まとめて行う（一時ファイルに書いてから置き換える）。終了時にはflush()で確実に書き込む。
+    """
+
+    def __init__(self, config_file: str = CONFIG_PATH, save_delay: float = CONFIG_SAVE_DELAY):
         self.config_file = config_file
         self.config = configparser.ConfigParser()
+        self.save_delay = save_delay
+        self._pending_text: Optional[str] = None
+        self._saved_text: Optional[str] = None
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()
         self.load_config()
+        atexit.register(self.flush)
 
     def load_config(self) -> None:
         if os.path.exists(self.config_file):
@@ -57,12 +74,55 @@ class ConfigManager:
                 content = read_file_with_auto_encoding(self.config_file)
                 self.config.read_string(content)
 
+        # 読み込んだ内容と同じ設定は書き込まない
+        buffer = io.StringIO()
+        self.config.write(buffer)
+        self._saved_text = buffer.getvalue()
+
     def save_config(self) -> None:
+        """現在の設定を控えておき、少し待ってからまとめて書き込む"""
+        buffer = io.StringIO()
+        self.config.write(buffer)
+
+        with self._save_lock:
+            self._pending_text = buffer.getvalue()
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """書き込み待ちの設定があれば、すぐにファイルへ書き込む"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+
+            text = self._pending_text
+            self._pending_text = None
+            if text is None or text == self._saved_text:
+                return
+
+            try:
+                self._write_atomic(text)
+                self._saved_text = text
+            except OSError as e:
+                print(f"Error saving config: {e}")
+
+    def _write_atomic(self, text: str) -> None:
+        config_dir = os.path.dirname(os.path.abspath(self.config_file))
+        fd, temp_path = tempfile.mkstemp(prefix='.config_', suffix='.tmp', dir=config_dir)
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as configfile:
-                self.config.write(configfile)  # type: ignore
-        except IOError as e:
-            print(f"Error saving config: {e}")
+            with os.fdopen(fd, 'w', encoding='utf-8') as configfile:
+                configfile.write(text)
+                configfile.flush()
+                os.fsync(configfile.fileno())
+            os.replace(temp_path, self.config_file)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
     def get_file_extensions(self) -> List[str]:
         extensions = self.config.get(
@@ -1,12 +1,7 @@
 import os
 import re
 import socket
-from typing import Optional
-
-import chardet
-from PyQt5.QtCore import QTimer
-from PyQt5.QtGui import QCursor
-from PyQt5.QtWidgets import QMessageBox
+from typing import TYPE_CHECKING, Optional
 
 from constants import (
     NETWORK_TIMEOUT,
@@ -17,6 +12,9 @@ from constants import (
     UI_LABELS
 )
 
+if TYPE_CHECKING:
+    from PyQt5.QtWidgets import QMessageBox
+
 
 def normalize_path(file_path: str) -> str:
     if not file_path:
@@ -60,7 +58,27 @@ def check_file_accessibility(file_path: str, timeout: int = NETWORK_TIMEOUT) ->
     return os.path.exists(normalized_path)
 
 
-def read_file_with_auto_encoding(file_path: str) -> Optional[str]:
+def detect_file_encoding(file_path: str, sample_size: int) -> Optional[str]:
+    """先頭のsample_sizeバイトだけを読んで文字コードを判定する。判定できなければNone"""
+    try:
+        with open(file_path, 'rb') as file:
+            sample = file.read(sample_size)
+    except IOError as e:
+        raise IOError(f"ファイルの読み込みに失敗しました: {file_path}") from e
+
+    if not sample:
+        return None
+
+    import chardet
+
+    try:
+        return chardet.detect(sample)['encoding']
+    except Exception as e:
+        raise ValueError(f"{ERROR_MESSAGES['ENCODING_DETECTION_FAILED']}: {file_path}") from e
+
+
+def read_file_with_auto_encoding(file_path: str, sample_size: Optional[int] = None) -> Optional[str]:
+    """sample_sizeを指定すると、先頭の一部だけで文字コードを判定する（大きなファイル向け）"""
     try:
         with open(file_path, 'rb') as file:
             raw_data = file.read()
@@ -71,8 +89,10 @@ def read_file_with_auto_encoding(file_path: str) -> Optional[str]:
     if len(raw_data) == 0:
         return ""
 
+    import chardet
+
     try:
-        result = chardet.detect(raw_data)
+        result = chardet.detect(raw_data[:sample_size] if sample_size else raw_data)
         encoding = result['encoding']
     except Exception as e:
         raise ValueError(f"{ERROR_MESSAGES['ENCODING_DETECTION_FAILED']}: {file_path}") from e
@@ -101,7 +121,11 @@ def read_file_with_auto_encoding(file_path: str) -> Optional[str]:
 
 
 def create_confirmation_dialog(parent, title: str, message: str,
-                               default_button: QMessageBox.StandardButton) -> QMessageBox:
+                               default_button: 'QMessageBox.StandardButton') -> 'QMessageBox':
+    # 検索処理（CLIなど）からも使うモジュールのため、Qtはダイアログ作成時に読み込む
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QMessageBox
+
     msg_box = QMessageBox(parent)
     msg_box.setWindowTitle(title)
     msg_box.setText(message)
@@ -133,6 +157,8 @@ def create_confirmation_dialog(parent, title: str, message: str,
 
 
 def move_cursor_to_yes_button(yes_button):
+    from PyQt5.QtGui import QCursor
+
     try:
         if yes_button.isVisible():
             button_rect = yes_button.geometry()
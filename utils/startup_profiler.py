@@ -0,0 +1,102 @@
+import builtins
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from constants import (
+    STARTUP_TIMING_ARGUMENT,
+    STARTUP_TIMING_ENV,
+    STARTUP_TIMING_REPORT_FILENAME,
+    STARTUP_TIMING_TOP_MODULES
+)
+
+
+def is_startup_timing_enabled(argv: List[str]) -> bool:
+    return STARTUP_TIMING_ARGUMENT in argv or os.environ.get(STARTUP_TIMING_ENV, '') not in ('', '0')
+
+
+class StartupProfiler:
+    """起動時のモジュール読み込み時間と初期化処理の時間を計測する
+
+    -X importtime が使えないPyInstallerのビルドでも計測できるよう、__import__を
+    差し替えて新しくモジュールを読み込んだ呼び出しだけを記録する。無効時は何もしない。
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._started_at = time.perf_counter()
+        self._phases: List[Tuple[str, float]] = []
+        # モジュール名 → (読み込み時間（子を含む）, 自身の時間)
+        self._imports: Dict[str, Tuple[float, float]] = {}
+        self._local = threading.local()
+        self._original_import = builtins.__import__
+
+        if enabled:
+            builtins.__import__ = self._timed_import
+
+    @contextmanager
+    def phase(self, label: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases.append((label, time.perf_counter() - started))
+
+    def finish(self) -> None:
+        """計測を終了し、結果を出力する"""
+        if not self.enabled:
+            return
+
+        builtins.__import__ = self._original_import
+        report = self.format_report()
+        print(report)
+
+        report_path = os.path.join(tempfile.gettempdir(), STARTUP_TIMING_REPORT_FILENAME)
+        try:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(report)
+            print(f"起動時間の計測結果を保存しました: {report_path}")
+        except OSError as e:
+            print(f"起動時間の計測結果を保存できませんでした: {e}")
+
+    def format_report(self) -> str:
+        total = time.perf_counter() - self._started_at
+        lines = [f"起動時間: {total * 1000:.1f} ms", "", "[初期化処理]"]
+        for label, elapsed in self._phases:
+            lines.append(f"{elapsed * 1000:9.1f} ms  {label}")
+
+        lines += ["", f"[モジュール読み込み（上位{STARTUP_TIMING_TOP_MODULES}件, 子を含む / 自身）]"]
+        ranked = sorted(self._imports.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (inclusive, own) in ranked[:STARTUP_TIMING_TOP_MODULES]:
+            lines.append(f"{inclusive * 1000:9.1f} ms {own * 1000:9.1f} ms  {name}")
+        return '\n'.join(lines)
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        loaded_before = len(sys.modules)
+        started = time.perf_counter()
+        stack.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if len(sys.modules) > loaded_before:
+                module_name = name
+                if level and globals:
+                    module_name = f"{globals.get('__package__') or ''}.{name}".strip('.')
+                inclusive, own = self._imports.get(module_name, (0.0, 0.0))
+                self._imports[module_name] = (inclusive + elapsed, own + elapsed - children)
@@ -0,0 +1,95 @@
+from typing import List, Optional
+
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QLabel, QScrollArea
+
+from constants import HIGHLIGHT_COLORS, PREVIEW_HIGHLIGHT_ALPHA
+from service.hit_locations import PdfHitLocations
+from service.page_renderer import PageRenderer, PreviewRequest, RenderedPage
+
+
+class PdfPreviewWidget(QScrollArea):
+    """ヒットしたPDFページを画像で表示し、検索語の位置を重ねて描画するプレビュー
+
+    ページはレンダラーのワーカースレッドで描画し、描き終わったら表示する。
+    表示・非表示もこのウィジェットが切り替える。
+    """
+
+    page_rendered = pyqtSignal(int, object)  # 要求番号, RenderedPage または None
+
+    def __init__(self, renderer: Optional[PageRenderer] = None, parent=None):
+        super().__init__(parent)
+        self.renderer = renderer or PageRenderer()
+        self._page_pixmap: Optional[QPixmap] = None
+        self._request_id = 0
+
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
+        self.setWidget(self.image_label)
+        self.setWidgetResizable(True)
+        self.setAlignment(Qt.AlignHCenter)
+        self.page_rendered.connect(self._show_rendered_page)
+
+    def show_page(self, file_path: str, page_number: int, search_terms: List[str],
+                  hit_locations: Optional[PdfHitLocations] = None) -> None:
+        self._request_id += 1
+        request_id = self._request_id
+        future = self.renderer.render_async(file_path, page_number, search_terms, hit_locations)
+        if future.done():
+            self._show_rendered_page(request_id, future.result())
+        else:
+            # ワーカースレッドから呼ばれるため、シグナルでGUIスレッドに渡す
+            future.add_done_callback(lambda done: self.page_rendered.emit(request_id, done.result()))
+
+    def _show_rendered_page(self, request_id: int, rendered: Optional[RenderedPage]) -> None:
+        if request_id != self._request_id:
+            # 描画している間に別のページが選ばれた
+            return
+        if rendered is None:
+            self.clear()
+            self.setVisible(False)
+            return
+
+        self._page_pixmap = self._create_pixmap(rendered)
+        self._update_scaled_pixmap()
+        self.setVisible(True)
+
+    def prefetch(self, requests: List[PreviewRequest]) -> None:
+        self.renderer.prefetch(requests)
+
+    def clear(self) -> None:
+        # 描画中のページが後から表示されないようにする
+        self._request_id += 1
+        self._page_pixmap = None
+        self.image_label.clear()
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self._update_scaled_pixmap()
+
+    def _create_pixmap(self, rendered: RenderedPage) -> QPixmap:
+        image = QImage(rendered.samples, rendered.width, rendered.height,
+                       rendered.stride, QImage.Format_RGB888).copy()
+
+        painter = QPainter(image)
+        painter.setPen(Qt.NoPen)
+        for term_index, x0, y0, x1, y1 in rendered.highlight_rects:
+            color = QColor(HIGHLIGHT_COLORS[term_index % len(HIGHLIGHT_COLORS)])
+            color.setAlpha(PREVIEW_HIGHLIGHT_ALPHA)
+            painter.fillRect(QRectF(x0, y0, x1 - x0, y1 - y0), color)
+        painter.end()
+
+        return QPixmap.fromImage(image)
+
+    def _update_scaled_pixmap(self) -> None:
+        if self._page_pixmap is None:
+            return
+
+        width = self.viewport().width()
+        if 0 < width < self._page_pixmap.width():
+            self.image_label.setPixmap(
+                self._page_pixmap.scaledToWidth(width, Qt.SmoothTransformation)
+            )
+        else:
+            self.image_label.setPixmap(self._page_pixmap)
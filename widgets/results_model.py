@@ -0,0 +1,88 @@
+import os
+from array import array
+from bisect import bisect_right
+from typing import Any, List, Optional, Tuple
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QFont
+
+from service.search_hit import FileRegistry, SearchHitBatch
+
+
+class SearchResultsModel(QAbstractListModel):
+    """検索結果を列指向で保持し、表示文字列は必要になった時点で生成するモデル"""
+
+    def __init__(self, font: Optional[QFont] = None, parent=None):
+        super().__init__(parent)
+        self.font = font
+        self.file_registry = FileRegistry()
+        self._file_names: List[str] = []
+        self._row_file_ids = array('I')
+        self._positions = array('I')
+        self._offsets = array('Q')
+        self._term_ids = array('H')
+        self._run_starts = array('I')
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._row_file_ids)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= len(self._row_file_ids):
+            return None
+
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return self._create_item_text(row)
+        if role == Qt.FontRole:
+            return self.font
+        if role == Qt.UserRole:
+            return self.get_result(row)
+        return None
+
+    def add_batch(self, batch: SearchHitBatch) -> None:
+        # 以前の検索から遅れて届いたバッチはIDの対応が異なるため破棄する
+        if batch.registry is not self.file_registry or not batch:
+            return
+
+        first_row = len(self._row_file_ids)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(batch) - 1)
+        self._row_file_ids.extend(batch.file_ids)
+        self._positions.extend(batch.positions)
+        self._offsets.extend(batch.offsets)
+        self._term_ids.extend(batch.term_ids)
+        self._run_starts.extend(first_row + run_start for run_start in batch.file_runs)
+        self.endInsertRows()
+
+    def get_result(self, row: int) -> Tuple[str, int, int, int]:
+        """(ファイルパス, ページ/行番号, オフセット, 検索語番号) を返す"""
+        file_path = self.file_registry.path(self._row_file_ids[row])
+        return file_path, self._positions[row], self._offsets[row], self._term_ids[row]
+
+    def clear(self) -> FileRegistry:
+        """結果を消去し、次の検索で使う新しいファイルIDレジストリを返す"""
+        self.beginResetModel()
+        self.file_registry = FileRegistry()
+        self._file_names.clear()
+        self._row_file_ids = array('I')
+        self._positions = array('I')
+        self._offsets = array('Q')
+        self._term_ids = array('H')
+        self._run_starts = array('I')
+        self.endResetModel()
+        return self.file_registry
+
+    def _file_name(self, file_id: int) -> str:
+        while len(self._file_names) <= file_id:
+            self._file_names.append(os.path.basename(self.file_registry.path(len(self._file_names))))
+        return self._file_names[file_id]
+
+    def _create_item_text(self, row: int) -> str:
+        file_id = self._row_file_ids[row]
+        file_name = self._file_name(file_id)
+        position = self._positions[row]
+        match_number = row - self._run_starts[bisect_right(self._run_starts, row) - 1] + 1
+        if file_name.lower().endswith('.pdf'):
+            return f"{file_name} (ページ: {position}, 一致: {match_number})"
+        return f"{file_name} (行: {position}, 一致: {match_number})"
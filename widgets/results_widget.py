@@ -1,16 +1,24 @@
 import os
 import re
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QModelIndex
 from PyQt5.QtGui import QFont, QColor
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QListWidget, QListWidgetItem,
-    QTextEdit, QProgressDialog, QLabel
+    QWidget, QVBoxLayout, QListView,
+    QTextEdit, QProgressDialog, QLabel, QSplitter
 )
-from constants import HIGHLIGHT_COLORS,UI_LABELS
-from service.file_searcher import FileSearcher
-from service.indexed_file_searcher import SmartFileSearcher, SearchMode
+from constants import HIGHLIGHT_COLORS, PREVIEW_PREFETCH_DISTANCE, UI_LABELS
+from service.hit_locations import HitLocationStore, PdfHitLocations
+from service.search_hit import SearchHitBatch
+from service.snippet_provider import SnippetProvider
+from widgets.pdf_preview_widget import PdfPreviewWidget
+from widgets.results_model import SearchResultsModel
+
+if TYPE_CHECKING:
+    from service.file_searcher import FileSearcher
+    from service.indexed_file_searcher import DaemonFileSearcher
+    from service.search_daemon import SearchDaemonClient
 
 
 class ResultsWidget(QWidget):
@@ -25,12 +33,16 @@ class ResultsWidget(QWidget):
         self._setup_fonts()
 
         self.search_term_colors: Dict[str, str] = {}
+        self.search_terms: List[str] = []
+        self.snippet_provider: Optional[SnippetProvider] = None
+        self.hit_locations = HitLocationStore()
         self.html_font_size: int = self.config_manager.get_html_font_size()
         self.current_file_path: Optional[str] = None
         self.current_position: Optional[int] = None
-        self.searcher: Optional[FileSearcher] = None
+        self.searcher: Optional['FileSearcher'] = None
         self.progress_dialog: Optional[QProgressDialog] = None
-        self.index_searcher: Optional[SmartFileSearcher] = None
+        self.index_searcher: Optional['DaemonFileSearcher'] = None
+        self._daemon_text_client: Optional['SearchDaemonClient'] = None
 
     def _setup_ui(self) -> None:
         layout = QVBoxLayout()
@@ -41,9 +53,12 @@ class ResultsWidget(QWidget):
         self.index_status_label.setVisible(False)
         layout.addWidget(self.index_status_label)
 
-        self.results_list = QListWidget()
-        self.results_list.itemClicked.connect(self.show_result)
-        self.results_list.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.results_model = SearchResultsModel(parent=self)
+        self.results_list = QListView()
+        self.results_list.setUniformItemSizes(True)
+        self.results_list.setModel(self.results_model)
+        self.results_list.clicked.connect(self.show_result)
+        self.results_list.doubleClicked.connect(self.on_item_double_clicked)
         layout.addWidget(self.results_list)
 
         self.result_display = QTextEdit()
@@ -51,11 +66,19 @@ class ResultsWidget(QWidget):
         self.result_display.setTextInteractionFlags(
             Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard
         )
-        layout.addWidget(self.result_display)
+
+        self.preview_widget = PdfPreviewWidget()
+        self.preview_widget.setVisible(False)
+
+        self.detail_splitter = QSplitter(Qt.Horizontal)
+        self.detail_splitter.addWidget(self.result_display)
+        self.detail_splitter.addWidget(self.preview_widget)
+        layout.addWidget(self.detail_splitter)
 
     def _setup_fonts(self) -> None:
         self.filename_font = QFont()
         self.filename_font.setPointSize(self.config_manager.get_filename_font_size())
+        self.results_model.font = self.filename_font
 
         self.result_detail_font = QFont()
         self.result_detail_font.setPointSize(self.config_manager.get_result_detail_font_size())
@@ -76,6 +99,7 @@ class ResultsWidget(QWidget):
         self.index_searcher.start()
 
     def _setup_search_colors(self, search_terms: List[str]) -> None:
+        self.search_terms = list(search_terms)
         self.search_term_colors = {
             term: HIGHLIGHT_COLORS[i % len(HIGHLIGHT_COLORS)]
             for i, term in enumerate(search_terms)
@@ -83,21 +107,28 @@ class ResultsWidget(QWidget):
 
     def _setup_searcher(self, directory: str, search_terms: List[str],
                         include_subdirs: bool, search_type: str) -> None:
+        from service.file_searcher import FileSearcher
+
         file_extensions = self.config_manager.get_file_extensions()
         context_length = self.config_manager.get_context_length()
         self.searcher = FileSearcher(directory, search_terms, include_subdirs,
-                                     search_type, file_extensions, context_length)
-        self.searcher.result_found.connect(self.add_result)
+                                     search_type, file_extensions, context_length,
+                                     file_registry=self.results_model.file_registry,
+                                     hit_locations=self.hit_locations)
+        self.snippet_provider = SnippetProvider(context_length)
+        self.searcher.results_found.connect(self.add_results)
         self.searcher.progress_update.connect(self.update_progress)
         self.searcher.search_completed.connect(self.search_completed)
 
     def _setup_index_searcher(self, directory: str, search_terms: List[str],
                               include_subdirs: bool, search_type: str) -> None:
+        from service.indexed_file_searcher import DaemonFileSearcher
+
         file_extensions = self.config_manager.get_file_extensions()
         context_length = self.config_manager.get_context_length()
         index_file_path = self.config_manager.get_index_file_path()
-
-        self.index_searcher = SmartFileSearcher(
+        # 検索サービスが起動していれば、インデックスを読み込まずにサービスへ検索を依頼する
+        self.index_searcher = DaemonFileSearcher(
             directory=directory,
             search_terms=search_terms,
             include_subdirs=include_subdirs,
@@ -105,14 +136,28 @@ class ResultsWidget(QWidget):
             file_extensions=file_extensions,
             context_length=context_length,
             use_index=True,
-            index_file_path=index_file_path
+            index_file_path=index_file_path,
+            file_registry=self.results_model.file_registry,
+            hit_locations=self.hit_locations,
+            text_client=self._daemon_text_client
         )
+        self.snippet_provider = SnippetProvider(context_length)
 
-        self.index_searcher.result_found.connect(self.add_result)
+        self.index_searcher.text_source_ready.connect(self._set_text_source)
+        self.index_searcher.results_found.connect(self.add_results)
         self.index_searcher.progress_update.connect(self.update_progress)
         self.index_searcher.search_completed.connect(self.search_completed)
         self.index_searcher.index_status_changed.connect(self.update_index_status)
 
+    def _set_text_source(self, text_source) -> None:
+        """検索スレッドが用意した抜粋の本文の取得元（インデックスまたは検索サービスへの接続）を使う"""
+        from service.search_daemon import SearchDaemonClient
+
+        if isinstance(text_source, SearchDaemonClient):
+            # 検索サービスへの抜粋用の接続は、検索用とは別に保持して次の検索でも使い回す
+            self._daemon_text_client = text_source
+        self.snippet_provider = SnippetProvider(self.config_manager.get_context_length(), indexer=text_source)
+
     def _setup_progress_dialog(self) -> None:
         self.progress_dialog = QProgressDialog(
             UI_LABELS['SEARCHING'],
@@ -148,47 +193,68 @@ class ResultsWidget(QWidget):
         if self.index_status_label:
             QTimer.singleShot(3000, lambda: self.index_status_label.setVisible(False))
 
-    def add_result(self, file_path: str, results: List[Tuple[int, str]]) -> None:
-        for i, (position, context) in enumerate(results):
-            file_name = os.path.basename(file_path)
-            item_text = self._create_item_text(file_name, file_path, position, i)
-            list_item = QListWidgetItem(item_text)
-            list_item.setData(Qt.UserRole, (file_path, position, context))
-            list_item.setFont(self.filename_font)
-            self.results_list.addItem(list_item)
-
-    @staticmethod
-    def _create_item_text(file_name: str, file_path: str, position: int, index: int) -> str:
-        if file_path.lower().endswith('.pdf'):
-            return f"{file_name} (ページ: {position}, 一致: {index + 1})"
-        return f"{file_name} (行: {position}, 一致: {index + 1})"
-
-    def on_item_double_clicked(self, item: QListWidgetItem) -> None:
+    def add_results(self, batch: SearchHitBatch) -> None:
+        self.results_model.add_batch(batch)
+
+    def on_item_double_clicked(self, index: QModelIndex) -> None:
         try:
-            file_path, position, context = item.data(Qt.UserRole)
+            file_path, position, _, _ = self.results_model.get_result(index.row())
             self.current_file_path = file_path
             self.current_position = position
             self.file_open_requested.emit()
-        except (AttributeError, TypeError) as e:
+        except (AttributeError, TypeError, IndexError) as e:
             print(f"エラー: ダブルクリック処理中にエラーが発生しました: {e}")
         except Exception as e:
             print(f"予期せぬエラーが発生しました: {e}")
 
-    def show_result(self, item: QListWidgetItem) -> None:
+    def show_result(self, index: QModelIndex) -> None:
         try:
-            file_path, position, context = item.data(Qt.UserRole)
+            file_path, position, offset, term_id = self.results_model.get_result(index.row())
+            context = self._get_snippet(file_path, position, offset, term_id)
             highlighted_content = self._highlight_content(context)
             result_html = self._create_result_html(file_path, position, highlighted_content)
             self.result_display.setHtml(result_html)
+            self._show_preview(index.row(), file_path, position)
 
             self.current_file_path = file_path
             self.current_position = position
             self.result_selected.emit()
-        except AttributeError:
+        except (AttributeError, IndexError):
             print("エラー: 無効な項目データ")
         except Exception as e:
             print(f"show_resultで予期せぬエラーが発生しました: {e}")
 
+    def _get_snippet(self, file_path: str, position: int, offset: int, term_id: int) -> str:
+        if self.snippet_provider is None:
+            self.snippet_provider = SnippetProvider(self.config_manager.get_context_length())
+        term_length = len(self.search_terms[term_id]) if term_id < len(self.search_terms) else 0
+        return self.snippet_provider.get_snippet(file_path, position, offset, term_length)
+
+    def _show_preview(self, row: int, file_path: str, position: int) -> None:
+        if not file_path.lower().endswith('.pdf'):
+            self.preview_widget.clear()
+            self.preview_widget.setVisible(False)
+            return
+
+        self.preview_widget.show_page(
+            file_path, position, self.search_terms, self.hit_locations.get(file_path)
+        )
+        self.preview_widget.prefetch(self._adjacent_preview_requests(row))
+
+    def _adjacent_preview_requests(self, row: int) -> list:
+        requests = []
+        seen = set()
+        for distance in range(1, PREVIEW_PREFETCH_DISTANCE + 1):
+            for neighbor in (row + distance, row - distance):
+                if not 0 <= neighbor < self.results_model.rowCount():
+                    continue
+                file_path, position, _, _ = self.results_model.get_result(neighbor)
+                if not file_path.lower().endswith('.pdf') or (file_path, position) in seen:
+                    continue
+                seen.add((file_path, position))
+                requests.append((file_path, position, self.search_terms, self.hit_locations.get(file_path)))
+        return requests
+
     def _create_result_html(self, file_path: str, position: int, highlighted_content: str) -> str:
         result_html = f'<span style="font-size:{self.result_detail_font.pointSize()}pt;">'
         result_html += f"<h3>{os.path.basename(file_path)}</h3>"
@@ -212,8 +278,11 @@ class ResultsWidget(QWidget):
         return highlighted
 
     def clear_results(self) -> None:
-        self.results_list.clear()
+        self.results_model.clear()
+        self.hit_locations = HitLocationStore()
         self.result_display.clear()
+        self.preview_widget.clear()
+        self.preview_widget.setVisible(False)
 
         if self.index_status_label:
             self.index_status_label.setText("")
@@ -221,3 +290,6 @@ class ResultsWidget(QWidget):
 
     def get_selected_file_info(self) -> Tuple[Optional[str], Optional[int]]:
         return self.current_file_path, self.current_position
+
+    def get_hit_locations(self, file_path: str) -> Optional[PdfHitLocations]:
+        return self.hit_locations.get(file_path)